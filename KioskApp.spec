@@ -1,6 +1,22 @@
 # -*- mode: python ; coding: utf-8 -*-
 
 import os
+import sys
+
+# Build profile: "release" ships only what the kiosk can reach and starts faster,
+# "full" bundles the whole page-1 folder (handy while pages are being edited)
+#   set KIOSK_BUILD=full && python -m PyInstaller --clean KioskApp.spec
+profile = os.environ.get('KIOSK_BUILD', 'release')
+release = profile == 'release'
+print(f"Build profile: {profile}")
+
+# Optional at runtime, required in a release: without them the watchdog can't sample memory
+# or handles and the receipt archive falls back to zlib - both silently
+if release:
+    import importlib.util
+    missing = [m for m in ('psutil', 'zstandard') if importlib.util.find_spec(m) is None]
+    if missing:
+        sys.exit(f"Release build needs {', '.join(missing)} - pip install -r requirements.txt")
 
 # Page-1 folder with all assets - will be placed next to the EXE
 page1_folder = 'page-1 (2)/page-1'
@@ -8,35 +24,81 @@ page1_folder = 'page-1 (2)/page-1'
 # Build list of data files from page-1 folder
 datas = []
 if os.path.exists(page1_folder):
-    for root, dirs, files in os.walk(page1_folder):
-        for file in files:
-            src = os.path.join(root, file)
-            # Destination path preserves structure inside 'page-1'
-            rel_path = os.path.relpath(root, page1_folder)
-            if rel_path == '.':
-                dst = 'page-1'
-            else:
-                dst = os.path.join('page-1', rel_path)
-            datas.append((src, dst))
+    if release:
+        # Only pages and assets reachable from kiosk-shell.html - no backups, variants or PDFs -
+        # built ahead of time by page_bundler.py (critical CSS inlined, scripts minified, preload hints)
+        sys.path.insert(0, SPECPATH)
+        from page_bundler import build
+        bundle_folder = os.path.join(SPECPATH, 'build', 'page-bundle')
+        build(page1_folder, bundle_folder)
+        for root, dirs, files in os.walk(bundle_folder):
+            for file in files:
+                rel_path = os.path.relpath(root, bundle_folder)
+                datas.append((os.path.join(root, file), 'page-1' if rel_path == '.' else os.path.join('page-1', rel_path)))
+    else:
+        for root, dirs, files in os.walk(page1_folder):
+            for file in files:
+                src = os.path.join(root, file)
+                # Destination path preserves structure inside 'page-1'
+                rel_path = os.path.relpath(root, page1_folder)
+                if rel_path == '.':
+                    dst = 'page-1'
+                else:
+                    dst = os.path.join('page-1', rel_path)
+                datas.append((src, dst))
     print(f"Including {len(datas)} files from page-1 folder")
 else:
     print(f"WARNING: page-1 folder not found at {page1_folder}")
 
+# Stdlib the kiosk never imports, and Pillow plugins for formats it never reads or writes
+# (receipts are PNG/JPEG, previews PNG, page assets never go through Pillow). Tiff and Mpo
+# stay: the JPEG loader imports them lazily for EXIF data and multi-picture files.
+excludes = []
+if release:
+    excludes = [
+        'tkinter', 'unittest', 'pydoc', 'pydoc_data', 'doctest', 'lib2to3', 'test', 'turtle',
+        'turtledemo', 'idlelib', 'curses', 'sqlite3', 'xmlrpc', 'ensurepip', 'venv',
+        'distutils', 'setuptools', 'pip',
+        'PIL.ImageTk', 'PIL.ImageQt', 'PIL.ImageShow', 'PIL.ImageCms', 'PIL.ImageMath',
+        'PIL.SpiderImagePlugin', 'PIL.FpxImagePlugin', 'PIL.MicImagePlugin', 'PIL.PsdImagePlugin',
+        'PIL.EpsImagePlugin', 'PIL.PdfImagePlugin', 'PIL.WmfImagePlugin', 'PIL.IcnsImagePlugin',
+        'PIL.WebPImagePlugin', 'PIL.AvifImagePlugin', 'PIL.Jpeg2KImagePlugin',
+        'PIL.BlpImagePlugin', 'PIL.DdsImagePlugin', 'PIL.FitsImagePlugin', 'PIL.FliImagePlugin',
+        'PIL.GbrImagePlugin', 'PIL.ImtImagePlugin', 'PIL.IptcImagePlugin', 'PIL.McIdasImagePlugin',
+        'PIL.PcdImagePlugin', 'PIL.PixarImagePlugin', 'PIL.QoiImagePlugin',
+        'PIL.SgiImagePlugin', 'PIL.SunImagePlugin', 'PIL.TgaImagePlugin', 'PIL.XVThumbImagePlugin',
+        'PIL.XbmImagePlugin', 'PIL.XpmImagePlugin', 'PIL.CurImagePlugin', 'PIL.DcxImagePlugin',
+        'PIL.FtexImagePlugin', 'PIL.GribStubImagePlugin', 'PIL.Hdf5StubImagePlugin',
+        'PIL.BufrStubImagePlugin', 'PIL.PalmImagePlugin', 'PIL.PcxImagePlugin', 'PIL.PpmImagePlugin',
+    ]
+
 a = Analysis(
     ['kiosk_app.py'],
     pathex=[],
     binaries=[],
     datas=datas,
-    hiddenimports=['PIL', 'PIL.Image'],
+    hiddenimports=['PIL', 'PIL.Image', 'psutil'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=excludes,
     noarchive=False,
-    optimize=0,
+    optimize=2 if release else 0,  # Bytecode compiled once at build time, asserts and docstrings stripped
 )
 pyz = PYZ(a.pure)
 
+# UPX saves disk but every launch pays to decompress - not worth it for big DLLs.
+# .NET assemblies (WebView2, pythonnet) and the WebView2 loader also break when packed.
+upx_exclude = []
+if release:
+    UPX_MAX_BYTES = 1024 * 1024
+    for name, path, kind in a.binaries:
+        base = os.path.basename(name)
+        if (base.lower().startswith(('microsoft.web.webview2', 'webview2loader', 'python.runtime', 'clr'))
+                or os.path.getsize(path) > UPX_MAX_BYTES):
+            upx_exclude.append(base)
+    print(f"UPX skips {len(upx_exclude)} large or .NET binaries")
+
 # NOT using --onefile mode - this creates a folder with exe + assets
 # This is MUCH better for large media files
 exe = EXE(
@@ -64,6 +126,6 @@ coll = COLLECT(
     a.datas,
     strip=False,
     upx=True,
-    upx_exclude=[],
+    upx_exclude=upx_exclude,
     name='KioskApp',
 )
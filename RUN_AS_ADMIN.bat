@@ -1,4 +1,4 @@
 @echo off
-:: Run Kiosk App as Administrator
+:: Run Kiosk App as Administrator - supervised, so a crash or hang restarts it
 cd /d "%~dp0"
-powershell -Command "Start-Process -FilePath '%~dp0dist\KioskApp.exe' -Verb RunAs"
+powershell -Command "Start-Process -FilePath '%~dp0dist\KioskApp.exe' -ArgumentList '--supervise' -Verb RunAs"
@@ -0,0 +1,271 @@
+"""
+API Cache - local caching proxy in front of the Node server's offers and layout API
+The pages fetch through this instead of http://localhost:3000 (kiosk_app.py passes its
+address to the shell as ?api=, api-config.js picks it up). Offers, layout config and
+sync status are served from memory:
+
+  fresh    - straight from memory
+  stale    - from memory at once, refetched in the background (stale-while-revalidate)
+  invalid  - after a database sync; the next request waits for the refetch, falling
+             back to the old copy if the server doesn't answer
+  missing  - fetched, with concurrent requests for the same URL sharing one fetch
+
+Cached responses are snapshotted to api_cache.json, so a cold start (or a kiosk whose
+server is down) has offers from the first touch. Every other /api call is passed
+through unchanged.
+"""
+
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from kiosk_log import EXE_DIR, log
+
+UPSTREAM = "http://localhost:3000"
+PROXY_PORT = 3080
+SNAPSHOT_FILE = os.path.join(EXE_DIR, "api_cache.json")
+SNAPSHOT_DELAY = 5        # seconds to batch cache changes before writing the snapshot
+UPSTREAM_TIMEOUT = 5
+INVALID_WAIT = 3          # seconds a request waits for a post-sync refetch before taking the old copy
+
+# Cached paths -> seconds a response stays fresh. Syncs invalidate everything anyway.
+CACHED = {
+    "/api/offers": 300,
+    "/api/layout-config": 300,
+    "/api/last-sync-time": 5,
+}
+_PASS_HEADERS = ("Content-Type", "Authorization", "Accept")
+
+
+class _Entry:
+    def __init__(self, status, content_type, body, fetched_at):
+        self.status = status
+        self.content_type = content_type
+        self.body = body
+        self.fetched_at = fetched_at
+        self.invalid = False
+
+
+class ApiCache:
+    """Cached upstream GET responses keyed by path and query"""
+
+    def __init__(self, upstream=UPSTREAM, snapshot=SNAPSHOT_FILE):
+        self.upstream = upstream.rstrip("/")
+        self.snapshot = snapshot
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._fetching = {}         # key -> Event set when the fetch in progress finishes
+        self._generation = 0        # bumped by every sync - fetches started before it are not cached
+        self._save_timer = None
+        self._reachable = True
+        self.stats = {"hits": 0, "stale": 0, "misses": 0, "revalidations": 0, "offline": 0, "errors": 0,
+                      "invalidations": 0}
+
+    def cacheable(self, path):
+        return urlsplit(path).path in CACHED
+
+    def get(self, key):
+        """(status, content_type, body, state) for a cached path - fetches when there is nothing usable"""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and not entry.invalid:
+            age = time.time() - entry.fetched_at
+            if age < CACHED[urlsplit(key).path]:
+                self.stats["hits"] += 1
+                return entry.status, entry.content_type, entry.body, "hit"
+            self.stats["stale"] += 1
+            self._refetch(key, wait=False)
+            return entry.status, entry.content_type, entry.body, "stale"
+
+        self.stats["misses"] += 1
+        fetched = self._refetch(key, wait=INVALID_WAIT if entry is not None else UPSTREAM_TIMEOUT + 1)
+        if fetched is not None and (entry is None or fetched.status == 200):
+            return fetched.status, fetched.content_type, fetched.body, "miss"
+        if entry is not None:
+            self.stats["offline"] += 1
+            return entry.status, entry.content_type, entry.body, "offline"
+        raise Exception(f"{self.upstream} did not answer and nothing is cached for {key}")
+
+    def invalidate(self, *args):
+        """Database sync finished - everything cached may be out of date. Refetches in the background."""
+        with self._lock:
+            self._generation += 1
+            keys = list(self._entries)
+            for entry in self._entries.values():
+                entry.invalid = True
+        self.stats["invalidations"] += 1
+        log(f"API cache invalidated after sync - refreshing {len(keys)} response(s)")
+        for key in keys:
+            self._refetch(key, wait=False)
+
+    def _refetch(self, key, wait):
+        """Fetch key once, however many callers ask - wait is False or seconds to wait for the response.
+
+        A fetch that started before the last sync may have read pre-sync data, so it is not
+        shared - a new one is started alongside it.
+        """
+        with self._lock:
+            done = self._fetching.get(key)
+            if done is None or done.generation != self._generation:
+                done = self._fetching[key] = threading.Event()
+                done.result = None
+                done.generation = self._generation
+                threading.Thread(target=self._fetch, args=(key, done), name="ApiCacheFetch", daemon=True).start()
+        if wait and done.wait(wait):
+            return done.result
+        return None
+
+    def _fetch(self, key, done):
+        try:
+            try:
+                with urllib.request.urlopen(self.upstream + key, timeout=UPSTREAM_TIMEOUT) as resp:
+                    entry = _Entry(resp.status, resp.headers.get("Content-Type", "application/json"), resp.read(),
+                                   time.time())
+            except urllib.error.HTTPError as e:
+                # Not cached, but the caller waiting on a miss gets the server's own error
+                entry = _Entry(e.code, e.headers.get("Content-Type", "application/json"), e.read(), time.time())
+            done.result = entry
+            if not self._reachable:
+                log(f"✅ API cache reached {self.upstream} again")
+                self._reachable = True
+            if entry.status == 200:
+                with self._lock:
+                    current = done.generation == self._generation
+                    if current:
+                        self._entries[key] = entry
+                if current:
+                    self.stats["revalidations"] += 1
+                    self._schedule_save()
+        except Exception as e:
+            self.stats["errors"] += 1
+            if self._reachable:
+                log(f"[WARNING] API cache could not fetch {key}, serving cached copies: {e}")
+                self._reachable = False
+        finally:
+            with self._lock:
+                if self._fetching.get(key) is done:
+                    del self._fetching[key]
+            done.set()
+
+    def load(self):
+        """Read the snapshot - its entries count as stale, so they are served at once and refreshed"""
+        if not os.path.exists(self.snapshot):
+            return 0
+        try:
+            with open(self.snapshot, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            with self._lock:
+                for key, item in data.get("entries", {}).items():
+                    if urlsplit(key).path in CACHED:
+                        self._entries[key] = _Entry(200, item["content_type"], item["body"].encode("utf-8"),
+                                                    min(item["fetched_at"], time.time() - CACHED[urlsplit(key).path]))
+            log(f"✅ API cache: {len(self._entries)} response(s) loaded from {self.snapshot}")
+        except Exception as e:
+            log(f"[WARNING] Ignoring API cache snapshot {self.snapshot}: {e}")
+        return len(self._entries)
+
+    def save(self):
+        with self._lock:
+            self._save_timer = None
+            entries = {key: {"content_type": e.content_type, "body": e.body.decode("utf-8", "replace"),
+                             "fetched_at": e.fetched_at}
+                       for key, e in self._entries.items()}
+        tmp = self.snapshot + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"saved_at": time.time(), "entries": entries}, f)
+            os.replace(tmp, self.snapshot)
+        except Exception as e:
+            log(f"[WARNING] Could not save API cache snapshot: {e}")
+
+    def _schedule_save(self):
+        with self._lock:
+            if self._save_timer is not None:
+                return
+            self._save_timer = threading.Timer(SNAPSHOT_DELAY, self.save)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def pass_through(self, method, path, body, headers):
+        """Forward any other call as-is - (status, content_type, body)"""
+        request = urllib.request.Request(self.upstream + path, data=body, method=method,
+                                         headers={h: headers[h] for h in _PASS_HEADERS if headers.get(h)})
+        try:
+            with urllib.request.urlopen(request, timeout=UPSTREAM_TIMEOUT * 2) as resp:
+                return resp.status, resp.headers.get("Content-Type", ""), resp.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.headers.get("Content-Type", ""), e.read()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass  # One line per request would flood the kiosk log
+
+    def _reply(self, status, content_type, body, state=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type or "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Access-Control-Allow-Origin", "*")  # Pages are file:// URLs
+        if state:
+            self.send_header("X-Kiosk-Cache", state)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_OPTIONS(self):
+        self.send_response(204)
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Access-Control-Allow-Methods", "GET, POST, PUT, DELETE, OPTIONS")
+        self.send_header("Access-Control-Allow-Headers", self.headers.get("Access-Control-Request-Headers", "*"))
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        cache = self.server.cache
+        try:
+            if cache.cacheable(self.path):
+                self._reply(*cache.get(self.path))
+            else:
+                self._reply(*cache.pass_through("GET", self.path, None, self.headers))
+        except Exception as e:
+            self._reply(502, "application/json", json.dumps({"success": False, "message": str(e)}).encode("utf-8"))
+
+    def _forward(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else None
+        try:
+            self._reply(*self.server.cache.pass_through(self.command, self.path, body, self.headers))
+        except Exception as e:
+            self._reply(502, "application/json", json.dumps({"success": False, "message": str(e)}).encode("utf-8"))
+
+    do_POST = do_PUT = do_DELETE = _forward
+
+
+class ApiProxy(ThreadingHTTPServer):
+    """The cache as an HTTP server on 127.0.0.1 - start() returns the base URL for the pages"""
+
+    daemon_threads = True
+
+    def __init__(self, cache, port=PROXY_PORT):
+        self.cache = cache
+        super().__init__(("127.0.0.1", port), _Handler)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name="ApiProxy", daemon=True).start()
+        log(f"✅ API cache proxy on {self.url} -> {self.cache.upstream}")
+        return self.url
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        self.cache.save()
@@ -7,7 +7,7 @@ echo.
 
 REM Install dependencies
 echo Installing dependencies...
-pip install pywebview keyboard pyinstaller pywin32 Pillow
+pip install pywebview keyboard pyinstaller pywin32 Pillow zstandard psutil
 
 echo.
 echo Building DEBUG EXE with console...
@@ -6,14 +6,16 @@ echo.
 
 REM Install dependencies
 echo Installing dependencies...
-python -m pip install pywebview keyboard pyinstaller pywin32 Pillow
+python -m pip install pywebview keyboard pyinstaller pywin32 Pillow zstandard psutil
 
 echo.
 echo Building EXE with page-1 assets...
 echo This may take a few minutes...
 echo.
 
-REM Use the spec file which includes all page-1 assets
+REM Release profile: pages pre-built by page_bundler.py, only assets reachable from kiosk-shell.html, no UPX on big DLLs,
+REM bytecode precompiled with -OO. Use "set KIOSK_BUILD=full" to bundle the whole page-1 folder.
+if "%KIOSK_BUILD%"=="" set KIOSK_BUILD=release
 python -m PyInstaller --clean KioskApp.spec
 
 echo.
@@ -26,4 +28,5 @@ echo IMPORTANT: The page-1 folder is bundled inside the EXE.
 echo The first page will be kiosk-shell.html with audio support.
 echo.
 echo To exit the app, press: Q five times quickly
+echo To measure bundle size and startup: python measure_startup.py
 pause
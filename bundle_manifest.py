@@ -0,0 +1,99 @@
+"""
+Bundle Manifest - which page assets the kiosk can actually reach
+Crawls from kiosk-shell.html through every page, script and stylesheet it references
+(src/href attributes, url(...), and quoted file names - the preloader's ASSET_MANIFEST
+and router page names are plain strings). A path built at runtime, like
+`corner-icons/${icon}`, pulls in that whole folder.
+
+KioskApp.spec uses this for the release build. Run directly to see what would ship:
+    python bundle_manifest.py
+    python bundle_manifest.py --unused     # files left out
+"""
+
+import os
+import re
+import sys
+from urllib.parse import unquote
+
+PAGE_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'page-1 (2)', 'page-1')
+ENTRY_PAGES = ('kiosk-shell.html',)   # kiosk_app.py loads the shell; everything else is reached from it
+TEXT_TYPES = ('.html', '.htm', '.js', '.css', '.json')
+
+# Never shipped even if something mentions them
+EXCLUDE_SUFFIXES = ('.es6.backup', '.py', '.pyc', '.map')
+EXCLUDE_NAMES = ('package.json', 'package-lock.json', 'node_modules', '__pycache__')
+
+_REFERENCE = re.compile(r'''(?:["'`]|url\(\s*)([^"'`()<>\n]{1,200}?)(?:["'`]|\s*\))''')
+_FOLDER = re.compile(r'''["'`]([\w\- ]+)/(?:\$\{|["'`]\s*\+)''')  # 'dir/' + name  or  `dir/${name}`
+
+
+def _excluded(rel_path):
+    parts = rel_path.replace('\\', '/').split('/')
+    return rel_path.endswith(EXCLUDE_SUFFIXES) or any(p in EXCLUDE_NAMES for p in parts)
+
+
+def _candidates(text):
+    for match in _REFERENCE.finditer(text):
+        ref = match.group(1).strip()
+        if ref.startswith(('http:', 'https:', 'data:', '//', '#', 'javascript:')):
+            continue
+        yield unquote(ref.split('?')[0].split('#')[0])
+
+
+def reachable_assets(root=PAGE_ROOT, entries=ENTRY_PAGES):
+    """Sorted relative paths of every file under root reachable from the entry pages"""
+    found = set()
+    pending = [e for e in entries if os.path.isfile(os.path.join(root, e))]
+    found.update(pending)
+    while pending:
+        rel = pending.pop()
+        base = os.path.dirname(rel)
+        with open(os.path.join(root, rel), 'r', encoding='utf-8', errors='ignore') as f:
+            text = f.read()
+
+        refs = set()
+        for ref in _candidates(text):
+            ref = ref.lstrip('./') if ref.startswith('./') else ref
+            # Relative to the referencing file, or to the page root (pages load from it)
+            for path in (os.path.normpath(os.path.join(base, ref)), os.path.normpath(ref),
+                         os.path.normpath(ref[len('page-1/'):]) if ref.startswith('page-1/') else None):
+                if path and not path.startswith('..') and os.path.isfile(os.path.join(root, path)):
+                    refs.add(path.replace('\\', '/'))
+        for folder in _FOLDER.findall(text):
+            folder_path = os.path.join(root, base, folder)
+            if os.path.isdir(folder_path):
+                for dirpath, dirnames, filenames in os.walk(folder_path):
+                    refs.update(os.path.relpath(os.path.join(dirpath, n), root).replace('\\', '/') for n in filenames)
+
+        for path in refs - found:
+            if _excluded(path):
+                continue
+            found.add(path)
+            if path.lower().endswith(TEXT_TYPES):
+                pending.append(path)
+    return sorted(found)
+
+
+def unused_assets(root=PAGE_ROOT, entries=ENTRY_PAGES):
+    """Files under root that the release build leaves out"""
+    reachable = set(reachable_assets(root, entries))
+    unused = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        for name in filenames:
+            rel = os.path.relpath(os.path.join(dirpath, name), root).replace('\\', '/')
+            if rel not in reachable:
+                unused.append(rel)
+    return sorted(unused)
+
+
+def _size(root, paths):
+    return sum(os.path.getsize(os.path.join(root, p)) for p in paths)
+
+
+if __name__ == '__main__':
+    show_unused = '--unused' in sys.argv
+    paths = unused_assets() if show_unused else reachable_assets()
+    for path in paths:
+        print(path)
+    print(f"{len(paths)} files, {_size(PAGE_ROOT, paths) / 1024 / 1024:.1f} MB "
+          f"{'left out' if show_unused else 'reachable from ' + ', '.join(ENTRY_PAGES)}")
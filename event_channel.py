@@ -0,0 +1,145 @@
+"""
+Event Channel - pushes kiosk events from Python into the page
+Printer status changes, finished print jobs, database syncs and watchdog actions
+are queued here and delivered to kiosk-shell in batches: at most one evaluate_js
+call per frame, however many events arrive. Events with the same key coalesce, so a
+page that was busy only sees the latest printer status, not every step in between.
+
+In the page, kiosk-events.js provides KioskEvents.subscribe(type, fn) - the shell
+forwards each batch into the iframe, so pages subscribe instead of polling.
+"""
+
+import json
+import threading
+import time
+import urllib.request
+
+from kiosk_log import log
+
+FRAME_SECONDS = 1 / 60    # one dispatch per frame at most
+MAX_PENDING = 256         # un-coalesced events (job results) kept while the page can't take them
+SYNC_URL = "http://localhost:3000/api/last-sync-time"
+SYNC_POLL_SECONDS = 5
+
+
+class EventChannel:
+    """Batches events and dispatches them to the current window from one thread"""
+
+    def __init__(self):
+        self.window = None          # set on each page load - a recreated window replaces it
+        self._pending = {}          # key -> event, insertion order is delivery order
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._failing = False
+        self.stats = {"emitted": 0, "coalesced": 0, "dropped": 0, "dispatches": 0, "delivered": 0}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="EventChannel", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def attach(self, window):
+        """Deliver to this window from now on - called once its page has loaded"""
+        self.window = window
+        self._wake.set()
+
+    def emit(self, event_type, data=None, key=None):
+        """Queue an event. Events sharing a key (default: the type) replace each other until sent."""
+        key = key or event_type
+        event = {"type": event_type, "data": data, "ts": int(time.time() * 1000)}
+        with self._lock:
+            self.stats["emitted"] += 1
+            if key in self._pending:
+                self.stats["coalesced"] += 1
+                del self._pending[key]  # Re-insert so it's delivered after older events
+            elif len(self._pending) >= MAX_PENDING:
+                del self._pending[next(iter(self._pending))]
+                self.stats["dropped"] += 1
+            self._pending[key] = event
+        self._wake.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self._wake.wait()
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            # Let a burst finish before dispatching - everything from this frame goes in one call
+            time.sleep(FRAME_SECONDS)
+            window = self.window
+            if window is None:
+                continue  # No page yet - events wait for attach()
+            with self._lock:
+                batch = list(self._pending.values())
+                self._pending.clear()
+            if not batch:
+                continue
+            started = time.perf_counter()
+            try:
+                window.evaluate_js("window.KioskEvents && window.KioskEvents._dispatch("
+                                   + json.dumps(batch, default=str) + ")")
+                self.stats["dispatches"] += 1
+                self.stats["delivered"] += len(batch)
+                if self._failing:
+                    log("✅ Event channel delivering again")
+                    self._failing = False
+            except Exception as e:
+                # Page is reloading or hung - the watchdog deals with that; these events are gone
+                if not self._failing:
+                    log(f"[WARNING] Event channel dispatch failed, {len(batch)} event(s) dropped: {e}")
+                    self._failing = True
+                self.stats["dropped"] += len(batch)
+            # Never more than one dispatch per frame, even if evaluate_js returned instantly
+            rest = FRAME_SECONDS - (time.perf_counter() - started)
+            if rest > 0:
+                time.sleep(rest)
+
+
+class SyncWatcher:
+    """Asks the local server for its last database sync once, for every page, and emits sync-finished.
+
+    Pages used to poll this themselves on a timer each - now only this thread does.
+    """
+
+    def __init__(self, events, url=SYNC_URL, interval=SYNC_POLL_SECONDS, on_sync=None):
+        self.events = events
+        self.url = url
+        self.interval = interval
+        self.on_sync = on_sync      # called before pages hear of the sync - e.g. to drop cached API data
+        self.last_sync = None
+        self._stop = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._loop, name="SyncWatcher", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        reachable = True
+        while not self._stop.wait(self.interval):
+            try:
+                with urllib.request.urlopen(self.url, timeout=3) as resp:
+                    data = json.loads(resp.read().decode("utf-8"))
+                if not reachable:
+                    log("✅ Sync watcher reached the local server again")
+                    reachable = True
+            except Exception as e:
+                if reachable:
+                    log(f"[WARNING] Sync watcher can't reach {self.url}: {e}")
+                    reachable = False
+                continue
+            sync_time = data.get("lastSyncTime")
+            if not sync_time:
+                continue
+            if self.last_sync is not None and sync_time > self.last_sync:
+                log("Database sync detected - notifying pages")
+                if self.on_sync:
+                    self.on_sync(sync_time)
+                self.events.emit("sync-finished", {"lastSyncTime": sync_time})
+            self.last_sync = sync_time
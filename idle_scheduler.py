@@ -0,0 +1,188 @@
+"""
+Idle Scheduler - runs maintenance work only while the kiosk sits on the screensaver
+The shell page reports idle/active through PrinterAPI.set_kiosk_idle. Jobs are
+generators: the scheduler runs one step at a time and stops between steps as soon
+as a customer touches the screen, so a pre-empted job resumes where it left off at
+the next idle period. Plain functions work too, but can't be interrupted.
+"""
+
+import os
+import json
+import hashlib
+import threading
+import time
+
+from kiosk_log import log
+
+IDLE_GRACE = 10      # seconds on the screensaver before jobs start - people often come straight back
+SLOW_STEP_MS = 50    # steps slower than this are logged - they delay pre-emption
+
+
+class _Job:
+    def __init__(self, name, func, every):
+        self.name = name
+        self.func = func
+        self.every = every
+        self.last_run = 0       # finish time of the last complete run
+        self.running = None     # generator of a run that was pre-empted
+        self.runs = 0
+        self.preemptions = 0
+        self.errors = 0
+
+
+class IdleScheduler:
+    """Runs registered jobs, one step at a time, only while the kiosk is idle"""
+
+    def __init__(self, grace=IDLE_GRACE):
+        self.grace = grace
+        self._jobs = []
+        self._idle = threading.Event()
+        self._idle_since = None
+        self._preempt_at = 0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {"preemptions": 0, "max_preempt_ms": 0, "slow_steps": 0}
+
+    def add_job(self, name, func, every):
+        """Run func every `every` seconds of wall time, whenever the kiosk is idle and it's due"""
+        self._jobs.append(_Job(name, func, every))
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="IdleScheduler", daemon=True)
+        self._thread.start()
+        log(f"Idle scheduler started with {len(self._jobs)} job(s): {', '.join(j.name for j in self._jobs)}")
+
+    def stop(self):
+        self._stop.set()
+        self._idle.clear()
+        self._wake.set()
+
+    def set_idle(self, idle):
+        if idle:
+            if not self._idle.is_set():
+                self._idle_since = time.time()
+                self._idle.set()
+                self._wake.set()
+        else:
+            self._preempt_at = time.perf_counter()
+            self._idle.clear()
+
+    @property
+    def idle(self):
+        return self._idle.is_set()
+
+    def status(self):
+        return {"idle": self.idle, "jobs": [{"name": j.name, "runs": j.runs, "preemptions": j.preemptions,
+                                             "errors": j.errors, "in_progress": j.running is not None,
+                                             "last_run": j.last_run or None} for j in self._jobs],
+                **self.stats}
+
+    # ---------- Loop ----------
+
+    def _loop(self):
+        # Normal OS priority on purpose: steps hold the GIL, and an idle-priority thread holding it
+        # would stall the UI and print threads on a busy CPU. Pre-emption between steps keeps out of their way.
+        while not self._stop.is_set():
+            if not self._idle.is_set():
+                self._wake.clear()
+                self._wake.wait(60)
+                continue
+            wait = self._idle_since + self.grace - time.time()
+            if wait > 0:
+                self._wake.clear()
+                self._wake.wait(wait)  # set_idle(False) doesn't wake us - we re-check idle after
+                continue
+            job = self._next_job()
+            if job is None:
+                self._wake.clear()
+                self._wake.wait(30)
+                continue
+            self._run(job)
+
+    def _next_job(self):
+        # Finish pre-empted runs first, then whatever is most overdue
+        for job in self._jobs:
+            if job.running is not None:
+                return job
+        now = time.time()
+        due = [j for j in self._jobs if now - j.last_run >= j.every]
+        return min(due, key=lambda j: j.last_run + j.every) if due else None
+
+    def _run(self, job):
+        try:
+            if job.running is None:
+                result = job.func()
+                if not hasattr(result, '__next__'):
+                    self._finished(job)  # Plain function - already done
+                    return
+                job.running = result
+            while True:
+                if not self._idle.is_set():
+                    job.preemptions += 1
+                    self.stats["preemptions"] += 1
+                    latency = (time.perf_counter() - self._preempt_at) * 1000
+                    self.stats["max_preempt_ms"] = max(self.stats["max_preempt_ms"], round(latency, 1))
+                    log(f"Idle job '{job.name}' paused for customer ({latency:.0f} ms)")
+                    return
+                started = time.perf_counter()
+                try:
+                    next(job.running)
+                except StopIteration:
+                    self._finished(job)
+                    return
+                step_ms = (time.perf_counter() - started) * 1000
+                if step_ms > SLOW_STEP_MS:
+                    self.stats["slow_steps"] += 1
+                    log(f"[WARNING] Idle job '{job.name}' step took {step_ms:.0f} ms - pre-emption was delayed")
+        except Exception as e:
+            job.errors += 1
+            job.running = None
+            job.last_run = time.time()  # Don't retry in a tight loop
+            log(f"❌ Idle job '{job.name}' failed: {e}")
+
+    def _finished(self, job):
+        job.running = None
+        job.runs += 1
+        job.last_run = time.time()
+        log(f"Idle job '{job.name}' done")
+
+
+# ---------- Built-in jobs ----------
+
+def asset_integrity_job(folder, baseline_path, block=256 * 1024):
+    """Hash the kiosk's page assets and compare them with the first run - catches disk corruption.
+
+    A generator: one step per block read, so pre-emption takes a few ms at most.
+    """
+    baseline = {}
+    if os.path.exists(baseline_path):
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    current = {}
+    for root, dirs, files in os.walk(folder):
+        dirs[:] = [d for d in dirs if d != 'node_modules']
+        for name in files:
+            path = os.path.join(root, name)
+            h = hashlib.blake2b(digest_size=16)
+            with open(path, "rb") as f:
+                while True:
+                    data = f.read(block)
+                    if not data:
+                        break
+                    h.update(data)
+                    yield
+            current[os.path.relpath(path, folder).replace(os.sep, '/')] = h.hexdigest()
+
+    changed = [p for p in current if p in baseline and baseline[p] != current[p]]
+    missing = [p for p in baseline if p not in current]
+    if changed or missing:
+        log(f"[WARNING] Asset integrity: {len(changed)} changed, {len(missing)} missing "
+            f"(e.g. {', '.join((changed + missing)[:5])})")
+    else:
+        log(f"✅ Asset integrity: {len(current)} files OK")
+    if not baseline:
+        # First run (or after an update deleted the baseline) records what "good" looks like
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(current, f)
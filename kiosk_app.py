@@ -1,62 +1,60 @@
 """
 Kiosk Mode Application - Debug Version with Logging
 Exit with: Press 'Q' key 5 times quickly
+Profile with: Press 'P' key 5 times quickly (results in the logs folder)
+
+Print engine workers re-import this module (as __mp_main__ under spawn), so importing it
+must stay cheap: the banner, the window toolkit and PrinterAPI only come up under __main__.
 """
 
-import webview
+import multiprocessing
+
+# Print engine worker processes re-run this exe - hand them straight to multiprocessing,
+# before the rest of the app is imported
+multiprocessing.freeze_support()
+
 import sys
 import os
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import win32print
-import winreg  # For Windows Registry modifications
-
-# Logging - saves to "logs" folder next to the exe
-# Get the directory where the EXE is located
-if getattr(sys, 'frozen', False):
-    EXE_DIR = os.path.dirname(sys.executable)
-else:
-    EXE_DIR = os.path.dirname(os.path.abspath(__file__))
-
-# Create logs folder next to exe
-LOGS_FOLDER = os.path.join(EXE_DIR, "logs")
-try:
-    os.makedirs(LOGS_FOLDER, exist_ok=True)
-except:
-    LOGS_FOLDER = EXE_DIR  # Fallback to exe folder
-
-# Log file with date stamp: logs_2025-12-09.txt
-LOG_FILE = os.path.join(LOGS_FOLDER, f"logs_{datetime.now().strftime('%Y-%m-%d')}.txt")
-
-def log(msg):
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    log_line = f"[{timestamp}] {msg}"
-    print(log_line)
-    sys.stdout.flush()
-    
-    # Write to log file
-    try:
-        with open(LOG_FILE, "a", encoding="utf-8") as f:
-            f.write(log_line + "\n")
-    except Exception as e:
-        print(f"[LOG ERROR] {e}")
 
-# Print paths at startup
-print("="*60)
-print(f"EXE Location: {EXE_DIR}")
-print(f"Logs Folder:  {LOGS_FOLDER}")
-print(f"Log File:     {LOG_FILE}")
-print("="*60)
+from kiosk_log import EXE_DIR, LOGS_FOLDER, LOG_FILE, log, log_event, compress_closed_days
+from print_journal import PrintJournal, QUEUED, PRINTING, DONE, FAILED, STATE_NAMES
+from receipt_archive import ReceiptArchive
+from print_engine import PrintEngine
+from print_coalescer import PrintCoalescer, content_key
+from webview_watchdog import WebViewWatchdog
+from print_pacing import PrintPacer, describe_status
+from kiosk_profiler import KioskProfiler
+from idle_scheduler import IdleScheduler, asset_integrity_job
+from event_channel import EventChannel, SyncWatcher
+from printer_profiles import match_profile, profile_for, get_profile, reload_profiles, select_code_page, encode_text, public_view
+from printer_router import PrinterRouter, HoldQueue, load_printer_group
+from api_cache import ApiCache, ApiProxy
+from ui_telemetry import UiTelemetry
+from runtime_config import RuntimeConfig
+from kiosk_supervisor import SupervisorLink
+from kiosk_platform import host
+
+# Print journal - sits next to the logs folder so queued jobs survive a crash
+JOURNAL_FOLDER = os.path.join(EXE_DIR, "journal")
+# Receipt archive - compressed copy of every payload, for reprints
+ARCHIVE_FOLDER = os.path.join(EXE_DIR, "receipts")
+
+# Release version - recorded in the watchdog trend log so leaks can be compared per release
+APP_VERSION = "1.0.0"
 
-log("=== KIOSK APP STARTING ===")
+# Most copies one print call may ask for - a bad page value shouldn't empty a paper roll
+MAX_COPIES = 5
 
-try:
-    import keyboard
-    log("keyboard library imported successfully")
-except Exception as e:
-    log(f"ERROR importing keyboard: {e}")
-    keyboard = None
+# Startup timing - the first frame is logged against this (imports done, bootloader unpacked)
+STARTED_AT = time.time()
+# Set by measure_startup.py: file to note the first frame in, after which the app closes itself
+STARTUP_PROBE = os.environ.get("KIOSK_STARTUP_PROBE")
+# Set when kiosk_supervisor.py started the app: health checks, and warm restarts that skip the one-time setup
+SUPERVISOR = SupervisorLink.from_env()
 
 
 class PrinterAPI:
@@ -65,6 +63,22 @@ class PrinterAPI:
     def __init__(self):
         self.selected_printer = None  # Will be set during startup
         self._kiosk_app = None  # Reference to KioskApp for shutdown
+        self._journal = None  # PrintJournal, opened at startup
+        self._archive = None  # ReceiptArchive, opened at startup
+        self._engine = None  # PrintEngine worker process, started at startup
+        self._coalescer = PrintCoalescer()  # Collapses double-taps into one job
+        self._profile = None  # Printer profile of selected_printer - layout and encoding settings
+        self._profiles = {}  # printer name -> profile, for fan-out targets other than selected_printer
+        self._router = None  # PrinterRouter over the printer group, set up on first use
+        self._hold = None  # HoldQueue for jobs no printer could take
+        self._events = EventChannel()  # Pushes printer, job, sync and watchdog events into the page
+        self._pacer = PrintPacer(on_status=self._printer_status_changed)  # Chunked, rate-adapted writes so slow printers aren't overrun
+        self._profiler = KioskProfiler()  # On-demand profiling - idle until started
+        self._scheduler = IdleScheduler()  # Maintenance jobs that only run on the screensaver
+        self._telemetry = UiTelemetry()  # Page transition, long task and asset timings from the shell
+        self._config = None  # RuntimeConfig - kiosk_config.json, watched, and the staff API behind it
+        self._printer_locks = {}  # printer name -> Lock, one job at a time per printer
+        self._printer_locks_guard = threading.Lock()
     
     def shutdown_kiosk(self):
         """Shutdown the kiosk application - called from JavaScript exit handler"""
@@ -78,262 +92,385 @@ class PrinterAPI:
             os._exit(0)
             return {"success": True, "message": "Force exit"}
     
-    def print_receipt_image(self, image_data_base64):
-        """Print receipt as image - preserves design. Called from JavaScript with base64 image."""
-        log("========== PRINT IMAGE RECEIPT ==========")
+    def set_kiosk_idle(self, idle):
+        """Called by kiosk-shell: true when the screensaver shows, false on the first touch"""
+        self._scheduler.set_idle(bool(idle))
+        return {"success": True}
+    
+    def report_ui_metrics(self, entries, sent_at=None):
+        """Called by kiosk-telemetry.js with a batch of performance entries - summarised per page in the logs"""
+        return {"success": True, "accepted": self._telemetry.ingest(entries, sent_at)}
+    
+    def get_ui_metrics(self):
+        """Per-page percentiles of the UI timings since the last summary was written"""
+        return {"success": True, "summary": self._telemetry.summary(), "stats": self._telemetry.stats}
+    
+    def _supervisor_health(self):
+        """Answer to kiosk_supervisor.py's ping - what a warm restart needs, and whether the page still answers"""
+        watchdog = self._kiosk_app.watchdog if self._kiosk_app else None
+        return {"printer": self.selected_printer,
+                "profile": self._profile["name"] if self._profile else None,
+                "page_silent": round(time.time() - watchdog.last_beat, 1) if watchdog else None}
+    
+    def _printer_self_check(self):
+        """Idle job - catch paper-out or offline before the next customer does"""
+        if not self.selected_printer:
+            return
+        status = self._printer_status(self.selected_printer)
+        if status["online"]:
+            log(f"✅ Printer self-check: {self.selected_printer} ready")
+        else:
+            log(f"[WARNING] Printer self-check: {self.selected_printer} - {describe_status(status)}")
+        self._printer_status_changed(self.selected_printer, status)
+    
+    def _printer_status(self, printer_name):
+        """Spooler status of a printer - the router probes group printers with this"""
+        return host.spooler.status(printer_name)
+    
+    def _printer_status_changed(self, printer_name, status):
+        """Tell the page - it can show "out of paper" before the customer reaches the print button"""
+        if self._router:
+            self._router.report_status(printer_name, status)
+        self._events.emit("printer-status", dict(status, printer=printer_name, message=describe_status(status)),
+                          key=f"printer-status:{printer_name}")
+    
+    def start_profiling(self, seconds=30, memory=True):
+        """Profile the kiosk process for a while - results go to the logs folder"""
         try:
-            import base64
-            from PIL import Image
-            import io
-            
-            printer_name = self.selected_printer
-            if not printer_name:
-                raise Exception("No printer selected!")
-            
-            log(f"Using printer: {printer_name}")
-            
-            # Decode base64 image
-            image_bytes = base64.b64decode(image_data_base64.split(',')[1] if ',' in image_data_base64 else image_data_base64)
-            image = Image.open(io.BytesIO(image_bytes))
-            
-            # Convert to grayscale and resize for 80mm printer (max width ~576 pixels for 203dpi)
-            image = image.convert('L')  # Grayscale
-            max_width = 576
-            if image.width > max_width:
-                ratio = max_width / image.width
-                new_height = int(image.height * ratio)
-                image = image.resize((max_width, new_height), Image.LANCZOS)
-            
-            log(f"Image size: {image.width}x{image.height}")
-            
-            # Convert to ESC/POS bitmap format
-            ESC = chr(27)
-            GS = chr(29)
-            
-            # Build print data
-            print_data = bytearray()
-            print_data.extend((ESC + '@').encode())  # Initialize
-            print_data.extend((ESC + 'a1').encode())  # Center align
-            
-            # Print image as raster bit image
-            width_bytes = (image.width + 7) // 8
-            
-            for y in range(image.height):
-                # GS v 0 - print raster bit image
-                print_data.extend(b'\x1d\x76\x30\x00')
-                print_data.append(width_bytes & 0xFF)
-                print_data.append((width_bytes >> 8) & 0xFF)
-                print_data.append(1)  # 1 row at a time
-                print_data.append(0)
-                
-                row_data = bytearray()
-                for x_byte in range(width_bytes):
-                    byte_val = 0
-                    for bit in range(8):
-                        x = x_byte * 8 + bit
-                        if x < image.width:
-                            pixel = image.getpixel((x, y))
-                            if pixel < 128:  # Dark pixel
-                                byte_val |= (0x80 >> bit)
-                    row_data.append(byte_val)
-                print_data.extend(row_data)
-            
-            # Feed and cut
-            print_data.extend(b'\n\n\n\n\n')
-            print_data.extend((ESC + 'i').encode())  # Cut
-            
-            # Send to printer
-            hPrinter = win32print.OpenPrinter(printer_name)
+            return self._profiler.start(seconds, memory)
+        except Exception as e:
+            log(f"❌ Could not start profiling: {e}")
+            return {"success": False, "message": str(e)}
+    
+    def get_printer_profile(self):
+        """Paper width, dots and columns of the selected printer - pages size receipt images with it"""
+        profile = self._printer_profile()
+        return {"success": True, "profile": public_view(profile)}
+    
+    def _printer_profile(self):
+        """Profile for selected_printer - forced in kiosk_config.json, or matched on first use"""
+        if self._profile is None:
+            forced = self._config.config["profile"] if self._config else None
+            if forced:
+                self._profile = get_profile(forced)
+            else:
+                self._profile = profile_for(self.selected_printer, _printer_driver(self.selected_printer))
+        return self._profile
+    
+    # ---------- Live reconfiguration ----------
+    
+    def get_kiosk_config(self, pin):
+        """Staff only - printer, profile and tunables in use, and what they can be changed to"""
+        try:
+            if self._config is None:
+                raise Exception("Runtime config not started")
+            self._config.check_pin(pin)
+            return dict(self._config.describe(), success=True, printer=self.selected_printer,
+                        profile=self._printer_profile()["name"])
+        except Exception as e:
+            return {"success": False, "message": str(e)}
+    
+    def set_kiosk_config(self, pin, changes):
+        """Staff only - e.g. {"printer": "EPSON TM-T82 Back"} or {"tunables": {"max_copies": 2}}, applied live"""
+        try:
+            if self._config is None:
+                raise Exception("Runtime config not started")
+            result = self._config.update(pin, changes)
+            return dict(result, success=True, message=f"Applied in {result['seconds']}s" if result["changed"] else "No change")
+        except Exception as e:
+            log(f"❌ Config change refused: {e}")
+            return {"success": False, "message": str(e)}
+    
+    def _apply_config(self, changes):
+        """Rebuild only what a config change touches - RuntimeConfig calls this from its watcher or the staff API"""
+        if changes.get("profiles_file"):
+            reload_profiles()
+            self._profiles = {}
+        switched = "printer" in changes and changes["printer"] != self.selected_printer
+        if switched:
+            log(f"Switching printer: {self.selected_printer} -> {changes['printer']}")
+            self.selected_printer = changes["printer"]
+        if switched or "profile" in changes or changes.get("profiles_file"):
+            self._profile = None
+            profile = self._printer_profile()
+            self._pacer.forget(self.selected_printer)  # Chunking learned under the old profile
+            log(f"Printer profile: {profile['name']} ({profile['paper_mm']}mm, {profile['dots']} dots)")
+        if switched or changes.get("group_file"):
+            self._rebuild_routing()
+        self._set_tunables(changes.get("tunables", {}))
+        if switched:
+            threading.Thread(target=self._printer_self_check, name="PrinterCheck", daemon=True).start()
+        self._events.emit("config-changed", {"printer": self.selected_printer,
+                                             "profile": public_view(self._printer_profile()),
+                                             "changed": sorted(changes)})
+    
+    def _set_tunables(self, tunables):
+        """Tunables that live on the kiosk's own objects - RuntimeConfig sets the module-level ones"""
+        global MAX_COPIES
+        if "max_copies" in tunables:
+            MAX_COPIES = tunables["max_copies"]
+        if "dedupe_window" in tunables:
+            self._coalescer.window = tunables["dedupe_window"]
+        if "idle_grace" in tunables:
+            self._scheduler.grace = tunables["idle_grace"]
+    
+    def _rebuild_routing(self):
+        """New printer group after a switch or a printer_group.json edit - held jobs and printer health carry over"""
+        if self._router is None:
+            return  # Built on first use, from the new settings
+        printers, strategy = load_printer_group(self.selected_printer)
+        router = PrinterRouter(printers, self._printer_status, strategy=strategy)
+        router.adopt(self._router)
+        router.on_available = self._hold.wake
+        self._hold.router = router
+        self._router = router
+        self._hold.wake()
+    
+    def preview_receipt_data(self, data):
+        """PNGs of the receipt print_receipt_data would print, from the same bytes - no paper used"""
+        try:
+            profile = self._printer_profile()
+            payload = encode_text(profile, self._receipt_data_text(data, profile))
+            return {"success": True, "images": self._preview_images(payload, profile)}
+        except Exception as e:
+            log(f"❌ Preview error: {e}")
+            return {"success": False, "message": str(e)}
+    
+    def preview_receipt_image(self, image_data_base64):
+        """The receipt image as the printer will burn it - resized to the head and thresholded"""
+        try:
+            from receipt_imaging import StripRaster
+            profile = self._printer_profile()
+            raster = StripRaster(image_data_base64, profile["dots"], rows_per_command=profile["max_band_rows"])
             try:
-                hJob = win32print.StartDocPrinter(hPrinter, 1, ("Kiosk Receipt Image", None, "RAW"))
-                try:
-                    win32print.StartPagePrinter(hPrinter)
-                    win32print.WritePrinter(hPrinter, bytes(print_data))
-                    win32print.EndPagePrinter(hPrinter)
-                finally:
-                    win32print.EndDocPrinter(hPrinter)
+                payload = b"".join(raster)
             finally:
-                win32print.ClosePrinter(hPrinter)
+                raster.close()
+            return {"success": True, "images": self._preview_images(payload, profile)}
+        except Exception as e:
+            log(f"❌ Preview error: {e}")
+            return {"success": False, "message": str(e)}
+    
+    def _preview_images(self, payload, profile):
+        """Render ESC/POS with the virtual printer - data: URLs, one per cut receipt"""
+        import base64
+        from virtual_printer import render_png
+        return ["data:image/png;base64," + base64.b64encode(png).decode("ascii") for png in render_png(payload, profile)]
+    
+    def print_receipt_image(self, image_data_base64, order_number=None, idempotency_key=None, copies=1, printers=None):
+        """Print receipt as image - preserves design. Called from JavaScript with base64 image.
+
+        copies / printers: e.g. copies=2 for a customer and a counter copy, printers=[...] to
+        print on several printers at once. The image is rendered once and sent to all of them.
+        """
+        key = idempotency_key or content_key("print_receipt_image", self.selected_printer, image_data_base64,
+                                             order_number, copies, printers)
+        return self._coalescer.run(key, lambda: self._print_receipt_image(image_data_base64, order_number,
+                                                                          copies, printers))
+    
+    def _print_receipt_image(self, image_data_base64, order_number=None, copies=1, printers=None):
+        """Body of print_receipt_image - runs once per coalesced request"""
+        log("========== PRINT IMAGE RECEIPT ==========")
+        try:
+            if self._is_fan_out(copies, printers):
+                def render(profile):
+                    raster = self._raster(image_data_base64, profile)
+                    try:
+                        return b"".join(raster)
+                    finally:
+                        raster.close()
+                return self._fan_out("Kiosk Receipt Image", render, order_number, copies, printers)
+            
+            if not self.selected_printer:
+                raise Exception("No printer selected!")
             
-            log(f"✅ Image print sent to {printer_name}")
-            return {"success": True, "message": f"Printed to {printer_name}"}
+            # Send to printer - the best one in the group, or the hold queue
+            result = self._print_routed("Kiosk Receipt Image", lambda profile: self._raster(image_data_base64, profile),
+                                        order_number=order_number)
+            log(f"✅ Image print sent to {result.get('printer', 'the hold queue')}")
+            return result
         except Exception as e:
             log(f"❌ Print image error: {e}")
             return {"success": False, "message": str(e)}
     
-    def print_receipt_data(self, data):
+    def print_receipt_data(self, data, idempotency_key=None, copies=1, printers=None):
         """Print receipt from structured data using exact ESC/POS commands (Matches thermal_printer.py)"""
+        key = idempotency_key or content_key("print_receipt_data", self.selected_printer, data, copies, printers)
+        return self._coalescer.run(key, lambda: self._print_receipt_data(data, copies, printers))
+    
+    def _print_receipt_data(self, data, copies=1, printers=None):
+        """Body of print_receipt_data - runs once per coalesced request"""
         log("========== PRINT DATA RECEIPT ==========")
         try:
-            printer_name = self.selected_printer
-            if not printer_name:
+            if self._is_fan_out(copies, printers):
+                return self._fan_out("Kiosk Receipt Data",
+                                     lambda profile: encode_text(profile, self._receipt_data_text(data, profile)),
+                                     data.get('orderNumber'), copies, printers)
+            
+            if not self.selected_printer:
                 raise Exception("No printer selected! Please restart and select a printer.")
             
-            log(f"Using printer: {printer_name}")
             log(f"Receipt data: {data}")
             
-            # ESC/POS commands
-            ESC = chr(27)
-            INIT = ESC + '@'
-            CENTER = ESC + 'a1'
-            LEFT = ESC + 'a0'
-            BOLD_ON = ESC + 'E1'
-            BOLD_OFF = ESC + 'E0'
-            CUT = ESC + 'i'
-            LF = chr(10)
-            
-            # Helper for formatting rows
-            def format_row(label, value, width=42):
-                space = width - len(str(label)) - len(str(value))
-                if space < 1: space = 1
-                return str(label) + " " * space + str(value)
-
-            receipt = []
-            receipt.append(INIT)
-            receipt.append(CENTER)
-            
-            # Header
-            receipt.append(BOLD_ON + "TIMEZONE" + BOLD_OFF)
-            receipt.append("www.timezonegames.com")
-            receipt.append("")
-            
-            # Location & Date
-            if data.get('locationName'):
-                receipt.append(BOLD_ON + str(data.get('locationName')) + BOLD_OFF)
-            
-            now = datetime.now()
-            receipt.append(now.strftime('%d/%m/%Y %I:%M %p'))
-            receipt.append("")
-            
-            receipt.append(LEFT)
-            receipt.append("-" * 42)
-            
-            # Message
-            receipt.append(CENTER)
-            receipt.append(BOLD_ON + "PLEASE PROCEED TO COUNTER" + BOLD_OFF)
-            receipt.append(BOLD_ON + "FOR PAYMENT" + BOLD_OFF)
-            receipt.append("")
-            
-            # Order Number
-            order_num = data.get('orderNumber', '----')
-            receipt.append(BOLD_ON + f"ORDER #: {order_num}" + BOLD_OFF)
-            receipt.append("")
-            
-            receipt.append(LEFT)
-            receipt.append("-" * 42)
-            
-            # Items Section
-            receipt.append(BOLD_ON + "ITEMS:" + BOLD_OFF)
-            receipt.append("")
-            
-            items = data.get('items', [])
-            for item in items:
-                # Item Label
-                receipt.append(item.get('label', ''))
-                # Cost and Tizo on next line or same line? 
-                # Let's do: Label ...... Cost
-                #           ............. Tizo
-                cost = item.get('cost', '')
-                tizo = item.get('tizo', '')
-                
-                if cost:
-                    receipt.append(format_row("  Price:", cost))
-                if tizo:
-                    receipt.append(format_row("  Tizo:", tizo))
-                receipt.append("")
-
-            receipt.append("-" * 42)
-            
-            # Totals
-            total_pay = data.get('totalPayment', '0')
-            total_tizo = data.get('totalTizo', '0')
-            
-            receipt.append(format_row(BOLD_ON + "TOTAL PAYMENT:", total_pay + BOLD_OFF))
-            receipt.append(format_row(BOLD_ON + "TOTAL TIZO:", total_tizo + BOLD_OFF))
-            
-            receipt.append("=" * 42)
-            receipt.append(CENTER)
-            receipt.append(BOLD_ON + "TERIMA KASIH!" + BOLD_OFF)
-            receipt.append("")
-            receipt.append(LF + LF + LF + LF)
-            receipt.append(CUT)
-            
-            final_text = "\n".join(receipt)
-            
-            # Send to printer
-            hPrinter = win32print.OpenPrinter(printer_name)
-            try:
-                hJob = win32print.StartDocPrinter(hPrinter, 1, ("Kiosk Receipt Data", None, "RAW"))
-                try:
-                    win32print.StartPagePrinter(hPrinter)
-                    win32print.WritePrinter(hPrinter, final_text.encode('utf-8'))
-                    win32print.EndPagePrinter(hPrinter)
-                finally:
-                    win32print.EndDocPrinter(hPrinter)
-            finally:
-                win32print.ClosePrinter(hPrinter)
-            
-            log(f"✅ Data print sent to {printer_name}")
-            return {"success": True, "message": f"Printed to {printer_name}"}
+            # Send to printer - the best one in the group, or the hold queue
+            result = self._print_routed("Kiosk Receipt Data",
+                                        lambda profile: encode_text(profile, self._receipt_data_text(data, profile)),
+                                        order_number=data.get('orderNumber'))
+            log(f"✅ Data print sent to {result.get('printer', 'the hold queue')}")
+            return result
         except Exception as e:
             log(f"❌ Print data error: {e}")
             return {"success": False, "message": str(e)}
 
-    def print_receipt(self, receipt_text=None):
+    def _receipt_data_text(self, data, profile):
+        """ESC/POS text of a structured-data receipt - shared by printing and preview"""
+        cols = profile["columns"]["A"]
+
+        # ESC/POS commands
+        ESC = chr(27)
+        INIT = ESC + '@' + select_code_page(profile)
+        CENTER = ESC + 'a1'
+        LEFT = ESC + 'a0'
+        BOLD_ON = ESC + 'E1'
+        BOLD_OFF = ESC + 'E0'
+        CUT = ESC + 'i'
+        LF = chr(10)
+
+        # Helper for formatting rows
+        def format_row(label, value, width=cols):
+            space = width - len(str(label)) - len(str(value))
+            if space < 1: space = 1
+            return str(label) + " " * space + str(value)
+
+        receipt = []
+        receipt.append(INIT)
+        receipt.append(CENTER)
+
+        # Header
+        receipt.append(BOLD_ON + "TIMEZONE" + BOLD_OFF)
+        receipt.append("www.timezonegames.com")
+        receipt.append("")
+
+        # Location & Date
+        if data.get('locationName'):
+            receipt.append(BOLD_ON + str(data.get('locationName')) + BOLD_OFF)
+
+        now = datetime.now()
+        receipt.append(now.strftime('%d/%m/%Y %I:%M %p'))
+        receipt.append("")
+
+        receipt.append(LEFT)
+        receipt.append("-" * cols)
+
+        # Message
+        receipt.append(CENTER)
+        receipt.append(BOLD_ON + "PLEASE PROCEED TO COUNTER" + BOLD_OFF)
+        receipt.append(BOLD_ON + "FOR PAYMENT" + BOLD_OFF)
+        receipt.append("")
+
+        # Order Number
+        order_num = data.get('orderNumber', '----')
+        receipt.append(BOLD_ON + f"ORDER #: {order_num}" + BOLD_OFF)
+        receipt.append("")
+
+        receipt.append(LEFT)
+        receipt.append("-" * cols)
+
+        # Items Section
+        receipt.append(BOLD_ON + "ITEMS:" + BOLD_OFF)
+        receipt.append("")
+
+        items = data.get('items', [])
+        for item in items:
+            # Item Label
+            receipt.append(item.get('label', ''))
+            # Cost and Tizo on next line or same line? 
+            # Let's do: Label ...... Cost
+            #           ............. Tizo
+            cost = item.get('cost', '')
+            tizo = item.get('tizo', '')
+
+            if cost:
+                receipt.append(format_row("  Price:", cost))
+            if tizo:
+                receipt.append(format_row("  Tizo:", tizo))
+            receipt.append("")
+
+        receipt.append("-" * cols)
+
+        # Totals
+        total_pay = data.get('totalPayment', '0')
+        total_tizo = data.get('totalTizo', '0')
+
+        receipt.append(format_row(BOLD_ON + "TOTAL PAYMENT:", total_pay + BOLD_OFF))
+        receipt.append(format_row(BOLD_ON + "TOTAL TIZO:", total_tizo + BOLD_OFF))
+
+        receipt.append("=" * cols)
+        receipt.append(CENTER)
+        receipt.append(BOLD_ON + "TERIMA KASIH!" + BOLD_OFF)
+        receipt.append("")
+        receipt.append(LF + LF + LF + LF)
+        receipt.append(CUT)
+
+        return "\n".join(receipt)
+
+    def print_receipt(self, receipt_text=None, idempotency_key=None, copies=1, printers=None):
         """Print thermal receipt - called from JavaScript with receipt content"""
+        key = idempotency_key or content_key("print_receipt", self.selected_printer, receipt_text, copies, printers)
+        return self._coalescer.run(key, lambda: self._print_receipt(receipt_text, copies, printers))
+    
+    def _print_receipt(self, receipt_text=None, copies=1, printers=None):
+        """Body of print_receipt - runs once per coalesced request"""
         log("========== PRINT BUTTON CLICKED ==========")
         log("Printing thermal receipt...")
         try:
-            # Use the selected printer
-            printer_name = self.selected_printer
-            if not printer_name:
-                raise Exception("No printer selected! Please restart and select a printer.")
-            
-            log(f"Using printer: {printer_name}")
+            if self._is_fan_out(copies, printers):
+                return self._fan_out("Kiosk Receipt",
+                                     lambda profile: encode_text(profile, self._receipt_text(receipt_text, profile)),
+                                     None, copies, printers)
             
-            # Use provided receipt text from webpage, or fallback to test receipt
-            if receipt_text:
-                log("Using receipt content from webpage")
-                # Add ESC/POS commands for thermal printer
-                ESC = chr(27)
-                INIT = ESC + '@'
-                LF = chr(10)
-                final_text = INIT + receipt_text + LF + LF + LF + LF + ESC + 'i'
-            else:
-                log("No receipt text provided - using test receipt")
-                final_text = self._make_receipt()
-            
-            hPrinter = win32print.OpenPrinter(printer_name)
-            try:
-                hJob = win32print.StartDocPrinter(hPrinter, 1, ("Kiosk Receipt", None, "RAW"))
-                try:
-                    win32print.StartPagePrinter(hPrinter)
-                    win32print.WritePrinter(hPrinter, final_text.encode('utf-8'))
-                    win32print.EndPagePrinter(hPrinter)
-                finally:
-                    win32print.EndDocPrinter(hPrinter)
-            finally:
-                win32print.ClosePrinter(hPrinter)
+            if not self.selected_printer:
+                raise Exception("No printer selected! Please restart and select a printer.")
             
-            log(f"✅ Print sent to {printer_name}")
-            return {"success": True, "message": f"Printed to {printer_name}"}
+            # The best printer in the group, or the hold queue
+            result = self._print_routed("Kiosk Receipt",
+                                        lambda profile: encode_text(profile, self._receipt_text(receipt_text, profile)))
+            log(f"✅ Print sent to {result.get('printer', 'the hold queue')}")
+            return result
         except Exception as e:
             log(f"❌ Print error: {e}")
             return {"success": False, "message": str(e)}
     
-    def print_receipt_html(self, html_content):
+    def _receipt_text(self, receipt_text, profile):
+        """ESC/POS text for print_receipt"""
+        # Use provided receipt text from webpage, or fallback to test receipt
+        if receipt_text:
+            log("Using receipt content from webpage")
+            # Add ESC/POS commands for thermal printer
+            ESC = chr(27)
+            INIT = ESC + '@' + select_code_page(profile)
+            LF = chr(10)
+            return INIT + receipt_text + LF + LF + LF + LF + ESC + 'i'
+        log("No receipt text provided - using test receipt")
+        return self._make_receipt(profile)
+    
+    def print_receipt_html(self, html_content, idempotency_key=None):
         """Print receipt from HTML content - directly converts HTML to ESC/POS for thermal printing."""
+        key = idempotency_key or content_key("print_receipt_html", self.selected_printer, html_content)
+        return self._coalescer.run(key, lambda: self._print_receipt_html(html_content))
+    
+    def _print_receipt_html(self, html_content):
+        """Body of print_receipt_html - runs once per coalesced request"""
         log("========== PRINT HTML RECEIPT ==========")
         try:
             import re
             from html.parser import HTMLParser
             
-            printer_name = self.selected_printer
-            if not printer_name:
+            if not self.selected_printer:
                 raise Exception("No printer selected! Please restart and select a printer.")
             
-            log(f"Using printer: {printer_name}")
             log(f"HTML content length: {len(html_content)}")
+            HR = "\x00hr"  # Rule - drawn as wide as the paper of whichever printer takes the job
             
             # Simple HTML to text converter
             class HTMLToText(HTMLParser):
@@ -355,7 +492,7 @@ class PrinterAPI:
                             self.lines.append(self.current_line.strip())
                         self.current_line = ""
                         if tag == 'hr':
-                            self.lines.append("-" * 42)
+                            self.lines.append(HR)
                     elif tag in ['div', 'p']:
                         if self.current_line.strip():
                             self.lines.append(self.current_line.strip())
@@ -403,89 +540,418 @@ class PrinterAPI:
             
             log(f"Parsed {len(text_lines)} lines from HTML")
             
-            # Build ESC/POS receipt
-            ESC = chr(27)
-            INIT = ESC + '@'
-            CENTER = ESC + 'a1'
-            LEFT = ESC + 'a0'
-            BOLD_ON = ESC + 'E1'
-            BOLD_OFF = ESC + 'E0'
-            CUT = ESC + 'i'
-            LF = chr(10)
-            
-            receipt = [INIT, CENTER]
-            
-            # Add TIMEZONE header
-            receipt.append(BOLD_ON + "TIMEZONE" + BOLD_OFF)
-            receipt.append("www.timezonegames.com")
-            receipt.append("")
-            receipt.append(LEFT)
-            receipt.append("=" * 42)
-            
-            # Add parsed content
-            for line in text_lines:
-                # Skip empty display:none style artifacts
-                if not line or line == "none" or line.startswith("display"):
-                    continue
-                # Clean up the line
-                clean_line = re.sub(r'\s+', ' ', line).strip()
-                if clean_line:
-                    receipt.append(clean_line)
-            
-            # Add footer
-            receipt.append("=" * 42)
-            receipt.append(CENTER)
-            receipt.append(BOLD_ON + "TERIMA KASIH!" + BOLD_OFF)
-            receipt.append("")
-            receipt.append(LF + LF + LF + LF)
-            receipt.append(CUT)
-            
-            final_text = "\n".join(receipt)
-            log(f"Final receipt text length: {len(final_text)}")
+            def layout(profile):
+                """Build the ESC/POS receipt for the printer that takes the job - width and code page differ"""
+                cols = profile["columns"]["A"]
+                ESC = chr(27)
+                INIT = ESC + '@' + select_code_page(profile)
+                CENTER = ESC + 'a1'
+                LEFT = ESC + 'a0'
+                BOLD_ON = ESC + 'E1'
+                BOLD_OFF = ESC + 'E0'
+                CUT = ESC + 'i'
+                LF = chr(10)
+                
+                receipt = [INIT, CENTER]
+                
+                # Add TIMEZONE header
+                receipt.append(BOLD_ON + "TIMEZONE" + BOLD_OFF)
+                receipt.append("www.timezonegames.com")
+                receipt.append("")
+                receipt.append(LEFT)
+                receipt.append("=" * cols)
+                
+                # Add parsed content
+                for line in text_lines:
+                    if line == HR:
+                        receipt.append("-" * cols)
+                        continue
+                    # Skip empty display:none style artifacts
+                    if not line or line == "none" or line.startswith("display"):
+                        continue
+                    # Clean up the line
+                    clean_line = re.sub(r'\s+', ' ', line).strip()
+                    if clean_line:
+                        receipt.append(clean_line)
+                
+                # Add footer
+                receipt.append("=" * cols)
+                receipt.append(CENTER)
+                receipt.append(BOLD_ON + "TERIMA KASIH!" + BOLD_OFF)
+                receipt.append("")
+                receipt.append(LF + LF + LF + LF)
+                receipt.append(CUT)
+                
+                final_text = "\n".join(receipt)
+                log(f"Final receipt text length: {len(final_text)} ({profile['name']})")
+                return encode_text(profile, final_text)
             
             # Send to printer
-            hPrinter = win32print.OpenPrinter(printer_name)
-            try:
-                hJob = win32print.StartDocPrinter(hPrinter, 1, ("Kiosk Receipt HTML", None, "RAW"))
-                try:
-                    win32print.StartPagePrinter(hPrinter)
-                    win32print.WritePrinter(hPrinter, final_text.encode('utf-8'))
-                    win32print.EndPagePrinter(hPrinter)
-                finally:
-                    win32print.EndDocPrinter(hPrinter)
-            finally:
-                win32print.ClosePrinter(hPrinter)
-            
-            log(f"✅ HTML receipt printed to {printer_name}")
-            return {"success": True, "message": f"Printed to {printer_name}"}
+            result = self._print_routed("Kiosk Receipt HTML", layout)
+            log(f"✅ HTML receipt printed to {result.get('printer', 'the hold queue')}")
+            return result
         except Exception as e:
             log(f"❌ Print HTML error: {e}")
             import traceback
             log(traceback.format_exc())
             return {"success": False, "message": str(e)}
     
-    def _make_receipt(self):
+    def reprint(self, order_number):
+        """Reprint the last receipt for an order number from the archive - no re-rendering"""
+        log(f"========== REPRINT ORDER {order_number} ==========")
+        try:
+            if not self.selected_printer:
+                raise Exception("No printer selected! Please restart and select a printer.")
+            if not self._archive:
+                raise Exception("Receipt archive is not available")
+            
+            entry, payload = self._archive.latest(order_number)
+            if payload is None:
+                raise Exception(f"No archived receipt for order {order_number}")
+            
+            printed_at = datetime.fromtimestamp(entry["ts"]).strftime('%Y-%m-%d %H:%M:%S')
+            log(f"Found {entry['doc']} from {printed_at} ({entry['raw_length']} bytes)")
+            # Archived bytes are laid out for the printer they were printed on - only that model can take them
+            result = self._print_routed("Kiosk Reprint", lambda _profile: payload, archive=False,
+                                        laid_out_for=entry.get("printer") or self.selected_printer)
+            if result.get("held"):
+                return result
+            
+            log(f"✅ Reprint sent to {result['printer']}")
+            return {"success": True, "message": f"Reprinted order {order_number} to {result['printer']}",
+                    "printer": result["printer"]}
+        except Exception as e:
+            log(f"❌ Reprint error: {e}")
+            return {"success": False, "message": str(e)}
+    
+    def _raster(self, image_data_base64, profile):
+        """Raster job for a receipt image at the profile's head width - iterate it for the ESC/POS bands"""
+        from receipt_imaging import StripRaster
+        if "gs_v0" not in profile["raster_modes"]:
+            raise Exception(f"Printer profile {profile['name']} has no supported raster mode")
+        # Decode, grayscale, resize to the printer's head width and encode band by band,
+        # streaming each band to the printer - memory stays flat for tall receipts.
+        # The work runs in the print engine process when it's up, so the UI stays responsive.
+        max_width, rows_per_command = profile["dots"], profile["max_band_rows"]
+        if self._engine:
+            raster = self._engine.raster(image_data_base64, max_width, rows_per_command=rows_per_command)
+        else:
+            raster = StripRaster(image_data_base64, max_width, rows_per_command=rows_per_command)
+        log(f"Image size: {raster.width}x{raster.height} (source {raster.source_size[0]}x{raster.source_size[1]})")
+        return raster
+    
+    def _profile_for(self, printer_name):
+        """Profile of any printer - fan-out targets may be different models"""
+        if printer_name == self.selected_printer:
+            return self._printer_profile()
+        profile = self._profiles.get(printer_name)
+        if profile is None:
+            profile = self._profiles[printer_name] = profile_for(printer_name, _printer_driver(printer_name))
+        return profile
+    
+    def _is_fan_out(self, copies, printers):
+        return (copies or 1) != 1 or bool(printers) and list(printers) != [self.selected_printer]
+    
+    def _fan_out(self, doc_name, render, order_number=None, copies=1, printers=None):
+        """Render once per printer model, send every copy to every printer at the same time.
+
+        render(profile) returns the payload bytes. Each printer gets one spooler job holding
+        all its copies (each copy ends in a cut). Returns one result for JS with a line per printer.
+        """
+        copies = max(1, min(int(copies or 1), MAX_COPIES))
+        targets = list(dict.fromkeys(p for p in (printers or [self.selected_printer]) if p))
+        if not targets:
+            raise Exception("No printer selected! Please restart and select a printer.")
+        log(f"Fan-out: {copies} copy(ies) to {', '.join(targets)}")
+        
+        payloads = {}  # profile name -> payload, rendered once
+        jobs = []
+        for name in targets:
+            profile = self._profile_for(name)
+            if profile["name"] not in payloads:
+                payloads[profile["name"]] = render(profile)
+            jobs.append((name, payloads[profile["name"]]))
+        
+        def send(name, payload):
+            try:
+                self._send_raw(name, doc_name, payload * copies, order_number=order_number, archive=False)
+                return {"printer": name, "success": True, "copies": copies}
+            except Exception as e:
+                return {"printer": name, "success": False, "copies": 0, "message": str(e)}
+        
+        if len(jobs) == 1:
+            results = [send(*jobs[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=len(jobs), thread_name_prefix="FanOut") as pool:
+                results = list(pool.map(lambda job: send(*job), jobs))
+        
+        printed = [r for r in results if r["success"]]
+        if printed and self._archive:
+            # One copy is enough for a reprint
+            first = printed[0]["printer"]
+            self._archive.store(dict(jobs)[first], order_number, doc_name, first)
+        failed = [r for r in results if not r["success"]]
+        message = f"Printed {copies} copy(ies) to {', '.join(r['printer'] for r in printed)}" if printed else "Nothing printed"
+        if failed:
+            message += "; failed: " + ", ".join(f"{r['printer']} ({r['message']})" for r in failed)
+            log(f"[WARNING] Fan-out: {message}")
+        else:
+            log(f"✅ Fan-out: {message}")
+        return {"success": not failed, "partial": bool(printed and failed), "message": message, "results": results}
+
+    def _routing(self):
+        """(router, hold queue) for the printer group - built on first use, after a printer is selected"""
+        if self._router is None:
+            printers, strategy = load_printer_group(self.selected_printer)
+            router = PrinterRouter(printers, self._printer_status, strategy=strategy)
+            self._hold = HoldQueue(router, self._deliver_held)
+            router.on_available = self._hold.wake
+            self._router = router
+        return self._router, self._hold
+
+    def _other_models(self, router, printer_name):
+        """Group printers that can't take a payload laid out for printer_name - a different profile"""
+        profile = self._profile_for(printer_name)["name"]
+        return [name for name in router.printers if self._profile_for(name)["name"] != profile]
+
+    def _print_routed(self, doc_name, render, order_number=None, archive=True, laid_out_for=None):
+        """Send a job to the best printer in the group, moving on when one fails, or hold it.
+
+        render(profile) returns the payload for that printer (bytes or a raster job). A payload
+        that can't be re-rendered passes laid_out_for, the printer it was made for, and only goes
+        to printers with the same profile. A held job is journaled now and printed by the hold
+        queue when a printer is back - the result is still a success (with held: True) so the
+        page does not retry into a duplicate.
+        """
+        router, hold = self._routing()
+        tried = self._other_models(router, laid_out_for) if laid_out_for else []
+        delay = 0.5
+        while True:
+            name = router.acquire(exclude=tried)
+            if name is None:
+                break
+            try:
+                payload = render(self._profile_for(name))
+            except Exception:
+                router.release(name, None)
+                raise
+            try:
+                self._send_raw(name, doc_name, payload, order_number=order_number, archive=archive)
+            except Exception as e:
+                router.release(name, False, e)
+                tried.append(name)
+                if router.available(exclude=tried):
+                    log(f"[WARNING] {name} failed - trying the next printer in {delay}s")
+                    time.sleep(delay)
+                    delay *= 2
+                continue
+            finally:
+                if hasattr(payload, "close"):
+                    payload.close()
+            router.release(name, True)
+            return {"success": True, "message": f"Printed to {name}", "printer": name}
+
+        # Nothing can take it - hold it until a printer comes back, for printers of the model it is laid out for
+        target = laid_out_for or router.printers[0]
+        payload = render(self._profile_for(target))
+        if not isinstance(payload, (bytes, bytearray)):
+            raster = payload
+            try:
+                payload = b"".join(raster)
+            finally:
+                raster.close()
+        job_id = self._journal.begin(target, doc_name, payload, order=order_number) if self._journal else None
+        item = {"job": job_id, "doc": doc_name, "payload": payload, "order": order_number,
+                "archive": archive, "held_at": time.time(), "exclude": self._other_models(router, target)}
+        if not hold.hold(item):
+            if job_id is not None:
+                self._journal.mark(job_id, FAILED)
+            raise Exception("No printer available and the hold queue is full")
+        self._events.emit("print-job", {"printer": None, "doc": doc_name, "order": order_number,
+                                        "success": True, "held": True}, key=f"print-job:held:{item['held_at']}")
+        return {"success": True, "held": True,
+                "message": "Printer unavailable - the receipt will print as soon as a printer is back"}
+
+    def _deliver_held(self, item, printer_name):
+        """Print one held or replayed job - called from the hold queue thread, raises if the printer fails"""
+        started = time.perf_counter()
+        kind = "replay" if item.get("replay") else "held"
+        if item["job"] is not None:
+            self._journal.mark(item["job"], PRINTING)
+        try:
+            self._write_printer(printer_name, f"{item['doc']} ({kind})", item["payload"])
+        except Exception as e:
+            if item["job"] is not None:
+                self._journal.mark(item["job"], QUEUED)  # Still held - replayed on restart if we stop now
+            log(f"❌ {kind.capitalize()} job {item['doc']} failed on {printer_name}: {e}")
+            raise
+        if item["job"] is not None:
+            self._journal.mark(item["job"], DONE)
+        if item["archive"] and self._archive:
+            self._archive.store(item["payload"], item["order"], item["doc"], printer_name)
+        held_s = round(time.time() - item["held_at"], 1)
+        log_event(kind if kind == "replay" else "print",
+                  f"✅ {kind.capitalize()} job printed: {item['doc']} -> {printer_name} after {held_s}s",
+                  printer=printer_name, doc=item["doc"], order=item["order"], bytes=len(item["payload"]),
+                  duration_ms=round((time.perf_counter() - started) * 1000), held_s=held_s, success=True)
+        self._events.emit("print-job", {"printer": printer_name, "doc": item["doc"], "order": item["order"],
+                                        "success": True, "held_s": held_s},
+                          key=f"print-job:{kind}:{item['held_at']}")
+
+    def get_printer_group_status(self):
+        """Health of each printer in the group and how many jobs are held"""
+        router, hold = self._routing()
+        return {"success": True, "strategy": router.strategy, "printers": router.status(), "held": len(hold)}
+
+    def get_print_stats(self):
+        """Per-printer throughput, chunk size, stalls and last status from the write pacer"""
+        return {"success": True, "stats": self._pacer.stats()}
+    
+    def _write_printer(self, printer_name, doc_name, payload):
+        """Write raw ESC/POS to the printer spooler - payload is bytes or an iterable of byte chunks"""
+        chunks = [payload] if isinstance(payload, (bytes, bytearray)) else payload
+        profile = self._profile_for(printer_name)
+        with self._printer_lock(printer_name):
+            with host.spooler.open_job(printer_name, doc_name) as job:
+                self._pacer.write(printer_name, chunks, job.write, status=job.status, profile=profile)
+
+    def _printer_lock(self, printer_name):
+        """Lock that serialises jobs to one printer - concurrent JS calls queue up here"""
+        with self._printer_locks_guard:
+            lock = self._printer_locks.get(printer_name)
+            if lock is None:
+                lock = self._printer_locks[printer_name] = threading.Lock()
+            return lock
+
+    def _send_raw(self, printer_name, doc_name, payload, order_number=None, archive=True):
+        """Journal and archive the payload while sending it - a crash mid-print is replayed on next start.
+
+        payload is bytes, or an iterable of byte chunks that is streamed to the printer as it is
+        produced. Streamed jobs are sealed in the journal once the last chunk is written, so only
+        a crash while the chunks are still being rendered loses the job.
+        """
+        started = time.perf_counter()
+        streamed = not isinstance(payload, (bytes, bytearray))
+        sent = [0 if streamed else len(payload)]
+        journal = self._journal
+        archive = archive and self._archive
+        writer = self._archive.stream(order_number, doc_name, printer_name) if archive and streamed else None
+        
+        job_id = None
+        if journal:
+            job_id = journal.begin(printer_name, doc_name, None if streamed else payload, order=order_number)
+            journal.mark(job_id, PRINTING)
+        
+        def tee(chunks):
+            for chunk in chunks:
+                sent[0] += len(chunk)
+                if job_id is not None:
+                    journal.append(job_id, chunk)
+                if writer:
+                    writer.write(chunk)
+                yield chunk
+            if job_id is not None:
+                journal.seal(job_id)
+        
+        try:
+            if streamed:
+                self._write_printer(printer_name, doc_name, tee(payload))
+            else:
+                self._write_printer(printer_name, doc_name, payload)
+        except Exception as e:
+            if job_id is not None:
+                journal.mark(job_id, FAILED)
+            log_event("print", f"Print job failed: {doc_name} -> {printer_name} ({e})", level="error",
+                      printer=printer_name, doc=doc_name, order=order_number, bytes=sent[0],
+                      duration_ms=round((time.perf_counter() - started) * 1000), success=False, error=str(e))
+            self._events.emit("print-job", {"printer": printer_name, "doc": doc_name, "order": order_number,
+                                            "success": False, "error": str(e)},
+                              key=f"print-job:{job_id if job_id is not None else started}")
+            raise
+        if job_id is not None:
+            journal.mark(job_id, DONE)
+        duration_ms = round((time.perf_counter() - started) * 1000)
+        log_event("print", f"Print job done: {doc_name} -> {printer_name}, {sent[0]} bytes in {duration_ms} ms",
+                  printer=printer_name, doc=doc_name, order=order_number, bytes=sent[0],
+                  duration_ms=duration_ms, success=True)
+        self._events.emit("print-job", {"printer": printer_name, "doc": doc_name, "order": order_number,
+                                        "success": True, "duration_ms": duration_ms},
+                          key=f"print-job:{job_id if job_id is not None else started}")
+        if writer:
+            writer.commit()
+        elif archive:
+            self._archive.store(payload, order_number, doc_name, printer_name)
+
+    def _replay_journal(self):
+        """Re-send jobs that were queued or printing when the kiosk last stopped.
+
+        Replays go through the printer group like new jobs: a failed printer hands the job to the
+        next one, and with none up it joins the hold queue (still QUEUED in the journal) instead
+        of being marked failed.
+        """
+        if not self._journal or not self._journal.pending:
+            return
+        log(f"========== REPLAYING {len(self._journal.pending)} JOURNALED JOB(S) ==========")
+        router, hold = self._routing()
+        for job in self._journal.pending:
+            meta = job["meta"]
+            state = STATE_NAMES.get(job["replay_state"], job["replay_state"])
+            if not job["sealed"]:
+                # Payload never finished being written - nothing safe to print
+                log(f"❌ Journal job {job['id']} ({meta['doc']}) was {state} with an incomplete payload - dropped")
+                self._journal.mark(job["id"], FAILED)
+                continue
+
+            log(f"Replaying journal job {job['id']} ({meta['doc']}, was {state}, for {meta['printer']})")
+            # The payload is laid out for the printer it was journaled for - keep it to that model
+            item = {"job": job["id"], "doc": meta["doc"], "payload": self._journal.payload(job),
+                    "order": meta.get("order"), "archive": True, "held_at": time.time(), "replay": True,
+                    "exclude": self._other_models(router, meta["printer"])}
+            tried = list(item["exclude"])
+            name = router.acquire(exclude=tried)
+            while name is not None:
+                try:
+                    self._deliver_held(item, name)
+                except Exception as e:
+                    router.release(name, False, e)
+                    tried.append(name)
+                    name = router.acquire(exclude=tried)
+                    continue
+                router.release(name, True)
+                break
+            if name is not None:
+                continue
+            self._journal.mark(job["id"], QUEUED)
+            if hold.hold(item):
+                log(f"[WARNING] Journal job {job['id']} held until a printer is back")
+            else:
+                # Stays QUEUED in the journal - the next start tries it again
+                log(f"[WARNING] Hold queue full - journal job {job['id']} left for the next start")
+        self._journal.pending = []
+
+    def _make_receipt(self, profile):
         """Generate receipt text"""
         now = datetime.now()
+        cols = profile["columns"]["A"]
         ESC = chr(27)
-        INIT = ESC + '@'  # Initialize printer
+        INIT = ESC + '@' + select_code_page(profile)  # Initialize printer, then pick the code page
         LF = chr(10)  # Line feed
         
         lines = [
             INIT,  # Initialize printer first
             ESC + 'a1',  # Center
             ESC + 'E1' + "TEST RECEIPT" + ESC + 'E0',
-            "80mm Thermal Print Test",
+            f"{profile['paper_mm']}mm Thermal Print Test",
             "Kiosk Application",
             ESC + 'a0',  # Left align
-            "=" * 42,
+            "=" * cols,
             f"Date: {now.strftime('%Y-%m-%d %H:%M:%S')}",
-            "-" * 42,
-            "Test Item 1" + " " * 20 + "$10.00",
-            "Test Item 2" + " " * 20 + "$25.00",
-            "=" * 42,
+            "-" * cols,
+            "Test Item 1".ljust(cols - 6) + "$10.00",
+            "Test Item 2".ljust(cols - 6) + "$25.00",
+            "=" * cols,
             ESC + 'E1' + "TOTAL: $35.00" + ESC + 'E0',
-            "=" * 42,
+            "=" * cols,
             ESC + 'a1',  # Center
             "THANK YOU!",
             "",
@@ -499,120 +965,21 @@ class PrinterAPI:
 
 
 
-# Global printer API instance
-printer_api = PrinterAPI()
-
-
-def configure_kiosk_mode():
-    """Configure Windows 10 for kiosk mode - disable edge swipes and gestures"""
-    log("Configuring Windows 10 kiosk mode...")
-    
-    try:
-        # Disable Edge Swipe (for touch screens)
-        key_path = r"SOFTWARE\Policies\Microsoft\Windows\EdgeUI"
-        try:
-            key = winreg.CreateKey(winreg.HKEY_LOCAL_MACHINE, key_path)
-            winreg.SetValueEx(key, "AllowEdgeSwipe", 0, winreg.REG_DWORD, 0)
-            winreg.CloseKey(key)
-            log("Edge swipe disabled")
-        except PermissionError:
-            log("[WARNING] No admin - edge swipe NOT disabled")
-        except Exception as e:
-            log(f"[WARNING] Edge swipe config failed: {e}")
-        
-        # Disable Action Center (multiple locations for better blocking)
-        # Location 1: Policy for all users
-        key_path = r"SOFTWARE\Policies\Microsoft\Windows\Explorer"
-        try:
-            key = winreg.CreateKey(winreg.HKEY_LOCAL_MACHINE, key_path)
-            winreg.SetValueEx(key, "DisableNotificationCenter", 0, winreg.REG_DWORD, 1)
-            winreg.CloseKey(key)
-            log("Action Center disabled (HKLM Policy)")
-        except PermissionError:
-            log("[WARNING] No admin - action center HKLM NOT disabled")
-        except Exception as e:
-            log(f"[WARNING] Action center HKLM failed: {e}")
-        
-        # Location 2: Current user
-        try:
-            key = winreg.CreateKey(winreg.HKEY_CURRENT_USER, key_path)
-            winreg.SetValueEx(key, "DisableNotificationCenter", 0, winreg.REG_DWORD, 1)
-            winreg.CloseKey(key)
-            log("Action Center disabled (HKCU)")
-        except Exception as e:
-            log(f"[WARNING] Action center HKCU failed: {e}")
-        
-        # Location 3: Additional blocking via Settings
-        key_path = r"SOFTWARE\Microsoft\Windows\CurrentVersion\PushNotifications"
-        try:
-            key = winreg.CreateKey(winreg.HKEY_CURRENT_USER, key_path)
-            winreg.SetValueEx(key, "ToastEnabled", 0, winreg.REG_DWORD, 0)
-            winreg.CloseKey(key)
-            log("Notifications/toasts disabled")
-        except Exception as e:
-            log(f"[WARNING] Toast config failed: {e}")
-        
-        # Force Group Policy refresh to apply immediately
-        import subprocess
-        try:
-            subprocess.run(["gpupdate", "/force"], capture_output=True, timeout=10)
-            log("Group Policy refreshed")
-        except:
-            log("[WARNING] Could not refresh Group Policy")
-        
-        # Auto-hide taskbar (prevent swipe from bottom revealing it)
-        key_path = r"SOFTWARE\Microsoft\Windows\CurrentVersion\Explorer\StuckRects3"
-        try:
-            key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, key_path, 0, winreg.KEY_READ | winreg.KEY_WRITE)
-            # Get current settings
-            try:
-                settings = winreg.QueryValueEx(key, "Settings")[0]
-                # Modify byte 8 to enable auto-hide (set bit 0)
-                settings_list = list(settings)
-                if len(settings_list) > 8:
-                    settings_list[8] = settings_list[8] | 0x01  # Set auto-hide bit
-                    winreg.SetValueEx(key, "Settings", 0, winreg.REG_BINARY, bytes(settings_list))
-                    log("Taskbar auto-hide enabled")
-            except:
-                log("[WARNING] Could not modify taskbar settings")
-            winreg.CloseKey(key)
-        except PermissionError:
-            log("[WARNING] No permission - taskbar NOT hidden")
-        except Exception as e:
-            log(f"[WARNING] Taskbar config failed: {e}")
-            
-        log("Kiosk mode configured")
-        
-    except Exception as e:
-        log(f"[WARNING] Kiosk config error: {e}")
+# The printer API instance (printer_api) is created under __main__ - see the module docstring
 
 
-def restore_windows_settings():
-    """Restore Windows settings when kiosk closes"""
-    log("Restoring Windows settings...")
+def _printer_driver(printer_name):
+    """Driver name of a printer - helps match a profile when the queue was renamed"""
+    if not printer_name:
+        return None
     try:
-        # Re-enable Edge Swipe
-        try:
-            key = winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, r"SOFTWARE\Policies\Microsoft\Windows\EdgeUI", 0, winreg.KEY_SET_VALUE)
-            winreg.DeleteValue(key, "AllowEdgeSwipe")
-            winreg.CloseKey(key)
-        except:
-            pass
-        
-        # Re-enable Action Center
-        try:
-            key = winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, r"SOFTWARE\Policies\Microsoft\Windows\Explorer", 0, winreg.KEY_SET_VALUE)
-            winreg.DeleteValue(key, "DisableNotificationCenter")
-            winreg.CloseKey(key)
-        except:
-            pass
-            
-        log("Windows settings restored")
+        return host.spooler.driver(printer_name)
     except Exception as e:
-        log(f"[WARNING] Restore error: {e}")
+        log(f"[WARNING] Could not read driver of {printer_name}: {e}")
+        return None
 
 
-def select_printer():
+def select_printer(configured=None):
     """Show printer selection menu in CMD before kiosk starts"""
     import sys
     
@@ -622,10 +989,13 @@ def select_printer():
         log(f"Printer specified via command line: {printer_name}")
         return printer_name
     
-    # Check for explicit --select flag to show menu, otherwise use default
+    # Check for explicit --select flag to show menu, otherwise use kiosk_config.json or the default
     if '--select' not in sys.argv:
+        if configured:
+            log(f"Printer from kiosk_config.json: {configured}")
+            return configured
         try:
-            default_printer = win32print.GetDefaultPrinter()
+            default_printer = host.spooler.default_printer()
             log(f"Auto-selecting default printer: {default_printer}")
             print(f"Auto-selecting default printer: {default_printer}")
             return default_printer
@@ -639,9 +1009,7 @@ def select_printer():
     
     # Get available printers
     try:
-        flags = win32print.PRINTER_ENUM_LOCAL | win32print.PRINTER_ENUM_CONNECTIONS
-        printers = win32print.EnumPrinters(flags)
-        printer_list = [p[2] for p in printers]
+        printer_list = host.spooler.printers()
     except Exception as e:
         print(f"\n[ERROR] Error getting printers: {e}")
         printer_list = []
@@ -650,17 +1018,18 @@ def select_printer():
         print("\n[WARNING] No printers found!")
         print("Using default printer...")
         try:
-            return win32print.GetDefaultPrinter()
+            return host.spooler.default_printer()
         except:
             return None
     
     # Show printer list
-    default_printer = win32print.GetDefaultPrinter()
+    default_printer = host.spooler.default_printer()
     print("\nAvailable Printers:\n")
     
     for idx, printer in enumerate(printer_list, 1):
         marker = " <- DEFAULT" if printer == default_printer else ""
-        thermal = " [THERMAL]" if '80mm' in printer.lower() or 'pos' in printer.lower() else ""
+        profile = match_profile(printer)
+        thermal = f" [THERMAL {profile['paper_mm']}mm]" if profile else ""
         print(f"   {idx}. {printer}{marker}{thermal}")
     
     print(f"\n   0. Use default ({default_printer})")
@@ -707,9 +1076,14 @@ def select_printer():
 class KioskApp:
     def __init__(self):
         self.window = None
+        self.start_url = None
+        self.watchdog = None  # WebViewWatchdog, started on the first page load
+        self.api_url = None  # ApiProxy address, handed to the pages as ?api=
         self.running = True
         self.q_press_count = 0
         self.last_q_time = 0
+        self.p_press_count = 0
+        self.last_p_time = 0
         log("KioskApp initialized")
     
     def print_receipt(self):
@@ -723,42 +1097,17 @@ class KioskApp:
                 raise Exception("No thermal printer found or printer is offline")
             
             log(f"Using printer: {printer_name}")
-            receipt_text = self._generate_receipt_text()
+            profile = profile_for(printer_name, _printer_driver(printer_name))
+            receipt_text = self._generate_receipt_text(profile)
             
-            hPrinter = win32print.OpenPrinter(printer_name)
-            try:
-                # Check printer status
-                printer_info = win32print.GetPrinter(hPrinter, 2)
-                status = printer_info.get('Status', 0)
-                
-                if status != 0:  # 0 = Ready
-                    # Common status codes:
-                    # 0x00000001 = Paused
-                    # 0x00000002 = Error
-                    # 0x00000004 = Pending Deletion
-                    # 0x00000008 = Paper Jam
-                    # 0x00000010 = Paper Out
-                    # 0x00000020 = Manual Feed
-                    # 0x00000040 = Paper Problem
-                    # 0x00000080 = Offline
-                    if status & 0x00000080:
-                        raise Exception("Printer is OFFLINE. Please turn on the printer.")
-                    elif status & 0x00000010:
-                        raise Exception("Printer is OUT OF PAPER")
-                    elif status & 0x00000008:
-                        raise Exception("PAPER JAM detected")
-                    else:
-                        raise Exception(f"Printer error (status: {status})")
-                
-                hJob = win32print.StartDocPrinter(hPrinter, 1, ("Kiosk Receipt", None, "RAW"))
-                try:
-                    win32print.StartPagePrinter(hPrinter)
-                    win32print.WritePrinter(hPrinter, receipt_text.encode('utf-8'))
-                    win32print.EndPagePrinter(hPrinter)
-                finally:
-                    win32print.EndDocPrinter(hPrinter)
-            finally:
-                win32print.ClosePrinter(hPrinter)
+            # Check printer status
+            status = host.spooler.status(printer_name)
+            if not status["online"]:
+                message = describe_status(status)
+                raise Exception(message + ". Please turn on the printer." if message == "Printer is OFFLINE" else message)
+            
+            with host.spooler.open_job(printer_name, "Kiosk Receipt") as job:
+                job.write(encode_text(profile, receipt_text))
             
             log(f"✅ Print sent to {printer_name}")
             return {"success": True, "message": f"Printed to {printer_name}"}
@@ -769,18 +1118,14 @@ class KioskApp:
     def _find_thermal_printer(self):
         """Find thermal printer, prefer 80mm Series Printer"""
         try:
-            flags = win32print.PRINTER_ENUM_LOCAL | win32print.PRINTER_ENUM_CONNECTIONS
-            printers = win32print.EnumPrinters(flags)
-            
-            # First, try to find 80mm Series Printer
-            for printer in printers:
-                printer_name = printer[2]
-                if '80mm' in printer_name.lower() or 'series' in printer_name.lower():
+            # First, try to find a printer with a receipt printer profile
+            for printer_name in host.spooler.printers():
+                if match_profile(printer_name):
                     log(f"Found thermal printer: {printer_name}")
                     return printer_name
             
             # Fallback to default printer
-            default = win32print.GetDefaultPrinter()
+            default = host.spooler.default_printer()
             log(f"Using default printer: {default}")
             return default
             
@@ -788,9 +1133,10 @@ class KioskApp:
             log(f"Error finding printer: {e}")
             return None
     
-    def _generate_receipt_text(self):
+    def _generate_receipt_text(self, profile):
         """Generate receipt content with ESC/POS commands"""
         now = datetime.now()
+        cols = profile["columns"]["A"]
         txn_id = f"TXN-{now.strftime('%Y%m%d%H%M%S')}"
         
         ESC = chr(27)
@@ -801,28 +1147,29 @@ class KioskApp:
         CUT = ESC + 'i'
         
         receipt = []
+        receipt.append(ESC + '@' + select_code_page(profile))
         receipt.append(CENTER)
         receipt.append(BOLD_ON + "TEST RECEIPT" + BOLD_OFF)
-        receipt.append("Thermal Printer Test - 80mm")
+        receipt.append(f"Thermal Printer Test - {profile['paper_mm']}mm")
         receipt.append("Kiosk Application")
         receipt.append("Sample Business Name")
         receipt.append(LEFT)
-        receipt.append("=" * 42)
+        receipt.append("=" * cols)
         receipt.append(f"Transaction ID: {txn_id}")
         receipt.append(f"Date: {now.strftime('%m/%d/%Y')}")
         receipt.append(f"Time: {now.strftime('%H:%M:%S')}")
-        receipt.append("-" * 42)
+        receipt.append("-" * cols)
         receipt.append(BOLD_ON + "ITEMS PURCHASED:" + BOLD_OFF)
         receipt.append("")
         receipt.append("Test Item 1" + " " * 20 + "$10.00")
         receipt.append("Test Item 2 x 2" + " " * 15 + "$25.00")
         receipt.append("Test Item 3" + " " * 20 + "$15.50")
-        receipt.append("-" * 42)
+        receipt.append("-" * cols)
         receipt.append("Subtotal:" + " " * 25 + "$50.50")
         receipt.append("Tax (8%):" + " " * 25 + "$4.04")
-        receipt.append("=" * 42)
+        receipt.append("=" * cols)
         receipt.append(BOLD_ON + "TOTAL:" + " " * 28 + "$54.54" + BOLD_OFF)
-        receipt.append("=" * 42)
+        receipt.append("=" * cols)
         receipt.append("Payment Method:" + " " * 18 + "CASH")
         receipt.append("Amount Paid:" + " " * 21 + "$60.00")
         receipt.append("Change:" + " " * 27 + "$5.46")
@@ -840,12 +1187,12 @@ class KioskApp:
     def close_app(self):
         """Close the application"""
         log(">>> CLOSING APP <<<")
+        if SUPERVISOR:
+            SUPERVISOR.bye()  # Closed on purpose - not a crash to restart from
         self.running = False
-        if keyboard:
-            try:
-                keyboard.unhook_all()
-            except:
-                pass
+        host.unhook_keys()
+        if self.watchdog:
+            self.watchdog.stop()  # Don't let it "recover" the window we're closing
         if self.window:
             try:
                 self.window.destroy()
@@ -872,37 +1219,25 @@ class KioskApp:
                 
                 if self.q_press_count >= 5:
                     self.close_app()
+            
+            # Profile: Press P 5 times within 2 seconds (staff - when the kiosk feels slow)
+            if event.name == 'p' and event.event_type == 'down':
+                current_time = time.time()
+                if current_time - self.last_p_time < 2:
+                    self.p_press_count += 1
+                else:
+                    self.p_press_count = 1
+                self.last_p_time = current_time
+                
+                if self.p_press_count >= 5:
+                    self.p_press_count = 0
+                    printer_api.start_profiling()
         except Exception as e:
             log(f"Error in key handler: {e}")
     
     def setup_keyboard(self):
-        """Setup keyboard hooks"""
-        if not keyboard:
-            log("WARNING: keyboard library not available!")
-            return
-        
-        try:
-            # Hook all keys to monitor
-            keyboard.hook(self.on_key_event)
-            log("Keyboard hook installed")
-            
-            # Try to block keys (requires admin)
-            try:
-                keyboard.block_key('left windows')
-                keyboard.block_key('right windows')
-                log("Windows keys blocked")
-            except Exception as e:
-                log(f"Could not block Windows keys: {e}")
-            
-            try:
-                # Block Alt+Tab by blocking tab when alt is pressed
-                keyboard.add_hotkey('alt+tab', lambda: None, suppress=True)
-                log("Alt+Tab suppressed")
-            except Exception as e:
-                log(f"Could not suppress Alt+Tab: {e}")
-                
-        except Exception as e:
-            log(f"Error setting up keyboard: {e}")
+        """Setup keyboard hooks - Q x5 exits, P x5 profiles"""
+        host.hook_keys(self.on_key_event)
     
     def get_html_content(self):
         return '''<!DOCTYPE html>
@@ -1151,6 +1486,86 @@ class KioskApp:
 </body>
 </html>'''
     
+    def _create_window(self, start_url):
+        """Create the fullscreen kiosk window and hook its page-load handler"""
+        import webview
+        window = webview.create_window(
+            title='Kiosk',
+            url=start_url,
+            fullscreen=True,
+            frameless=True,
+            easy_drag=False,
+            on_top=True,
+            focus=True,
+            js_api=printer_api,
+        )
+        
+        # Add event handler for when page loads - re-expose API and override print
+        def on_loaded():
+            log("Page loaded event triggered")
+            try:
+                # Inject JavaScript - block right-click, use native print for CSS styling
+                js_code = """
+                (function() {
+                    console.log('=== KIOSK MODE LOADED ===');
+                    
+                    // Block right-click context menu
+                    document.addEventListener('contextmenu', function(e) {
+                        e.preventDefault();
+                        return false;
+                    }, true);
+                    console.log('Right-click context menu disabled');
+                    
+                    // DO NOT override window.print() - let it use native browser print
+                    // This ensures CSS @media print styles are respected for proper receipt formatting
+                    console.log('Native browser print enabled - CSS @media print styles will be applied');
+                })();
+                """
+                window.evaluate_js(js_code)
+                log("Successfully injected print override (Direct HTML method)")
+            except Exception as e:
+                log(f"Error injecting JS: {e}")
+            
+            # Events go to whichever window loaded last - a recreated window takes over here
+            printer_api._events.attach(window)
+            
+            # Watch renderer memory and responsiveness once the first page is up
+            if self.watchdog is None:
+                self._first_frame()
+                self.watchdog = WebViewWatchdog(window, self.start_url, recreate=self.recreate_window,
+                                                release=APP_VERSION, on_action=lambda action, reason:
+                                                printer_api._events.emit("watchdog", {"action": action,
+                                                                                      "reason": reason}))
+                self.watchdog.start()
+        
+        window.events.loaded += on_loaded
+        return window
+    
+    def _first_frame(self):
+        """First page is up - log how long startup took, and report it when measure_startup.py asks"""
+        now = time.time()
+        log_event("startup", f"First frame {round((now - STARTED_AT) * 1000)} ms after startup",
+                  duration_ms=round((now - STARTED_AT) * 1000))
+        if SUPERVISOR:
+            SUPERVISOR.ready(round((now - STARTED_AT) * 1000))
+        if STARTUP_PROBE:
+            import json
+            with open(STARTUP_PROBE, "w", encoding="utf-8") as f:
+                json.dump({"first_frame": now, "started_at": STARTED_AT}, f)
+            threading.Timer(1, self.close_app).start()
+    
+    def recreate_window(self):
+        """Replace a hung window with a fresh one - called by the watchdog"""
+        old_window = self.window
+        log("Recreating kiosk window...")
+        # Open the new window first - destroying the last window would end webview.start()
+        self.window = self._create_window(self.start_url)
+        try:
+            old_window.destroy()
+        except Exception as e:
+            log(f"[WARNING] Could not destroy old window: {e}")
+        return self.window
+    
     def run(self):
         """Run the kiosk application"""
         log("Setting up keyboard...")
@@ -1183,14 +1598,26 @@ class KioskApp:
                 if os.path.exists(alt_path):
                     page1_path = alt_path
                 log(f"Checking alternate path: {alt_path}")
-        
+
+        # Ahead-of-time page bundle (page_bundler.py) - release builds ship it as page-1,
+        # in dev mode it is used while it is newer than the pages
+        if not getattr(sys, 'frozen', False) and '--no-bundle' not in sys.argv:
+            from page_bundler import BUNDLE_DIR, is_fresh
+            if os.path.exists(os.path.join(BUNDLE_DIR, 'kiosk-shell.html')):
+                if is_fresh(BUNDLE_DIR, page1_path):
+                    page1_path = BUNDLE_DIR
+                else:
+                    log("[WARNING] page-bundle is older than the pages - run python page_bundler.py. Using the pages as they are")
+
         log(f"Using page-1 folder: {page1_path}")
+        printer_api._scheduler.add_job("asset-integrity", lambda: asset_integrity_job(
+            page1_path, os.path.join(EXE_DIR, f"asset_hashes-{APP_VERSION}.json")), 24 * 3600)
         
         start_file = os.path.join(page1_path, 'kiosk-shell.html')
         log(f"Looking for kiosk-shell.html at: {start_file}")
         
         if os.path.exists(start_file):
-            start_url = f"file:///{start_file.replace(os.sep, '/')}"
+            start_url = host.file_url(start_file)
             log(f"Loading local file: {start_url}")
         else:
             log(f"ERROR: kiosk-shell.html not found at {start_file}")
@@ -1200,47 +1627,16 @@ class KioskApp:
             except:
                 pass
             # Fallback - try to load from any available location
-            start_url = f"file:///{start_file.replace(os.sep, '/')}"
+            start_url = host.file_url(start_file)
         
-        log("Creating kiosk window...")
-        self.window = webview.create_window(
-            title='Kiosk',
-            url=start_url,
-            fullscreen=True,
-            frameless=True,
-            easy_drag=False,
-            on_top=True,
-            focus=True,
-            js_api=printer_api,
-        )
+        if self.api_url:
+            # api-config.js sends the pages' API calls to the caching proxy
+            from urllib.parse import quote
+            start_url += "?api=" + quote(self.api_url, safe="")
         
-        # Add event handler for when page loads - re-expose API and override print
-        def on_loaded():
-            log("Page loaded event triggered")
-            try:
-                # Inject JavaScript - block right-click, use native print for CSS styling
-                js_code = """
-                (function() {
-                    console.log('=== KIOSK MODE LOADED ===');
-                    
-                    // Block right-click context menu
-                    document.addEventListener('contextmenu', function(e) {
-                        e.preventDefault();
-                        return false;
-                    }, true);
-                    console.log('Right-click context menu disabled');
-                    
-                    // DO NOT override window.print() - let it use native browser print
-                    // This ensures CSS @media print styles are respected for proper receipt formatting
-                    console.log('Native browser print enabled - CSS @media print styles will be applied');
-                })();
-                """
-                self.window.evaluate_js(js_code)
-                log("Successfully injected print override (Direct HTML method)")
-            except Exception as e:
-                log(f"Error injecting JS: {e}")
-        
-        self.window.events.loaded += on_loaded
+        log("Creating kiosk window...")
+        self.start_url = start_url
+        self.window = self._create_window(start_url)
         
         log("Starting webview...")
         
@@ -1252,11 +1648,12 @@ class KioskApp:
         }
         
         try:
+            import webview
             # Try starting with GPU acceleration disabled (fixes hangs on some laptops)
             webview.start(
                 debug=True,  # Enable debug mode to see console
                 http_server=False,  # Don't start HTTP server
-                gui='edgechromium',  # Force Edge WebView2
+                gui=host.webview_gui,  # Edge WebView2 on Windows, GTK/Qt on Linux
                 # private_mode=False,  # Normal mode
             )
         except Exception as e:
@@ -1266,31 +1663,124 @@ class KioskApp:
 
 
 if __name__ == '__main__':
-    log("Script started")
-    log(f"Running as admin: {os.name == 'nt' and __import__('ctypes').windll.shell32.IsUserAnAdmin()}")
+    if '--supervise' in sys.argv:
+        # Release build: KioskApp.exe --supervise runs the supervisor, which starts KioskApp.exe again
+        from kiosk_supervisor import main as supervise
+        sys.exit(supervise())
+    
+    # Print paths at startup
+    print("="*60)
+    print(f"EXE Location: {EXE_DIR}")
+    print(f"Logs Folder:  {LOGS_FOLDER}")
+    print(f"Log File:     {LOG_FILE}")
+    print("="*60)
     
-    # Step 0: Configure Windows kiosk mode
-    configure_kiosk_mode()
+    log(f"=== KIOSK APP STARTING ({host.name}) ===")
+    printer_api = PrinterAPI()
     
-    # Step 1: Select printer in CMD
-    selected_printer = select_printer()
+    # A warm restart from the supervisor - kiosk mode is set up and the printer is known already
+    warm = SUPERVISOR.warm if SUPERVISOR else None
+    if SUPERVISOR:
+        SUPERVISOR.start(printer_api._supervisor_health)
+    log("Script started" + (" (warm restart)" if warm else ""))
+    if not warm:
+        compress_closed_days(background=True)  # gzip logs from previous days
+        log(f"Running as admin: {os.name == 'nt' and __import__('ctypes').windll.shell32.IsUserAnAdmin()}")
+        
+        # Step 0: Configure Windows kiosk mode
+        host.configure_kiosk_mode()
+    
+    # Step 1: Select printer in CMD - kiosk_config.json may name one, and staff can switch it later
+    # (file or set_kiosk_config) without a restart
+    printer_api._config = RuntimeConfig(printer_api._apply_config, printers=host.spooler.printers)
+    runtime_config = printer_api._config.load()
+    printer_api._set_tunables(runtime_config["tunables"])
+    if warm:
+        selected_printer = warm["printer"]
+    else:
+        selected_printer = select_printer(runtime_config["printer"])
     printer_api.selected_printer = selected_printer
     log(f"Printer configured: {selected_printer}")
+    if warm and warm.get("profile") and not runtime_config["profile"]:
+        printer_api._profile = get_profile(warm["profile"])  # No driver lookup
+    else:
+        printer_api._profile = printer_api._printer_profile()
+    log(f"Printer profile: {printer_api._profile['name']} ({printer_api._profile['paper_mm']}mm, "
+        f"{printer_api._profile['dots']} dots, {printer_api._profile['columns']['A']} columns)")
+    
+    # Step 1b: Start the print engine process, open the receipt archive and print journal,
+    # and replay anything a crash left behind
+    try:
+        printer_api._engine = PrintEngine()
+    except Exception as e:
+        log(f"[WARNING] Print engine unavailable, imaging runs in-process: {e}")
+    try:
+        printer_api._archive = ReceiptArchive(ARCHIVE_FOLDER)
+    except Exception as e:
+        log(f"[WARNING] Receipt archive unavailable: {e}")
+    try:
+        printer_api._journal = PrintJournal(JOURNAL_FOLDER)
+        threading.Thread(target=printer_api._replay_journal, daemon=True).start()
+    except Exception as e:
+        log(f"[WARNING] Print journal unavailable: {e}")
+    
+    # Step 1c: Maintenance that only runs while the screensaver is up
+    printer_api._scheduler.add_job("printer-self-check", printer_api._printer_self_check, 15 * 60)
+    printer_api._scheduler.add_job("log-compaction", compress_closed_days, 6 * 3600)
+    printer_api._scheduler.start()
+    printer_api._telemetry.start()
+    printer_api._config.start()
+    
+    # Step 1d: Push events to the page - one sync-status poll here replaces a timer in every page
+    printer_api._events.start()
+    # First printer-status for the shell's banner, without holding up startup
+    threading.Thread(target=printer_api._printer_self_check, name="PrinterCheck", daemon=True).start()
+    
+    # Step 1e: Serve offers and layout config from memory - a sync drops the cached copies
+    # before the pages hear about it, so the reload they do gets the new data
+    api_cache = ApiCache()
+    api_cache.load()
+    api_proxy = None
+    try:
+        api_proxy = ApiProxy(api_cache)
+    except Exception as e:
+        log(f"[WARNING] API cache proxy unavailable, pages call the server directly: {e}")
+    sync_watcher = SyncWatcher(printer_api._events, on_sync=api_cache.invalidate)
+    sync_watcher.start()
     
     # Step 2: Start kiosk app
     app = KioskApp()
     printer_api._kiosk_app = app  # Link so JS can call shutdown
+    if api_proxy:
+        app.api_url = api_proxy.start()
     app.run()
     
+    printer_api._scheduler.stop()
+    printer_api._telemetry.stop()  # Writes the last summary
+    printer_api._config.stop()
+    sync_watcher.stop()
+    if api_proxy:
+        api_proxy.stop()
+    printer_api._events.stop()
+    if printer_api._hold:
+        printer_api._hold.stop()  # Anything still held stays queued in the journal for next start
+    if printer_api._journal:
+        printer_api._journal.close()
+    if printer_api._archive:
+        printer_api._archive.close()
+    if printer_api._engine:
+        printer_api._engine.close()
+    
     # Restore Windows settings
-    restore_windows_settings()
+    host.restore_kiosk_settings()
     
-    # Keep CMD open after app closes
+    # Keep CMD open after app closes - the supervisor does that when there is one
     log("========== APP CLOSED ==========")
     log(f"Log file saved to: {LOG_FILE}")
-    print("\n" + "="*50)
-    print("Press ENTER to close this window...")
-    print("="*50)
-    input()
+    if not SUPERVISOR:
+        print("\n" + "="*50)
+        print("Press ENTER to close this window...")
+        print("="*50)
+        input()
 
 
@@ -0,0 +1,139 @@
+"""
+Kiosk Logging - shared by kiosk_app.py and its helper modules
+Logs go to the "logs" folder next to the exe, one file per day
+
+With --json-logs (or KIOSK_JSON_LOGS=1) every line is also written as a JSON record to
+events_YYYY-MM-DD.jsonl, and log_event() adds typed records (event, duration, printer...)
+that log_query.py can index. Closed days are gzipped on startup and at midnight.
+"""
+
+import sys
+import os
+import gzip
+import json
+import shutil
+import tempfile
+import threading
+from datetime import datetime
+
+# Logging - saves to "logs" folder next to the exe
+# Get the directory where the EXE is located
+if getattr(sys, 'frozen', False):
+    EXE_DIR = os.path.dirname(sys.executable)
+else:
+    EXE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Create logs folder next to exe
+LOGS_FOLDER = os.path.join(EXE_DIR, "logs")
+try:
+    os.makedirs(LOGS_FOLDER, exist_ok=True)
+except:
+    LOGS_FOLDER = EXE_DIR  # Fallback to exe folder
+
+# Log file with date stamp: logs_2025-12-09.txt
+LOG_FILE = os.path.join(LOGS_FOLDER, f"logs_{datetime.now().strftime('%Y-%m-%d')}.txt")
+
+# Structured JSON-lines records, opt-in
+JSON_LOGS = '--json-logs' in sys.argv or os.environ.get('KIOSK_JSON_LOGS', '') not in ('', '0')
+
+_write_lock = threading.Lock()
+_current_day = datetime.now().strftime('%Y-%m-%d')
+
+
+def _level(msg):
+    """Level from the markers log() lines already use"""
+    if '❌' in msg or msg.startswith('ERROR') or '[ERROR]' in msg:
+        return "error"
+    if '[WARNING]' in msg or msg.startswith('WARNING'):
+        return "warning"
+    return "info"
+
+
+def _write(now, text_line, record):
+    global _current_day
+    day = now.strftime('%Y-%m-%d')
+    with _write_lock:
+        # A kiosk runs for days - roll over to a new file at midnight
+        rolled = day != _current_day
+        _current_day = day
+        try:
+            with open(os.path.join(LOGS_FOLDER, f"logs_{day}.txt"), "a", encoding="utf-8") as f:
+                f.write(text_line + "\n")
+            if JSON_LOGS and record is not None:
+                with open(os.path.join(LOGS_FOLDER, f"events_{day}.jsonl"), "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        except Exception as e:
+            print(f"[LOG ERROR] {e}")
+    if rolled:
+        compress_closed_days(background=True)
+
+
+def log(msg):
+    now = datetime.now()
+    timestamp = now.strftime("%Y-%m-%d %H:%M:%S")
+    log_line = f"[{timestamp}] {msg}"
+    print(log_line)
+    sys.stdout.flush()
+
+    # Write to log file
+    record = {"ts": now.isoformat(timespec='milliseconds'), "event": "log", "level": _level(msg), "msg": msg} if JSON_LOGS else None
+    _write(now, log_line, record)
+
+
+def log_event(event, msg=None, level=None, **fields):
+    """Typed record, e.g. log_event("print", printer=..., duration_ms=..., success=True).
+
+    Always shows up in the text log; the JSON record is written when JSON_LOGS is on.
+    """
+    now = datetime.now()
+    text = msg or f"{event} " + " ".join(f"{k}={v}" for k, v in fields.items())
+    log_line = f"[{now.strftime('%Y-%m-%d %H:%M:%S')}] {text}"
+    print(log_line)
+    sys.stdout.flush()
+
+    record = None
+    if JSON_LOGS:
+        record = {"ts": now.isoformat(timespec='milliseconds'), "event": event, "level": level or _level(text)}
+        if msg:
+            record["msg"] = msg
+        record.update(fields)
+    _write(now, log_line, record)
+
+
+def compress_closed_days(background=False):
+    """gzip log and event files from previous days - today's files stay plain for appending"""
+    if background:
+        threading.Thread(target=compress_closed_days, name="LogCompress", daemon=True).start()
+        return
+    today = datetime.now().strftime('%Y-%m-%d')
+    try:
+        names = os.listdir(LOGS_FOLDER)
+    except OSError:
+        return
+    for name in names:
+        if not ((name.startswith("logs_") and name.endswith(".txt")) or
+                (name.startswith(("events_", "ui_perf_")) and name.endswith(".jsonl"))):
+            continue
+        day = name.rsplit("_", 1)[1].split(".", 1)[0]
+        if day >= today:
+            continue
+        path = os.path.join(LOGS_FOLDER, name)
+        if os.path.exists(path + ".gz"):
+            # Another kiosk process (a supervisor restart overlapping the old one) got there first,
+            # or the day was written again after a clock change - leave it plain rather than guess
+            continue
+        # Our own temp file - two processes compressing the same day must not share one
+        fd, tmp = tempfile.mkstemp(prefix=name + ".", suffix=".gz.tmp", dir=LOGS_FOLDER)
+        try:
+            with open(path, "rb") as src, os.fdopen(fd, "wb") as raw, \
+                    gzip.GzipFile(filename=name, mode="wb", compresslevel=6, fileobj=raw) as dst:
+                shutil.copyfileobj(src, dst)
+            if os.path.exists(path + ".gz"):
+                continue  # Lost the race - the other process published the same day
+            os.replace(tmp, path + ".gz")
+            os.remove(path)
+        except Exception as e:
+            print(f"[LOG ERROR] Could not compress {name}: {e}")
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
@@ -0,0 +1,519 @@
+"""
+Kiosk Platform - the operating system parts of the kiosk: printers, lockdown, staff hotkeys
+
+Windows: the win32print spooler (RAW jobs), registry tweaks for kiosk mode, `keyboard` hooks.
+Linux:   CUPS queues sent raw with lp, or printers opened directly as /dev/usb/lp* (with
+         DLE EOT status), evdev for the hotkeys. There is no registry - the kiosk session
+         (cage, or a bare X session) does the lockdown, so only screen blanking is turned off.
+
+The backend follows what is importable: win32print means the Windows spooler (soak_test.py's
+fake spooler counts), otherwise Linux. kiosk_app.py only talks to `host`.
+"""
+
+import glob
+import os
+import select
+import shlex
+import subprocess
+import threading
+from collections import namedtuple
+from pathlib import Path
+
+from kiosk_log import log
+from print_pacing import spooler_status, dle_eot_status
+
+try:
+    import win32print
+except ImportError:
+    win32print = None
+
+try:
+    import winreg  # For Windows Registry modifications
+except ImportError:
+    winreg = None
+
+keyboard = None  # Imported when the hooks go in - print engine workers import this module too
+
+
+def _load_keyboard():
+    global keyboard
+    if keyboard is None and win32print is not None:
+        try:
+            import keyboard as keyboard_lib
+            keyboard = keyboard_lib
+            log("keyboard library imported successfully")
+        except Exception as e:
+            log(f"ERROR importing keyboard: {e}")
+    return keyboard
+
+try:
+    import evdev
+except ImportError:
+    evdev = None
+
+DEVICE_PATTERN = "/dev/usb/lp*"   # usblp device files - named by path in the printer list
+LP_TIMEOUT = 30                   # seconds for lp to take a finished job
+
+# What on_key_event needs from a key press - the `keyboard` library's events have the same fields
+KeyEvent = namedtuple("KeyEvent", "name scan_code event_type")
+
+
+# ---------- Windows ----------
+
+class _WindowsJob:
+    """One RAW spooler job - write() chunks, status() between them"""
+
+    def __init__(self, printer_name, doc_name):
+        self.printer_name = printer_name
+        self.doc_name = doc_name
+        self._handle = None
+
+    def __enter__(self):
+        self._handle = win32print.OpenPrinter(self.printer_name)
+        try:
+            win32print.StartDocPrinter(self._handle, 1, (self.doc_name, None, "RAW"))
+            try:
+                win32print.StartPagePrinter(self._handle)
+            except Exception:
+                win32print.EndDocPrinter(self._handle)
+                raise
+        except Exception:
+            win32print.ClosePrinter(self._handle)
+            raise
+        return self
+
+    def write(self, chunk):
+        win32print.WritePrinter(self._handle, chunk)
+
+    def status(self):
+        # The spooler has no read-back channel for DLE EOT - its printer status is the stand-in
+        return spooler_status(win32print.GetPrinter(self._handle, 2).get('Status', 0))
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                win32print.EndPagePrinter(self._handle)
+        finally:
+            try:
+                win32print.EndDocPrinter(self._handle)
+            finally:
+                win32print.ClosePrinter(self._handle)
+
+
+class WindowsSpooler:
+    """Printers installed in Windows"""
+
+    def printers(self):
+        flags = win32print.PRINTER_ENUM_LOCAL | win32print.PRINTER_ENUM_CONNECTIONS
+        return [p[2] for p in win32print.EnumPrinters(flags)]
+
+    def default_printer(self):
+        return win32print.GetDefaultPrinter()
+
+    def driver(self, printer_name):
+        hPrinter = win32print.OpenPrinter(printer_name)
+        try:
+            return win32print.GetPrinter(hPrinter, 2).get('pDriverName')
+        finally:
+            win32print.ClosePrinter(hPrinter)
+
+    def status(self, printer_name):
+        hPrinter = win32print.OpenPrinter(printer_name)
+        try:
+            return spooler_status(win32print.GetPrinter(hPrinter, 2).get('Status', 0))
+        finally:
+            win32print.ClosePrinter(hPrinter)
+
+    def open_job(self, printer_name, doc_name):
+        return _WindowsJob(printer_name, doc_name)
+
+
+class WindowsPlatform:
+    name = "windows"
+    webview_gui = "edgechromium"  # Force Edge WebView2
+
+    def __init__(self):
+        self.spooler = WindowsSpooler()
+
+    def file_url(self, path):
+        return f"file:///{path.replace(os.sep, '/')}"
+
+    def configure_kiosk_mode(self):
+        """Configure Windows 10 for kiosk mode - disable edge swipes and gestures"""
+        log("Configuring Windows 10 kiosk mode...")
+
+        try:
+            # Disable Edge Swipe (for touch screens)
+            key_path = r"SOFTWARE\Policies\Microsoft\Windows\EdgeUI"
+            try:
+                key = winreg.CreateKey(winreg.HKEY_LOCAL_MACHINE, key_path)
+                winreg.SetValueEx(key, "AllowEdgeSwipe", 0, winreg.REG_DWORD, 0)
+                winreg.CloseKey(key)
+                log("Edge swipe disabled")
+            except PermissionError:
+                log("[WARNING] No admin - edge swipe NOT disabled")
+            except Exception as e:
+                log(f"[WARNING] Edge swipe config failed: {e}")
+
+            # Disable Action Center (multiple locations for better blocking)
+            # Location 1: Policy for all users
+            key_path = r"SOFTWARE\Policies\Microsoft\Windows\Explorer"
+            try:
+                key = winreg.CreateKey(winreg.HKEY_LOCAL_MACHINE, key_path)
+                winreg.SetValueEx(key, "DisableNotificationCenter", 0, winreg.REG_DWORD, 1)
+                winreg.CloseKey(key)
+                log("Action Center disabled (HKLM Policy)")
+            except PermissionError:
+                log("[WARNING] No admin - action center HKLM NOT disabled")
+            except Exception as e:
+                log(f"[WARNING] Action center HKLM failed: {e}")
+
+            # Location 2: Current user
+            try:
+                key = winreg.CreateKey(winreg.HKEY_CURRENT_USER, key_path)
+                winreg.SetValueEx(key, "DisableNotificationCenter", 0, winreg.REG_DWORD, 1)
+                winreg.CloseKey(key)
+                log("Action Center disabled (HKCU)")
+            except Exception as e:
+                log(f"[WARNING] Action center HKCU failed: {e}")
+
+            # Location 3: Additional blocking via Settings
+            key_path = r"SOFTWARE\Microsoft\Windows\CurrentVersion\PushNotifications"
+            try:
+                key = winreg.CreateKey(winreg.HKEY_CURRENT_USER, key_path)
+                winreg.SetValueEx(key, "ToastEnabled", 0, winreg.REG_DWORD, 0)
+                winreg.CloseKey(key)
+                log("Notifications/toasts disabled")
+            except Exception as e:
+                log(f"[WARNING] Toast config failed: {e}")
+
+            # Force Group Policy refresh to apply immediately
+            try:
+                subprocess.run(["gpupdate", "/force"], capture_output=True, timeout=10)
+                log("Group Policy refreshed")
+            except:
+                log("[WARNING] Could not refresh Group Policy")
+
+            # Auto-hide taskbar (prevent swipe from bottom revealing it)
+            key_path = r"SOFTWARE\Microsoft\Windows\CurrentVersion\Explorer\StuckRects3"
+            try:
+                key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, key_path, 0, winreg.KEY_READ | winreg.KEY_WRITE)
+                # Get current settings
+                try:
+                    settings = winreg.QueryValueEx(key, "Settings")[0]
+                    # Modify byte 8 to enable auto-hide (set bit 0)
+                    settings_list = list(settings)
+                    if len(settings_list) > 8:
+                        settings_list[8] = settings_list[8] | 0x01  # Set auto-hide bit
+                        winreg.SetValueEx(key, "Settings", 0, winreg.REG_BINARY, bytes(settings_list))
+                        log("Taskbar auto-hide enabled")
+                except:
+                    log("[WARNING] Could not modify taskbar settings")
+                winreg.CloseKey(key)
+            except PermissionError:
+                log("[WARNING] No permission - taskbar NOT hidden")
+            except Exception as e:
+                log(f"[WARNING] Taskbar config failed: {e}")
+
+            log("Kiosk mode configured")
+
+        except Exception as e:
+            log(f"[WARNING] Kiosk config error: {e}")
+
+    def restore_kiosk_settings(self):
+        """Restore Windows settings when kiosk closes"""
+        log("Restoring Windows settings...")
+        try:
+            # Re-enable Edge Swipe
+            try:
+                key = winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, r"SOFTWARE\Policies\Microsoft\Windows\EdgeUI", 0, winreg.KEY_SET_VALUE)
+                winreg.DeleteValue(key, "AllowEdgeSwipe")
+                winreg.CloseKey(key)
+            except:
+                pass
+
+            # Re-enable Action Center
+            try:
+                key = winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, r"SOFTWARE\Policies\Microsoft\Windows\Explorer", 0, winreg.KEY_SET_VALUE)
+                winreg.DeleteValue(key, "DisableNotificationCenter")
+                winreg.CloseKey(key)
+            except:
+                pass
+
+            log("Windows settings restored")
+        except Exception as e:
+            log(f"[WARNING] Restore error: {e}")
+
+    def hook_keys(self, on_key):
+        """Setup keyboard hooks"""
+        if not _load_keyboard():
+            log("WARNING: keyboard library not available!")
+            return
+
+        try:
+            # Hook all keys to monitor
+            keyboard.hook(on_key)
+            log("Keyboard hook installed")
+
+            # Try to block keys (requires admin)
+            try:
+                keyboard.block_key('left windows')
+                keyboard.block_key('right windows')
+                log("Windows keys blocked")
+            except Exception as e:
+                log(f"Could not block Windows keys: {e}")
+
+            try:
+                # Block Alt+Tab by blocking tab when alt is pressed
+                keyboard.add_hotkey('alt+tab', lambda: None, suppress=True)
+                log("Alt+Tab suppressed")
+            except Exception as e:
+                log(f"Could not suppress Alt+Tab: {e}")
+
+        except Exception as e:
+            log(f"Error setting up keyboard: {e}")
+
+    def unhook_keys(self):
+        if keyboard:
+            try:
+                keyboard.unhook_all()
+            except:
+                pass
+
+
+# ---------- Linux ----------
+
+def _run(args):
+    return subprocess.run(args, capture_output=True, text=True, timeout=10, check=True).stdout
+
+
+def _is_device(printer_name):
+    return printer_name.startswith("/dev/")
+
+
+def _device_model(path):
+    """'EPSON TM-T82' from the printer's IEEE 1284 ID, which usblp exposes in sysfs"""
+    sysfs = f"/sys/class/usbmisc/{os.path.basename(path)}/device/ieee1284_id"
+    try:
+        with open(sysfs, "r", encoding="ascii", errors="ignore") as f:
+            fields = dict(part.split(":", 1) for part in f.read().split(";") if ":" in part)
+    except OSError:
+        return None
+    make = fields.get("MFG") or fields.get("MANUFACTURER") or ""
+    model = fields.get("MDL") or fields.get("MODEL") or ""
+    return f"{make} {model}".strip() or None
+
+
+class _DeviceJob:
+    """Raw bytes straight to a /dev/usb/lp* device - two-way, so status is a real DLE EOT"""
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+        self._readable = True
+
+    def __enter__(self):
+        try:
+            self._fd = os.open(self.path, os.O_RDWR)
+        except OSError:
+            # Some printers (or device permissions) only allow writes
+            self._fd = os.open(self.path, os.O_WRONLY)
+            self._readable = False
+        return self
+
+    def write(self, chunk):
+        view = memoryview(chunk)
+        while view:
+            view = view[os.write(self._fd, view):]
+
+    def _read(self, n, timeout):
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        return os.read(self._fd, n) if ready else b''
+
+    def _drain(self):
+        # A late answer to an earlier query that timed out would be read as this one's
+        while self._read(64, 0):
+            pass
+
+    def status(self):
+        """DLE EOT over the print stream itself - only call it between whole commands (the pacer does)"""
+        status = None
+        if self._readable:
+            try:
+                self._drain()
+                status = dle_eot_status(self.write, self._read)
+            except OSError:
+                status = None
+        # No answer (busy, or a write-only link) - the device being open is all we know
+        return status or {"online": True, "paper_out": False, "paper_low": False, "cover_open": False,
+                          "error": None}
+
+    def __exit__(self, exc_type, exc, tb):
+        os.close(self._fd)
+
+
+class _CupsJob:
+    """A raw CUPS job - lp reads the payload from stdin and queues it when stdin closes"""
+
+    def __init__(self, spooler, printer_name, doc_name):
+        self._spooler = spooler
+        self.printer_name = printer_name
+        self.doc_name = doc_name
+        self._proc = None
+
+    def __enter__(self):
+        self._proc = subprocess.Popen(["lp", "-d", self.printer_name, "-o", "raw", "-t", self.doc_name, "-s"],
+                                      stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        return self
+
+    def write(self, chunk):
+        self._proc.stdin.write(chunk)
+
+    def status(self):
+        return self._spooler.status(self.printer_name)
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            # lp hasn't submitted anything yet - killing it cancels the job rather than print half
+            self._proc.kill()
+            self._proc.wait()
+            return
+        self._proc.stdin.close()
+        try:
+            self._proc.wait(LP_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            self._proc.kill()
+            raise Exception(f"lp did not take the job for {self.printer_name} within {LP_TIMEOUT}s")
+        if self._proc.returncode != 0:
+            error = self._proc.stderr.read().decode("utf-8", "replace").strip()
+            raise Exception(f"lp failed for {self.printer_name}: {error or self._proc.returncode}")
+
+
+class LinuxSpooler:
+    """CUPS queues (set them up as raw queues) plus any printer at /dev/usb/lp*"""
+
+    def printers(self):
+        names = []
+        try:
+            names += _run(["lpstat", "-e"]).split()
+        except Exception:
+            pass  # No CUPS on this box - device files only
+        return names + sorted(glob.glob(DEVICE_PATTERN))
+
+    def default_printer(self):
+        try:
+            out = _run(["lpstat", "-d"])  # "system default destination: NAME"
+            if ":" in out:
+                return out.split(":", 1)[1].strip()
+        except Exception:
+            pass
+        printers = self.printers()
+        if not printers:
+            raise Exception(f"No printers found (no CUPS queues, nothing at {DEVICE_PATTERN})")
+        return printers[0]
+
+    def driver(self, printer_name):
+        if _is_device(printer_name):
+            return _device_model(printer_name)
+        for option in shlex.split(_run(["lpoptions", "-p", printer_name])):
+            if option.startswith("printer-make-and-model="):
+                return option.split("=", 1)[1]
+        return None
+
+    def status(self, printer_name):
+        if _is_device(printer_name):
+            try:
+                with _DeviceJob(printer_name) as job:
+                    return job.status()
+            except OSError as e:
+                if e.errno == 16:  # EBUSY - open for a job, so it is there
+                    return {"online": True, "paper_out": False, "paper_low": False, "cover_open": False,
+                            "error": None}
+                raise
+        text = _run(["lpstat", "-l", "-p", printer_name]).lower()
+        status = {"online": True, "paper_out": "media-empty" in text, "paper_low": "media-low" in text,
+                  "cover_open": "cover-open" in text or "door-open" in text, "error": None}
+        if "media-jam" in text:
+            status["error"] = "paper jam"
+        status["online"] = not ("disabled" in text or "offline" in text or status["paper_out"]
+                                or status["cover_open"] or status["error"])
+        return status
+
+    def open_job(self, printer_name, doc_name):
+        if _is_device(printer_name):
+            return _DeviceJob(printer_name)
+        return _CupsJob(self, printer_name, doc_name)
+
+
+def _key_name(code):
+    name = evdev.ecodes.KEY.get(code, "")
+    if isinstance(name, list):
+        name = name[0]
+    return name[4:].lower() if name.startswith("KEY_") else name.lower()
+
+
+class LinuxPlatform:
+    name = "linux"
+    webview_gui = None  # pywebview picks GTK or Qt
+
+    def __init__(self):
+        self.spooler = LinuxSpooler()
+        self._keyboards = []
+
+    def file_url(self, path):
+        return Path(path).as_uri()
+
+    def configure_kiosk_mode(self):
+        """No registry here - the kiosk session locks the desktop down. Keep the screen on."""
+        log("Configuring Linux kiosk mode...")
+        if os.environ.get("DISPLAY"):
+            try:
+                subprocess.run(["xset", "s", "off", "-dpms", "s", "noblank"], capture_output=True, timeout=5)
+                log("Screen blanking disabled")
+            except Exception as e:
+                log(f"[WARNING] Could not disable screen blanking: {e}")
+        log("Kiosk mode configured (gestures and shortcuts are up to the kiosk session, e.g. cage)")
+
+    def restore_kiosk_settings(self):
+        if os.environ.get("DISPLAY"):
+            try:
+                subprocess.run(["xset", "s", "on", "+dpms"], capture_output=True, timeout=5)
+            except Exception:
+                pass
+
+    def hook_keys(self, on_key):
+        """Read key presses from every keyboard in /dev/input - needs the 'input' group"""
+        if evdev is None:
+            log("WARNING: evdev library not available - staff hotkeys are off")
+            return
+        for path in evdev.list_devices():
+            try:
+                device = evdev.InputDevice(path)
+            except OSError:
+                continue
+            if evdev.ecodes.KEY_Q in device.capabilities().get(evdev.ecodes.EV_KEY, []):
+                self._keyboards.append(device)
+                threading.Thread(target=self._read_keys, args=(device, on_key), name="Keys", daemon=True).start()
+        if self._keyboards:
+            log(f"Keyboard hook installed ({', '.join(d.name for d in self._keyboards)})")
+        else:
+            log("WARNING: No readable keyboard in /dev/input - add the kiosk user to the 'input' group")
+
+    def _read_keys(self, device, on_key):
+        try:
+            for event in device.read_loop():
+                if event.type == evdev.ecodes.EV_KEY and event.value in (0, 1):  # up/down, not auto-repeat
+                    on_key(KeyEvent(_key_name(event.code), event.code, "down" if event.value else "up"))
+        except OSError:
+            pass  # Device closed by unhook_keys, or unplugged
+
+    def unhook_keys(self):
+        for device in self._keyboards:
+            try:
+                device.close()
+            except Exception:
+                pass
+        self._keyboards = []
+
+
+host = WindowsPlatform() if win32print is not None else LinuxPlatform()
@@ -0,0 +1,162 @@
+"""
+Kiosk Profiler - on-demand profiling of the running kiosk
+Started from PrinterAPI.start_profiling or the staff hotkey, it runs for a bounded
+window and writes its results to the logs folder:
+
+  profile-<time>.folded    sampled stacks of every thread - feed to flamegraph.pl or speedscope
+  profile-<time>.pstats    cProfile of every thread (Python 3.12+, where one profiler sees all
+                           threads through sys.monitoring) - load with pstats.Stats or snakeviz
+  memory-<time>.snapshot   tracemalloc snapshot - tracemalloc.Snapshot.load()
+  memory-<time>.txt        top allocation growth over the window
+
+Nothing is installed while profiling is off, and everything installed for a window is
+removed when it ends, so it costs nothing until it's needed.
+On older Pythons cProfile hooks one thread at a time and can't be removed from another
+thread, so there the sampled stacks are the only CPU profile.
+"""
+
+import os
+import sys
+import cProfile
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+from kiosk_log import LOGS_FOLDER, log
+
+MAX_SECONDS = 300         # hard cap on one profiling window
+SAMPLE_INTERVAL = 0.005   # 200 Hz stack sampling
+MEMORY_FRAMES = 10        # tracemalloc traceback depth
+# cProfile on sys.monitoring - one profiler for the whole process, switched off in one call
+ALL_THREADS_PROFILE = sys.version_info >= (3, 12)
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class KioskProfiler:
+    """One profiling window at a time. start() returns immediately; results are written when the window ends."""
+
+    def __init__(self, folder=LOGS_FOLDER):
+        self.folder = folder
+        self._lock = threading.Lock()
+        self._running = False
+        self._stop = threading.Event()
+        self.last_files = []
+
+    @property
+    def running(self):
+        return self._running
+
+    def start(self, seconds=30, memory=True):
+        seconds = max(1, min(float(seconds), MAX_SECONDS))
+        with self._lock:
+            if self._running:
+                return {"success": False, "message": "Profiling is already running"}
+            self._running = True
+        self._stop.clear()
+
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        base = os.path.join(self.folder, f"profile-{stamp}")
+        mem_base = os.path.join(self.folder, f"memory-{stamp}")
+        files = [base + ".folded"] + ([base + ".pstats"] if ALL_THREADS_PROFILE else []) + \
+            ([mem_base + ".snapshot", mem_base + ".txt"] if memory else [])
+        threading.Thread(target=self._run, args=(seconds, memory, base, mem_base, files),
+                         name="KioskProfiler", daemon=True).start()
+        log(f"========== PROFILING STARTED ({seconds:.0f}s) ==========")
+        message = f"Profiling for {seconds:.0f}s"
+        if not ALL_THREADS_PROFILE:
+            message += (f" - sampled stacks only, no .pstats: cProfile needs Python 3.12+ to see every thread "
+                        f"(this is {sys.version_info.major}.{sys.version_info.minor})")
+            log(f"[WARNING] {message}")
+        return {"success": True, "message": message, "files": files, "pstats": ALL_THREADS_PROFILE}
+
+    def stop(self):
+        """End the current window early - results are still written"""
+        self._stop.set()
+
+    def _run(self, seconds, memory, base, mem_base, files):
+        profile = None
+        started_tracing = False
+        try:
+            if memory and not tracemalloc.is_tracing():
+                tracemalloc.start(MEMORY_FRAMES)
+                started_tracing = True
+            before = tracemalloc.take_snapshot() if memory else None
+
+            if ALL_THREADS_PROFILE:
+                profile = cProfile.Profile()
+                try:
+                    profile.enable()
+                except ValueError as e:
+                    # A debugger or another profiler holds sys.monitoring - sample only
+                    log(f"[WARNING] cProfile unavailable, sampling only - no .pstats this time: {e}")
+                    profile = None
+                    files.remove(base + ".pstats")
+            stacks = self._sample(seconds)
+        finally:
+            if profile is not None:
+                profile.disable()
+
+        try:
+            self._write_folded(base + ".folded", stacks)
+            if profile is not None:
+                self._write_pstats(base + ".pstats", profile)
+            if memory:
+                after = tracemalloc.take_snapshot()
+                after.dump(mem_base + ".snapshot")
+                self._write_memory(mem_base + ".txt", before, after)
+            self.last_files = files
+            log(f"✅ Profiling finished - results in {self.folder}")
+        except Exception as e:
+            log(f"❌ Profiling failed: {e}")
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
+            self._running = False
+
+    def _sample(self, seconds):
+        """Folded-stack counts of every thread except this one"""
+        me = threading.get_ident()
+        names = {}
+        stacks = Counter()
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline and not self._stop.is_set():
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                if ident not in names:
+                    thread = threading._active.get(ident)
+                    names[ident] = thread.name if thread else f"thread-{ident}"
+                labels.append(names[ident])
+                stacks[";".join(reversed(labels))] += 1
+            time.sleep(SAMPLE_INTERVAL)
+        return stacks
+
+    def _write_folded(self, path, stacks):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def _write_pstats(self, path, profile):
+        profile.create_stats()
+        pstats.Stats(profile).dump_stats(path)
+
+    def _write_memory(self, path, before, after, top=30):
+        with open(path, "w", encoding="utf-8") as f:
+            current, peak = tracemalloc.get_traced_memory()
+            f.write(f"Traced memory: {current / 1024:.0f} KB now, {peak / 1024:.0f} KB peak\n\n")
+            f.write(f"Top {top} allocation sites by growth over the window:\n")
+            for stat in after.compare_to(before, "lineno")[:top]:
+                f.write(f"{stat}\n")
+            f.write(f"\nTop {top} allocation sites by size:\n")
+            for stat in after.statistics("lineno")[:top]:
+                f.write(f"{stat}\n")
@@ -0,0 +1,323 @@
+"""
+Kiosk Supervisor - keeps the kiosk running when nobody is there to restart it
+Runs kiosk_app.py (or KioskApp.exe) as a child process and health-checks it over a
+local authenticated connection. A child that crashes, stops answering pings, never
+gets its first page up or keeps a dead page after the watchdog tried to recover it
+is killed and started again.
+
+Restarts are warm: the child reports its printer and profile on every ping, and the
+next child gets them back, so registry/kiosk-mode setup, printer discovery, the
+printer menu and log compression are skipped. The time from the failure to the first
+frame of the new child is logged (split into stopping the old child, imports and the
+app's own startup) as a "restart" event.
+
+    python kiosk_supervisor.py                       # same arguments as kiosk_app.py
+    python kiosk_supervisor.py --printer "EPSON TM-T82"
+    KioskApp.exe --supervise                         # the release build supervises itself
+
+Q x5 (or shutdown from the page) ends the kiosk and the supervisor with it.
+"""
+
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+
+from kiosk_log import log, log_event
+
+PING_INTERVAL = 5       # seconds between health checks
+PING_TIMEOUT = 20       # no answer for this long - the process is hung
+START_TIMEOUT = 120     # launch to first frame, before the child is given up on
+PAGE_TIMEOUT = 120      # page unresponsive this long - the watchdog's own recovery didn't help
+STOP_TIMEOUT = 3        # seconds a killed child gets to go away
+RESTART_WINDOW = 600    # restarts are counted over this many seconds...
+QUICK_RESTARTS = 3      # ...and after this many, each one waits longer (up to MAX_DELAY)
+MAX_DELAY = 60
+COLD_AFTER = 2          # warm starts in a row that never got a page up before trying a cold one
+
+ENV_ADDRESS = "KIOSK_SUPERVISOR"
+ENV_KEY = "KIOSK_SUPERVISOR_KEY"
+ENV_WARM = "KIOSK_WARM_STATE"
+
+
+# ---------- Kiosk process side ----------
+
+class SupervisorLink:
+    """The kiosk's end of the connection - answers pings, reports the first frame and a deliberate exit"""
+
+    def __init__(self, address, authkey, warm=None):
+        self.address = address
+        self.authkey = authkey
+        self.warm = warm    # {"printer", "profile"} from the last child - the one-time steps are done
+        self._conn = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """The link if kiosk_supervisor.py started this process, else None"""
+        address = os.environ.get(ENV_ADDRESS)
+        if not address:
+            return None
+        host, _, port = address.rpartition(":")
+        try:
+            warm = json.loads(os.environ.get(ENV_WARM) or "null")
+        except ValueError:
+            warm = None
+        return cls((host, int(port)), bytes.fromhex(os.environ.get(ENV_KEY, "")), warm)
+
+    def start(self, health):
+        """Connect and answer pings with health() - {"printer", "profile", "page_silent"}"""
+        try:
+            self._conn = Client(self.address, authkey=self.authkey)
+            self._send("hello", (os.getpid(), os.getppid()))  # Parent too - a frozen exe may run under a bootloader
+        except Exception as e:
+            log(f"[WARNING] Supervisor unreachable, running unsupervised: {e}")
+            self._conn = None
+            return
+        threading.Thread(target=self._loop, args=(health,), name="SupervisorLink", daemon=True).start()
+
+    def _send(self, kind, value=None):
+        if self._conn is None:
+            return
+        try:
+            with self._lock:
+                self._conn.send((kind, value))
+        except (OSError, EOFError):
+            self._conn = None  # Supervisor went away - keep running on our own
+
+    def _loop(self, health):
+        while self._conn is not None:
+            try:
+                kind, value = self._conn.recv()
+            except (OSError, EOFError):
+                return
+            if kind == "ping":
+                try:
+                    state = health()
+                except Exception as e:
+                    state = {"error": str(e)}
+                self._send("pong", dict(state, seq=value))
+
+    def ready(self, first_frame_ms):
+        """First page is on screen"""
+        self._send("ready", first_frame_ms)
+
+    def bye(self):
+        """Closing on purpose - don't restart"""
+        self._send("bye")
+
+
+# ---------- Supervisor side ----------
+
+class Supervisor:
+    """Starts the kiosk, watches it and restarts it warm when it fails"""
+
+    def __init__(self, args=()):
+        self.args = [a for a in args if a != "--supervise"]
+        self.authkey = os.urandom(16)
+        self._listener = Listener(("127.0.0.1", 0), authkey=self.authkey)
+        self._connections = queue.Queue()
+        self.warm = None        # last state a child reported
+        self.proc = None
+        self._restarts = []     # times of recent restarts
+        self._failed_warm = 0
+        self._stopping = False
+
+    def _command(self, warm):
+        if getattr(sys, "frozen", False):
+            cmd = [sys.executable]
+        else:
+            cmd = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "kiosk_app.py")]
+        # The printer menu only makes sense the first time
+        return cmd + [a for a in self.args if not (warm and a == "--select")]
+
+    def _accept(self):
+        while not self._stopping:
+            try:
+                self._connections.put(self._listener.accept())
+            except Exception as e:
+                if not self._stopping:
+                    log(f"[WARNING] Supervisor: rejected a connection: {e}")
+
+    def _launch(self, warm):
+        env = dict(os.environ)
+        host, port = self._listener.address
+        env[ENV_ADDRESS] = f"{host}:{port}"
+        env[ENV_KEY] = self.authkey.hex()
+        env.pop(ENV_WARM, None)
+        if warm:
+            env[ENV_WARM] = json.dumps(warm)
+        self.proc = subprocess.Popen(self._command(warm), env=env)
+        log(f"Supervisor: kiosk started ({'warm' if warm else 'cold'}, pid {self.proc.pid})")
+
+    def _connection_for(self, pid, timeout):
+        """The connection the child with this pid (or its bootloader's) opened - stale ones from killed children are dropped"""
+        try:
+            conn = self._connections.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        try:
+            if conn.poll(1):
+                kind, pids = conn.recv()
+                if kind == "hello" and pid in pids:
+                    return conn
+        except (OSError, EOFError):
+            pass
+        conn.close()
+        return None
+
+    def _watch(self, timing):
+        """Until the child fails (returns why) or closes on purpose (returns None)"""
+        proc = self.proc
+        conn = None
+        ready = False
+        last_ping = last_pong = time.time()
+        seq = 0
+        while True:
+            now = time.time()
+            code = proc.poll()
+            if code is not None:
+                return None if self._said_bye(conn) else f"exited with code {code}"
+            if conn is None:
+                conn = self._connection_for(proc.pid, 0.5)
+                if conn is not None:
+                    timing["connected"] = time.time()
+                    last_ping = last_pong = time.time()
+                elif now - timing["launched"] > START_TIMEOUT:
+                    return f"did not connect within {START_TIMEOUT}s of launch"
+                continue
+
+            try:
+                if conn.poll(0.5):
+                    kind, value = conn.recv()
+                    if kind == "ready":
+                        ready = True
+                        timing["ready"] = time.time()
+                        timing["first_frame_ms"] = value
+                        self._on_ready(timing)
+                    elif kind == "pong":
+                        last_pong = time.time()
+                        if value.get("printer"):
+                            self.warm = {"printer": value["printer"], "profile": value.get("profile")}
+                        silent = value.get("page_silent")
+                        if silent is not None and silent > PAGE_TIMEOUT:
+                            return f"kept an unresponsive page for {silent:.0f}s"
+                    elif kind == "bye":
+                        proc.wait()
+                        return None
+                if time.time() - last_ping >= PING_INTERVAL:
+                    seq += 1
+                    conn.send(("ping", seq))
+                    last_ping = time.time()
+            except (OSError, EOFError):
+                # Connection dropped - the process is exiting or going down, poll() will say which
+                try:
+                    code = proc.wait(STOP_TIMEOUT)
+                except subprocess.TimeoutExpired:
+                    return "dropped its supervisor connection"
+                return None if self._said_bye(conn) else f"exited with code {code}"
+
+            if time.time() - last_pong > PING_TIMEOUT:
+                return f"stopped answering health checks for {PING_TIMEOUT}s"
+            if not ready and time.time() - timing["launched"] > START_TIMEOUT:
+                return f"had no page up {START_TIMEOUT}s after launch"
+
+    def _said_bye(self, conn):
+        """The child exited - check the messages it sent on the way out for a deliberate close"""
+        try:
+            while conn is not None and conn.poll(0):
+                if conn.recv()[0] == "bye":
+                    return True
+        except (OSError, EOFError):
+            pass
+        return False
+
+    def _on_ready(self, timing):
+        """First frame of a new child - log how long the kiosk was out of action"""
+        self._failed_warm = 0
+        launched, connected, ready = timing["launched"], timing.get("connected", timing["launched"]), timing["ready"]
+        if "failed" not in timing:
+            log(f"✅ Supervisor: kiosk interactive {ready - launched:.1f}s after a cold start")
+            return
+        total = ready - timing["failed"]
+        log_event("restart", f"✅ Kiosk back {total:.1f}s after it {timing['reason']} "
+                  f"(stop {launched - timing['failed']:.1f}s, imports {connected - launched:.1f}s, "
+                  f"app {ready - connected:.1f}s, {'warm' if timing['warm'] else 'cold'})",
+                  duration_ms=round(total * 1000), reason=timing["reason"], warm=bool(timing["warm"]),
+                  stop_ms=round((launched - timing["failed"]) * 1000),
+                  imports_ms=round((connected - launched) * 1000), app_ms=round((ready - connected) * 1000))
+
+    def _stop_child(self):
+        """Kill the child outright - a hung kiosk won't close itself, and waiting only adds to the outage"""
+        proc = self.proc
+        if proc is None or proc.poll() is not None:
+            return
+        proc.kill()
+        try:
+            proc.wait(STOP_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            log(f"[WARNING] Supervisor: kiosk pid {proc.pid} did not exit after kill")
+
+    def _delay(self):
+        """No wait for the first few restarts, then a growing one - a crash loop shouldn't spin the CPU"""
+        now = time.time()
+        self._restarts = [t for t in self._restarts if now - t < RESTART_WINDOW] + [now]
+        extra = len(self._restarts) - QUICK_RESTARTS
+        return 0 if extra <= 0 else min(MAX_DELAY, 2 ** extra)
+
+    def run(self):
+        threading.Thread(target=self._accept, name="SupervisorAccept", daemon=True).start()
+        timing = {"launched": time.time(), "warm": None}
+        self._launch(None)
+        try:
+            while True:
+                reason = self._watch(timing)
+                if reason is None:
+                    log("Supervisor: kiosk closed on purpose")
+                    return 0
+                failed = time.time()
+                log(f"❌ Supervisor: kiosk {reason} - restarting")
+                self._stop_child()
+                if "ready" not in timing and timing["warm"]:
+                    self._failed_warm += 1
+                warm = self.warm if self._failed_warm < COLD_AFTER else None
+                if self.warm and not warm:
+                    log("[WARNING] Supervisor: warm starts keep failing - trying a cold start")
+                    self._failed_warm = 0
+                delay = self._delay()
+                if delay:
+                    log(f"[WARNING] Supervisor: {len(self._restarts)} restarts in {RESTART_WINDOW // 60} min - waiting {delay}s")
+                    time.sleep(delay)
+                timing = {"failed": failed, "reason": reason, "launched": time.time(), "warm": warm}
+                self._launch(warm)
+        except KeyboardInterrupt:
+            log("Supervisor: interrupted - stopping the kiosk")
+            self._stop_child()
+            # The child never got to undo kiosk mode
+            from kiosk_platform import host
+            host.restore_kiosk_settings()
+            return 1
+        finally:
+            self._stopping = True
+            self._listener.close()
+
+
+def main(args=None):
+    args = sys.argv[1:] if args is None else args
+    log("========== KIOSK SUPERVISOR STARTED ==========")
+    code = Supervisor(args).run()
+    if code == 0 and sys.stdin and sys.stdin.isatty():
+        # Same as an unsupervised kiosk - keep CMD open after staff close it
+        print("\n" + "=" * 50)
+        print("Press ENTER to close this window...")
+        print("=" * 50)
+        input()
+    return code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
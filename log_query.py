@@ -0,0 +1,280 @@
+"""
+Log Query - index and search kiosk logs
+Reads the logs folder (or a folder of folders collected from many kiosks): the
+events_*.jsonl structured records and the plain logs_*.txt files, gzipped or not.
+A compact index (log_index.json) keeps per-file counts, error records and a latency
+histogram per event and printer, and is only rebuilt for files that changed, so queries
+over weeks of logs are quick. Histogram buckets are HIST_RATIO wide, so a percentile
+read from them is within that of the exact value, and the index stays the same size
+however busy the kiosk was.
+
+Usage:
+  python log_query.py index                      build / refresh the index
+  python log_query.py latency                    p95 print latency per day
+  python log_query.py latency -p 50 --printer "80mm Series Printer"
+  python log_query.py errors --match "paper"     all paper-out errors
+  python log_query.py summary                    events and errors per day
+  (add --logs <folder> to query another folder)
+"""
+
+import os
+import re
+import math
+import gzip
+import json
+import argparse
+from collections import defaultdict
+
+from kiosk_log import LOGS_FOLDER
+
+INDEX_NAME = "log_index.json"
+INDEX_VERSION = 2
+MAX_ERRORS_PER_FILE = 5000
+HIST_RATIO = 1.05   # latency bucket width - each bucket's upper edge is 5% above its lower one
+
+_FILE_RE = re.compile(r'^(logs|events)_(\d{4}-\d{2}-\d{2})\.(txt|jsonl)(\.gz)?$')
+_TEXT_LINE_RE = re.compile(r'^\[(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\] (.*)$')
+
+
+def _open(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, "r", encoding="utf-8", errors="replace")
+
+
+# ---------- Latency histograms ----------
+# {"n": count, "max": ms, "b": {bucket: count}} - bucket k holds [HIST_RATIO**(k-1), HIST_RATIO**k) ms
+
+def _bucket(ms):
+    return 0 if ms < 1 else int(math.log(ms) / math.log(HIST_RATIO)) + 1
+
+
+def hist_add(hist, ms):
+    key = str(_bucket(ms))
+    hist["b"][key] = hist["b"].get(key, 0) + 1
+    hist["n"] += 1
+    hist["max"] = max(hist["max"], ms)
+
+
+def hist_merge(into, hist):
+    for key, n in hist["b"].items():
+        into["b"][key] = into["b"].get(key, 0) + n
+    into["n"] += hist["n"]
+    into["max"] = max(into["max"], hist["max"])
+
+
+def _new_hist():
+    return {"n": 0, "max": 0, "b": {}}
+
+
+def hist_percentile(hist, p):
+    """Nearest-rank percentile, as the middle of the bucket it falls in (never above the max)"""
+    if not hist["n"]:
+        return None
+    rank = max(1, math.ceil(p / 100 * hist["n"]))
+    seen = 0
+    for key in sorted(hist["b"], key=int):
+        seen += hist["b"][key]
+        if seen >= rank:
+            k = int(key)
+            middle = 0 if k == 0 else HIST_RATIO ** (k - 0.5)
+            return min(round(middle), hist["max"])
+    return hist["max"]
+
+
+def _scan_events(path):
+    counts = defaultdict(int)
+    levels = defaultdict(int)
+    latency = defaultdict(_new_hist)   # "event" and "event|printer" -> histogram of durations
+    errors = []
+    with _open(path) as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue  # Torn last line of a crashed run
+            event = rec.get("event", "log")
+            counts[event] += 1
+            level = rec.get("level", "info")
+            levels[level] += 1
+            if "duration_ms" in rec and rec.get("success", True):
+                hist_add(latency[event], rec["duration_ms"])
+                if rec.get("printer"):
+                    hist_add(latency[f"{event}|{rec['printer']}"], rec["duration_ms"])
+            if (level == "error" or rec.get("success") is False) and len(errors) < MAX_ERRORS_PER_FILE:
+                errors.append({k: rec[k] for k in ("ts", "event", "printer", "doc", "order", "error", "msg") if k in rec})
+    return counts, levels, latency, errors
+
+
+def _scan_text(path):
+    counts = defaultdict(int)
+    levels = defaultdict(int)
+    errors = []
+    with _open(path) as f:
+        for line in f:
+            m = _TEXT_LINE_RE.match(line.rstrip("\n"))
+            if not m:
+                continue
+            ts, msg = m.groups()
+            counts["log"] += 1
+            if '❌' in msg or msg.startswith('ERROR') or '[ERROR]' in msg:
+                levels["error"] += 1
+                if len(errors) < MAX_ERRORS_PER_FILE:
+                    errors.append({"ts": ts.replace(" ", "T"), "event": "log", "msg": msg})
+            elif '[WARNING]' in msg or msg.startswith('WARNING'):
+                levels["warning"] += 1
+            else:
+                levels["info"] += 1
+    return counts, levels, {}, errors
+
+
+def build_index(folder, quiet=False):
+    """Load the index and rescan files that are new or changed since it was written"""
+    index_path = os.path.join(folder, INDEX_NAME)
+    index = {"version": INDEX_VERSION, "files": {}}
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            loaded = json.load(f)
+        if loaded.get("version") == INDEX_VERSION:
+            index = loaded
+    except (OSError, ValueError):
+        pass
+
+    seen = set()
+    scanned = 0
+    for root, _, names in os.walk(folder):
+        for name in names:
+            m = _FILE_RE.match(name)
+            if not m:
+                continue
+            kind, day = ("events" if m.group(1) == "events" else "text"), m.group(2)
+            path = os.path.join(root, name)
+            rel = os.path.relpath(path, folder)
+            # A day's file is renamed when it's gzipped - key by kiosk + kind + day, not file name
+            key = f"{os.path.dirname(rel)}|{kind}|{day}"
+            seen.add(key)
+            st = os.stat(path)
+            old = index["files"].get(key)
+            if old and old["file"] == rel and old["size"] == st.st_size and old["mtime"] == st.st_mtime:
+                continue
+            counts, levels, latency, errors = (_scan_events if kind == "events" else _scan_text)(path)
+            index["files"][key] = {"file": rel, "kiosk": os.path.dirname(rel), "kind": kind, "day": day,
+                                   "size": st.st_size, "mtime": st.st_mtime, "counts": counts,
+                                   "levels": levels, "latency": latency,
+                                   "errors": errors}
+            scanned += 1
+
+    for key in list(index["files"]):
+        if key not in seen:
+            del index["files"][key]
+
+    if scanned:
+        tmp = index_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(index, f, separators=(",", ":"))
+        os.replace(tmp, index_path)
+    if not quiet:
+        print(f"Index: {len(index['files'])} files, {scanned} rescanned")
+    return index
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of a sorted list"""
+    if not values:
+        return None
+    rank = max(1, math.ceil(p / 100 * len(values)))
+    return values[min(rank, len(values)) - 1]
+
+
+def _in_range(day, args):
+    return (not args.since or day >= args.since) and (not args.until or day <= args.until)
+
+
+def cmd_latency(index, args):
+    key = f"{args.event}|{args.printer}" if args.printer else args.event
+    per_day = defaultdict(_new_hist)
+    for entry in index["files"].values():
+        if entry["kind"] == "events" and _in_range(entry["day"], args) and key in entry["latency"]:
+            hist_merge(per_day[entry["day"]], entry["latency"][key])
+    if not per_day:
+        print(f"No '{args.event}' durations found - are the kiosks running with --json-logs?")
+        return
+    print(f"{'day':<12}{'count':>8}{'p50 ms':>10}{f'p{args.percentile:g} ms':>10}{'max ms':>10}")
+    for day in sorted(per_day):
+        hist = per_day[day]
+        if hist["n"]:
+            print(f"{day:<12}{hist['n']:>8}{hist_percentile(hist, 50):>10}"
+                  f"{hist_percentile(hist, args.percentile):>10}{hist['max']:>10}")
+
+
+def cmd_errors(index, args):
+    # Prefer structured records for days that have them - the text log repeats the same errors
+    structured = {(e["kiosk"], e["day"]) for e in index["files"].values() if e["kind"] == "events"}
+    match = args.match.lower() if args.match else None
+    rows = []
+    for entry in index["files"].values():
+        if not _in_range(entry["day"], args):
+            continue
+        if entry["kind"] == "text" and (entry["kiosk"], entry["day"]) in structured:
+            continue
+        for err in entry["errors"]:
+            text = " ".join(str(v) for v in err.values()).lower()
+            if match is None or match in text:
+                rows.append((err.get("ts", ""), entry["kiosk"], err))
+    rows.sort(key=lambda r: r[0])
+    for ts, kiosk, err in rows[-args.limit:]:
+        where = f"{kiosk}: " if kiosk else ""
+        detail = err.get("error") or err.get("msg", "")
+        printer = f" [{err['printer']}]" if err.get("printer") else ""
+        print(f"{ts} {where}{err.get('event', 'log')}{printer} {detail}")
+    print(f"{len(rows)} error(s)" + (f", showing the last {args.limit}" if len(rows) > args.limit else ""))
+
+
+def cmd_summary(index, args):
+    structured = {(e["kiosk"], e["day"]) for e in index["files"].values() if e["kind"] == "events"}
+    days = defaultdict(lambda: defaultdict(int))
+    for entry in index["files"].values():
+        if not _in_range(entry["day"], args):
+            continue
+        if entry["kind"] == "text" and (entry["kiosk"], entry["day"]) in structured:
+            continue
+        if entry["kind"] == "events":
+            for event, n in entry["counts"].items():
+                if event != "log":
+                    days[entry["day"]][event] += n
+        days[entry["day"]]["errors"] += entry["levels"].get("error", 0)
+        days[entry["day"]]["warnings"] += entry["levels"].get("warning", 0)
+    for day in sorted(days):
+        parts = ", ".join(f"{k}={v}" for k, v in sorted(days[day].items()))
+        print(f"{day}  {parts}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Index and query kiosk logs")
+    parser.add_argument("--logs", default=LOGS_FOLDER, help="logs folder (may contain one folder per kiosk)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("index", help="build or refresh the index")
+    for name in ("latency", "errors", "summary"):
+        p = sub.add_parser(name)
+        p.add_argument("--since", help="first day, YYYY-MM-DD")
+        p.add_argument("--until", help="last day, YYYY-MM-DD")
+        if name == "latency":
+            p.add_argument("--event", default="print")
+            p.add_argument("--printer")
+            p.add_argument("-p", "--percentile", type=float, default=95)
+        if name == "errors":
+            p.add_argument("--match", help="case-insensitive text to look for, e.g. paper")
+            p.add_argument("--limit", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    index = build_index(args.logs, quiet=args.command != "index")
+    if args.command == "latency":
+        cmd_latency(index, args)
+    elif args.command == "errors":
+        cmd_errors(index, args)
+    elif args.command == "summary":
+        cmd_summary(index, args)
+
+
+if __name__ == '__main__':
+    main()
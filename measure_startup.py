@@ -0,0 +1,127 @@
+"""
+Measure Startup - bundle size and time from process start to the first webview frame
+
+Build first (build_exe.bat, or KIOSK_BUILD=full for the everything-included profile), then:
+    python measure_startup.py                         # dist/KioskApp, 3 launches
+    python measure_startup.py --dist dist/KioskApp --runs 5 --printer "EPSON TM-T82"
+    python measure_startup.py --size-only             # no launch, works on any OS
+
+Each launch sets KIOSK_STARTUP_PROBE; the app writes the time of its first page load
+there and closes itself. Startup splits into the bootloader (unpacking and imports,
+up to kiosk_app's STARTED_AT) and the app itself (printer, window, first page).
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def bundle_size(dist):
+    """Total bytes and files in the dist folder, split by what they are"""
+    groups = {"page assets": 0, "python": 0, "native": 0, "other": 0}
+    files = 0
+    for dirpath, dirnames, filenames in os.walk(dist):
+        rel_dir = os.path.relpath(dirpath, dist).replace('\\', '/')
+        for name in filenames:
+            size = os.path.getsize(os.path.join(dirpath, name))
+            files += 1
+            lower = name.lower()
+            if '/page-1' in '/' + rel_dir:
+                groups["page assets"] += size
+            elif lower.endswith(('.pyc', '.pyz', '.zip')) or lower == 'base_library.zip':
+                groups["python"] += size
+            elif lower.endswith(('.dll', '.pyd', '.exe', '.so')):
+                groups["native"] += size
+            else:
+                groups["other"] += size
+    return {"bytes": sum(groups.values()), "files": files, "groups": groups}
+
+
+def launch_once(exe, printer=None, timeout=120):
+    """One launch - seconds to first frame, and the bootloader/app split"""
+    fd, probe = tempfile.mkstemp(prefix="kiosk-startup-", suffix=".json")
+    os.close(fd)
+    os.remove(probe)
+    args = [exe] + (["--printer", printer] if printer else [])
+    env = dict(os.environ, KIOSK_STARTUP_PROBE=probe)
+
+    started = time.time()
+    proc = subprocess.Popen(args, cwd=os.path.dirname(exe), env=env, stdin=subprocess.PIPE,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while not os.path.exists(probe):
+            if proc.poll() is not None:
+                raise Exception(f"app exited with code {proc.returncode} before the first frame")
+            if time.time() - started > timeout:
+                raise Exception(f"no frame after {timeout}s")
+            time.sleep(0.02)
+        time.sleep(0.1)  # Let the app finish writing
+        with open(probe, "r", encoding="utf-8") as f:
+            marks = json.load(f)
+        # The app closes itself, then waits for ENTER on the console
+        try:
+            proc.communicate(b"\n", timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+        if os.path.exists(probe):
+            os.remove(probe)
+    return {"total_s": marks["first_frame"] - started,
+            "bootloader_s": marks["started_at"] - started,
+            "app_s": marks["first_frame"] - marks["started_at"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bundle size and time to first frame of a KioskApp build")
+    parser.add_argument("--dist", default=os.path.join(BASE_DIR, "dist", "KioskApp"), help="PyInstaller dist folder")
+    parser.add_argument("--runs", type=int, default=3, help="launches to time (the median is reported)")
+    parser.add_argument("--printer", help="printer name, passed as --printer so no menu is shown")
+    parser.add_argument("--size-only", action="store_true", help="don't launch, just measure the bundle")
+    parser.add_argument("--json", action="store_true", help="print the result as JSON, for comparing builds")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.dist):
+        print(f"No build at {args.dist} - run build_exe.bat first")
+        return 1
+    result = {"dist": args.dist, "size": bundle_size(args.dist), "runs": []}
+
+    if not args.size_only:
+        exe = os.path.join(args.dist, "KioskApp.exe" if os.name == "nt" else "KioskApp")
+        for i in range(args.runs):
+            try:
+                run = launch_once(exe, args.printer)
+            except Exception as e:
+                print(f"Launch {i + 1} failed: {e}")
+                return 1
+            result["runs"].append(run)
+            if not args.json:
+                print(f"Launch {i + 1}: first frame {run['total_s']:.2f}s "
+                      f"(bootloader {run['bootloader_s']:.2f}s, app {run['app_s']:.2f}s)")
+        if result["runs"]:
+            result["median"] = {k: statistics.median(r[k] for r in result["runs"]) for k in result["runs"][0]}
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return 0
+    size = result["size"]
+    print(f"Bundle: {size['bytes'] / 1024 / 1024:.1f} MB in {size['files']} files")
+    for group, nbytes in size["groups"].items():
+        print(f"  {group:12s} {nbytes / 1024 / 1024:8.1f} MB")
+    if "median" in result:
+        median = result["median"]
+        print(f"First frame (median of {len(result['runs'])}): {median['total_s']:.2f}s "
+              f"- bootloader {median['bootloader_s']:.2f}s, app {median['app_s']:.2f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
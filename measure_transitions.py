@@ -0,0 +1,178 @@
+"""
+Measure Transitions - how long a page-to-page navigation takes in the kiosk shell
+Opens kiosk-shell.html in a pywebview window the size of the kiosk screen, drives
+KioskShell.navigateTo() through a route of pages and reads the shell's KioskTransitions
+timings (navigation start to the first frame painted after the page has loaded).
+
+    python measure_transitions.py                       # page-bundle/ if it is up to date, else the pages
+    python measure_transitions.py --pages source --rounds 5
+    python measure_transitions.py --compare             # the pages vs page-bundle/, side by side
+    python measure_transitions.py --route welcome.html,offers-selection.html,card-selection.html
+
+The first round loads every page cold and is left out of the numbers (--warmup).
+Pages call the Node server at localhost:3000 - have it running (or not) for both sides
+of a comparison, a missing server changes the timings.
+"""
+
+import argparse
+import json
+import os
+import pathlib
+import statistics
+import subprocess
+import sys
+import time
+
+from bundle_manifest import PAGE_ROOT, reachable_assets
+from page_bundler import BUNDLE_DIR, is_fresh
+
+SHELL = 'kiosk-shell.html'
+STEP_TIMEOUT = 15       # seconds to wait for one page to load
+SETTLE = 0.5            # seconds on each page before moving on, like a quick customer
+
+
+def default_route(root=PAGE_ROOT):
+    return [rel for rel in reachable_assets(root) if rel.endswith('.html') and rel != SHELL]
+
+
+def pages_folder(which):
+    if which == 'source':
+        return PAGE_ROOT
+    fresh = is_fresh(BUNDLE_DIR, PAGE_ROOT)
+    if which == 'bundle' and not fresh:
+        raise Exception("page-bundle is missing or older than the pages - run python page_bundler.py")
+    return BUNDLE_DIR if fresh else PAGE_ROOT
+
+
+def run_route(folder, route, rounds, settle=SETTLE):
+    """Navigate the route rounds times - a list of {page, ms, round} (ms None if the page never loaded)"""
+    import webview
+
+    url = pathlib.Path(folder, SHELL).resolve().as_uri()
+    window = webview.create_window("Transition timing", url, width=1080, height=1920)
+    results = []
+
+    def last_record():
+        return window.evaluate_js(
+            "window.KioskTransitions ? KioskTransitions.records[KioskTransitions.records.length - 1] || null : null")
+
+    def drive():
+        try:
+            deadline = time.time() + 30
+            while not window.evaluate_js("!!(window.KioskShell && window.KioskTransitions)"):
+                if time.time() > deadline:
+                    raise Exception(f"{SHELL} did not initialise")
+                time.sleep(0.1)
+            time.sleep(settle)
+            for round_no in range(rounds):
+                for page in route:
+                    started = time.time() * 1000
+                    window.evaluate_js(f"KioskShell._isNavigating = false; KioskShell.navigateTo({json.dumps(page)})")
+                    record = None
+                    while time.time() * 1000 - started < STEP_TIMEOUT * 1000:
+                        last = last_record()
+                        if last and last["page"] == page and last["at"] >= started:
+                            record = last
+                            break
+                        time.sleep(0.02)
+                    results.append({"page": page, "ms": record["ms"] if record else None, "round": round_no})
+                    time.sleep(settle)
+        finally:
+            window.destroy()
+
+    webview.start(drive)
+    return results
+
+
+def summarise(results, warmup):
+    """Per page and overall median / p95 in ms, cold rounds left out"""
+    def stats(values):
+        values = sorted(values)
+        if not values:
+            return None
+        return {"n": len(values), "median": statistics.median(values),
+                "p95": values[min(len(values) - 1, int(len(values) * 0.95))]}
+
+    timed = [r for r in results if r["round"] >= warmup and r["ms"] is not None]
+    pages = {}
+    for r in timed:
+        pages.setdefault(r["page"], []).append(r["ms"])
+    return {"overall": stats([r["ms"] for r in timed]),
+            "pages": {page: stats(values) for page, values in pages.items()},
+            "timeouts": sum(1 for r in results if r["ms"] is None)}
+
+
+def _measure_in_child(which, args):
+    """webview.start() runs once per process, so each side of a comparison gets its own"""
+    cmd = [sys.executable, os.path.abspath(__file__), '--pages', which, '--rounds', str(args.rounds),
+           '--warmup', str(args.warmup), '--json']
+    if args.route:
+        cmd += ['--route', args.route]
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise Exception(f"{which} run failed: {proc.stderr.strip() or proc.stdout.strip()}")
+    return json.loads(proc.stdout)
+
+
+def _fmt(stat, key):
+    return f"{stat[key]:7.0f}" if stat else "      -"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time page-to-page transitions in the kiosk shell")
+    parser.add_argument("--pages", choices=("auto", "source", "bundle"), default="auto",
+                        help="the page folder as it is, or the page_bundler.py build")
+    parser.add_argument("--route", help="comma-separated pages to visit in order (default: every reachable page)")
+    parser.add_argument("--rounds", type=int, default=4, help="times to go through the route")
+    parser.add_argument("--warmup", type=int, default=1, help="rounds left out of the numbers")
+    parser.add_argument("--compare", action="store_true", help="time the pages and the bundle and compare")
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    args = parser.parse_args()
+    if args.rounds <= args.warmup:
+        print("--rounds must be more than --warmup")
+        return 1
+
+    if args.compare:
+        try:
+            if not is_fresh(BUNDLE_DIR, PAGE_ROOT):
+                raise Exception("page-bundle is missing or older than the pages - run python page_bundler.py")
+            sides = {which: _measure_in_child(which, args) for which in ("source", "bundle")}
+        except Exception as e:
+            print(e)
+            return 1
+        if args.json:
+            print(json.dumps(sides, indent=2))
+            return 0
+        source, bundle = sides["source"], sides["bundle"]
+        print(f"{'page':32s} {'pages ms':>9s} {'bundle ms':>9s}  (median of warm rounds)")
+        for page in sorted(set(source["pages"]) | set(bundle["pages"])):
+            print(f"{page:32s} {_fmt(source['pages'].get(page), 'median')}   {_fmt(bundle['pages'].get(page), 'median')}")
+        if source["overall"] and bundle["overall"]:
+            before, after = source["overall"]["median"], bundle["overall"]["median"]
+            print(f"Overall median {before:.0f}ms -> {after:.0f}ms ({(after - before) / before * 100:+.0f}%), "
+                  f"p95 {source['overall']['p95']:.0f}ms -> {bundle['overall']['p95']:.0f}ms")
+        return 0
+
+    try:
+        folder = pages_folder(args.pages)
+    except Exception as e:
+        print(e)
+        return 1
+    route = args.route.split(',') if args.route else default_route()
+    results = run_route(folder, route, args.rounds)
+    summary = dict(summarise(results, args.warmup), folder=folder)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return 0
+    print(f"Transitions in {folder} ({args.rounds - args.warmup} warm rounds of {len(route)} pages)")
+    for page, stat in sorted(summary["pages"].items()):
+        print(f"  {page:32s} median {_fmt(stat, 'median')}ms  p95 {_fmt(stat, 'p95')}ms")
+    if summary["overall"]:
+        print(f"Overall median {summary['overall']['median']:.0f}ms, p95 {summary['overall']['p95']:.0f}ms")
+    if summary["timeouts"]:
+        print(f"{summary['timeouts']} navigation(s) never finished loading")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
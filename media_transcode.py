@@ -0,0 +1,450 @@
+"""
+Media Transcode - fit the page videos and animations to the kiosk screen
+The background MP4s and animated GIFs are decoded non-stop by WebView2. Anything bigger
+than the 1080x1920 screen, faster than 30 fps or stored as GIF burns CPU for nothing.
+
+    python media_transcode.py profile                   # resolution, bitrate, decode cost
+    python media_transcode.py transcode                 # re-encode into media_out/, write the report
+    python media_transcode.py transcode welcome-bg.mp4 hand-gesture.gif --apply
+    python media_transcode.py transcode --gif mp4       # opaque GIFs as <video> instead of WebP
+
+Videos become H.264 at the kiosk resolution, cropped the way object-fit: cover shows
+them, capped at 30 fps, with a keyframe every second and closed GOPs so `loop` jumps
+back to frame 0 without a stall, and no audio track (the backgrounds play muted).
+GIFs become animated WebP - a drop-in for <img>, alpha kept - or, with --gif mp4, a
+silent loop for a <video> tag (GIFs with transparency always go to WebP). Either way
+they are sized and cropped for the screen and capped at 30 fps like the videos.
+
+Decode cost is CPU time per second of playback on one thread (ffmpeg -benchmark for
+video, Pillow for GIF/WebP), so 0.25 means a quarter of a core while it is on screen.
+Videos need ffmpeg and ffprobe on PATH; GIF to WebP only needs Pillow.
+--apply copies the results into the page folder (originals kept in media_out/originals);
+a converted GIF is written next to the original and its references listed in the report.
+A result is only applied when it is smaller and decodes no slower - --force applies the
+smaller ones regardless of decode cost.
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import time
+
+try:
+    from PIL import Image, ImageSequence
+except ImportError:
+    Image = None
+
+from bundle_manifest import PAGE_ROOT, TEXT_TYPES, _excluded, reachable_assets
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+OUT_DIR = os.path.join(BASE_DIR, "media_out")
+REPORT_FILE = "media_report.json"
+
+KIOSK_SIZE = (1080, 1920)
+MAX_FPS = 30
+KEYFRAME_SECONDS = 1
+VIDEO_CRF = 23
+WEBP_QUALITY = 80
+VIDEO_TYPES = (".mp4", ".webm", ".mov")
+ANIMATION_TYPES = (".gif",)
+
+
+def _tool(name):
+    path = shutil.which(name)
+    if not path:
+        raise Exception(f"{name} not found on PATH - install ffmpeg (https://ffmpeg.org) to handle videos")
+    return path
+
+
+def find_media(root=PAGE_ROOT, names=None):
+    """Relative paths of the videos and GIFs under root (or just the ones named)"""
+    found = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        for name in filenames:
+            rel = os.path.relpath(os.path.join(dirpath, name), root).replace('\\', '/')
+            if _excluded(rel) or not name.lower().endswith(VIDEO_TYPES + ANIMATION_TYPES):
+                continue
+            if names and rel not in names and name not in names:
+                continue
+            found.append(rel)
+    return sorted(found)
+
+
+# --- Profiling ---
+
+def _fps(rate):
+    num, _, den = (rate or "0/1").partition("/")
+    return float(num) / float(den or 1) if float(den or 1) else 0.0
+
+
+def probe_video(path):
+    """Resolution, frame rate, duration, bitrate and codec from ffprobe"""
+    out = subprocess.run([_tool("ffprobe"), "-v", "error", "-print_format", "json", "-show_format", "-show_streams",
+                          path], capture_output=True, text=True, check=True).stdout
+    info = json.loads(out)
+    video = next((s for s in info.get("streams", []) if s.get("codec_type") == "video"), None)
+    if video is None:
+        raise Exception("no video stream")
+    fmt = info.get("format", {})
+    duration = float(fmt.get("duration") or video.get("duration") or 0)
+    size = os.path.getsize(path)
+    return {
+        "width": int(video["width"]), "height": int(video["height"]),
+        "fps": round(_fps(video.get("avg_frame_rate") or video.get("r_frame_rate")), 2),
+        "duration_s": round(duration, 2),
+        "bitrate_kbps": round(int(fmt.get("bit_rate") or (size * 8 / duration if duration else 0)) / 1000),
+        "codec": video.get("codec_name"),
+        "audio": any(s.get("codec_type") == "audio" for s in info.get("streams", [])),
+        "bytes": size,
+    }
+
+
+def video_decode_cost(path):
+    """CPU seconds per second of playback, decoding on one thread"""
+    result = subprocess.run([_tool("ffmpeg"), "-hide_banner", "-nostats", "-benchmark", "-threads", "1",
+                             "-i", path, "-an", "-f", "null", "-"], capture_output=True, text=True)
+    bench = re.search(r"bench: utime=([\d.]+)s stime=([\d.]+)s", result.stderr)
+    if result.returncode != 0 or not bench:
+        raise Exception(f"ffmpeg could not decode {path}")
+    duration = probe_video(path)["duration_s"]
+    return round((float(bench.group(1)) + float(bench.group(2))) / duration, 4) if duration else None
+
+
+def probe_animation(path):
+    """Resolution, frame count, frame rate and loop length of a GIF or animated WebP"""
+    if Image is None:
+        raise Exception("Pillow is not installed")
+    with Image.open(path) as im:
+        frames = getattr(im, "n_frames", 1)
+        duration_ms = 0
+        for frame in ImageSequence.Iterator(im):
+            frame.load()  # WebP only reports a frame's duration once it is decoded
+            duration_ms += frame.info.get("duration") or 100  # Browsers show 0-delay frames for ~100 ms
+        size = os.path.getsize(path)
+        duration = duration_ms / 1000
+        return {
+            "width": im.width, "height": im.height, "frames": frames,
+            "fps": round(frames / duration, 2) if duration else 0,
+            "duration_s": round(duration, 2),
+            "bitrate_kbps": round(size * 8 / duration / 1000) if duration else 0,
+            "codec": im.format.lower(),
+            "transparent": "transparency" in im.info or im.mode in ("RGBA", "LA", "PA"),
+            "bytes": size,
+        }
+
+
+def animation_decode_cost(path):
+    """CPU seconds per second of playback to decode every frame with Pillow"""
+    started = time.process_time()
+    with Image.open(path) as im:
+        for frame in ImageSequence.Iterator(im):
+            frame.load()
+    cpu = time.process_time() - started
+    duration = probe_animation(path)["duration_s"]
+    return round(cpu / duration, 4) if duration else None
+
+
+def profile(path):
+    """Everything the report needs about one file - errors are recorded, not raised"""
+    is_video = path.lower().endswith(VIDEO_TYPES)
+    try:
+        info = probe_video(path) if is_video else probe_animation(path)
+        info["decode_cost"] = video_decode_cost(path) if is_video else animation_decode_cost(path)
+    except Exception as e:
+        return {"error": str(e), "bytes": os.path.getsize(path)}
+    return info
+
+
+# --- Transcoding ---
+
+def _even(n):
+    return max(2, int(n) // 2 * 2)
+
+
+def fit_to_screen(width, height, screen=KIOSK_SIZE):
+    """(scaled w, h, crop w, h) matching object-fit: cover - never upscales"""
+    scale = min(1.0, max(screen[0] / width, screen[1] / height))
+    scaled_w, scaled_h = _even(width * scale), _even(height * scale)
+    return scaled_w, scaled_h, _even(min(scaled_w, screen[0])), _even(min(scaled_h, screen[1]))
+
+
+def transcode_video(src, dst, info, screen=KIOSK_SIZE, crf=VIDEO_CRF):
+    """H.264 sized for the screen with a keyframe every second and closed GOPs"""
+    scaled_w, scaled_h, crop_w, crop_h = fit_to_screen(info["width"], info["height"], screen)
+    fps = min(info.get("fps") or MAX_FPS, MAX_FPS)
+    gop = max(1, round(fps * KEYFRAME_SECONDS))
+    filters = [f"scale={scaled_w}:{scaled_h}:flags=lanczos"]
+    if (crop_w, crop_h) != (scaled_w, scaled_h):
+        filters.append(f"crop={crop_w}:{crop_h}")
+    filters += [f"fps={fps:g}", "format=yuv420p"]
+    cmd = [_tool("ffmpeg"), "-hide_banner", "-loglevel", "error", "-y", "-i", src,
+           "-vf", ",".join(filters), "-an",
+           "-c:v", "libx264", "-preset", "slow", "-crf", str(crf), "-profile:v", "high",
+           "-g", str(gop), "-keyint_min", str(gop), "-sc_threshold", "0", "-flags", "+cgop",
+           "-movflags", "+faststart", dst]
+    subprocess.run(cmd, check=True, capture_output=True)
+
+
+def _capped_frames(im, max_fps=MAX_FPS):
+    """(frame, duration ms), keeping at most one frame per 1/max_fps slot - the ones in between are merged.
+
+    An animation that averages max_fps or less keeps every frame; a faster one is thinned on a
+    fixed slot grid from the start, so the loop length doesn't change.
+    """
+    # Browsers show 0-delay frames for ~100 ms
+    frames = [(frame.convert("RGBA"), frame.info.get("duration") or 100) for frame in ImageSequence.Iterator(im)]
+    if len(frames) * 1000 <= max_fps * sum(duration for _, duration in frames):
+        return frames
+    step = 1000 / max_fps
+    kept, clock, next_slot = [], 0, 0
+    for frame, duration in frames:
+        if clock >= next_slot - 1:  # 1 ms slack - GIF delays are whole centiseconds
+            kept.append([frame, 0])
+            while next_slot <= clock + 1:
+                next_slot += step
+        kept[-1][1] += duration
+        clock += duration
+    return kept
+
+
+def gif_to_webp(src, dst, screen=KIOSK_SIZE, quality=WEBP_QUALITY):
+    """Animated WebP with the GIF's timing and alpha, fitted to the screen and capped at MAX_FPS"""
+    with Image.open(src) as im:
+        scaled_w, scaled_h, crop_w, crop_h = fit_to_screen(im.width, im.height, screen)
+        left, top = (scaled_w - crop_w) // 2, (scaled_h - crop_h) // 2
+        frames, durations = [], []
+        for frame, duration in _capped_frames(im):
+            if frame.size != (scaled_w, scaled_h):
+                frame = frame.resize((scaled_w, scaled_h), Image.LANCZOS)
+            if (crop_w, crop_h) != (scaled_w, scaled_h):
+                frame = frame.crop((left, top, left + crop_w, top + crop_h))
+            frames.append(frame)
+            durations.append(duration)
+        frames[0].save(dst, "WEBP", save_all=True, append_images=frames[1:], duration=durations,
+                       loop=im.info.get("loop", 0), quality=quality, method=4, allow_mixed=True)
+
+
+def gif_to_mp4(src, dst, info, screen=KIOSK_SIZE, crf=VIDEO_CRF):
+    """Silent H.264 loop of an opaque GIF, for <video autoplay loop muted playsinline>"""
+    scaled_w, scaled_h, crop_w, crop_h = fit_to_screen(info["width"], info["height"], screen)
+    fps = min(info.get("fps") or MAX_FPS, MAX_FPS)
+    gop = max(1, round(fps * KEYFRAME_SECONDS))
+    filters = [f"scale={scaled_w}:{scaled_h}:flags=lanczos"]
+    if (crop_w, crop_h) != (scaled_w, scaled_h):
+        filters.append(f"crop={crop_w}:{crop_h}")
+    filters += [f"fps={fps:g}", "format=yuv420p"]
+    cmd = [_tool("ffmpeg"), "-hide_banner", "-loglevel", "error", "-y", "-i", src,
+           "-vf", ",".join(filters), "-an",
+           "-c:v", "libx264", "-preset", "slow", "-crf", str(crf), "-g", str(gop),
+           "-flags", "+cgop", "-movflags", "+faststart", dst]
+    subprocess.run(cmd, check=True, capture_output=True)
+
+
+def references(rel, root=PAGE_ROOT):
+    """Pages and scripts mentioning a file by name - they need updating when a GIF changes format"""
+    name = os.path.basename(rel)
+    found = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        for fname in filenames:
+            path = os.path.relpath(os.path.join(dirpath, fname), root).replace('\\', '/')
+            if _excluded(path) or not fname.lower().endswith(TEXT_TYPES):
+                continue
+            with open(os.path.join(root, path), "r", encoding="utf-8", errors="ignore") as f:
+                if name in f.read():
+                    found.append(path)
+    return sorted(found)
+
+
+def transcode(rel, args, root=PAGE_ROOT):
+    """Convert one file into the output folder - the report entry for it"""
+    src = os.path.join(root, rel)
+    entry = {"file": rel, "before": profile(src)}
+    if "error" in entry["before"]:
+        entry["error"] = entry["before"]["error"]
+        return entry
+    stem, ext = os.path.splitext(rel)
+    if ext.lower() in VIDEO_TYPES:
+        out_rel = stem + ".mp4"
+        action = lambda dst: transcode_video(src, dst, entry["before"], args.screen, args.crf)
+    elif args.gif == "mp4" and not entry["before"]["transparent"]:
+        out_rel = stem + ".mp4"
+        action = lambda dst: gif_to_mp4(src, dst, entry["before"], args.screen, args.crf)
+    else:
+        out_rel = stem + ".webp"
+        action = lambda dst: gif_to_webp(src, dst, args.screen, args.quality)
+
+    dst = os.path.join(args.out, out_rel)
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    try:
+        action(dst)
+    except subprocess.CalledProcessError as e:
+        entry["error"] = (e.stderr or b"").decode("utf-8", "replace").strip() or str(e)
+        return entry
+    except Exception as e:
+        entry["error"] = str(e)
+        return entry
+    entry["output"] = out_rel
+    entry["after"] = profile(dst)
+    if out_rel != rel:
+        entry["referenced_by"] = references(rel, root)
+    return entry
+
+
+def _savings(entry):
+    before, after = entry.get("before", {}), entry.get("after", {})
+    if "error" in entry or "error" in after:
+        return None
+    saved = {"bytes": before["bytes"] - after["bytes"]}
+    if before.get("decode_cost") and after.get("decode_cost") is not None:
+        saved["decode_cost"] = round(before["decode_cost"] - after["decode_cost"], 4)
+    return saved
+
+
+def _skip_reason(entry, force=False):
+    """Why a result should not replace the original, or None"""
+    saved = entry.get("saved")
+    if not saved:
+        return "no usable result"
+    if saved["bytes"] <= 0:
+        return "not smaller"
+    if force:
+        return None
+    if "decode_cost" not in saved:
+        return "decode cost not measured - use --force to apply anyway"
+    if saved["decode_cost"] < 0:
+        return "costs more CPU to decode - use --force to apply anyway"
+    return None
+
+
+def apply(entry, args, root=PAGE_ROOT):
+    """Copy a result into the page folder if it passes _skip_reason, keeping the original in media_out/originals"""
+    reason = _skip_reason(entry, args.force)
+    if reason:
+        entry["skipped"] = reason
+        return False
+    src = os.path.join(root, entry["file"])
+    backup = os.path.join(args.out, "originals", entry["file"])
+    os.makedirs(os.path.dirname(backup), exist_ok=True)
+    shutil.copy2(src, backup)
+    shutil.copy2(os.path.join(args.out, entry["output"]), os.path.join(root, entry["output"]))
+    return True
+
+
+# --- Report ---
+
+def _mb(nbytes):
+    return f"{nbytes / 1024 / 1024:.2f} MB"
+
+
+def _describe(info):
+    if "error" in info:
+        return f"error: {info['error']}"
+    cost = info.get("decode_cost")
+    cost = f"{cost * 100:.1f}% core" if cost is not None else "-"
+    return (f"{info['width']}x{info['height']} {info['fps']:g}fps {info['codec']} "
+            f"{info['bitrate_kbps']} kbps {_mb(info['bytes'])} decode {cost}")
+
+
+def print_profile(entries):
+    for entry in entries:
+        print(f"{entry['file']}{'' if entry['ships'] else ' (not shipped)'}")
+        print(f"  {_describe(entry['before'])}")
+
+
+def print_report(entries):
+    total = {"before": 0, "after": 0, "cost_before": 0.0, "cost_after": 0.0}
+    for entry in entries:
+        print(entry["file"] + (f" -> {entry['output']}" if entry.get("output") else ""))
+        print(f"  before {_describe(entry['before'])}")
+        if "error" in entry:
+            print(f"  ❌ {entry['error']}")
+            continue
+        print(f"  after  {_describe(entry['after'])}")
+        saved = entry.get("saved")
+        if saved:
+            total["before"] += entry["before"]["bytes"]
+            total["after"] += entry["after"]["bytes"]
+            total["cost_before"] += entry["before"].get("decode_cost") or 0
+            total["cost_after"] += entry["after"].get("decode_cost") or 0
+        if entry.get("referenced_by"):
+            print(f"  update references in: {', '.join(entry['referenced_by'])}")
+        if entry.get("applied"):
+            print("  ✅ copied into the page folder")
+        elif entry.get("skipped"):
+            print(f"  [WARNING] not applied: {entry['skipped']}")
+    if total["before"]:
+        print(f"\nSize: {_mb(total['before'])} -> {_mb(total['after'])} "
+              f"({(1 - total['after'] / total['before']) * 100:.0f}% smaller)")
+    if total["cost_before"]:
+        print(f"Decode CPU if all played at once: {total['cost_before'] * 100:.0f}% -> "
+              f"{total['cost_after'] * 100:.0f}% of one core")
+
+
+def _screen(value):
+    width, _, height = value.lower().partition("x")
+    return int(width), int(height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile and re-encode the kiosk's videos and animated GIFs")
+    parser.add_argument("command", choices=("profile", "transcode"))
+    parser.add_argument("files", nargs="*", help="file names under the page folder (default: all media)")
+    parser.add_argument("--root", default=PAGE_ROOT, help="page folder")
+    parser.add_argument("--out", default=OUT_DIR, help="where converted files and the report go")
+    parser.add_argument("--screen", type=_screen, default=KIOSK_SIZE, help="kiosk resolution, e.g. 1080x1920")
+    parser.add_argument("--gif", choices=("webp", "mp4"), default="webp",
+                        help="what animated GIFs become (transparent GIFs always become WebP)")
+    parser.add_argument("--crf", type=int, default=VIDEO_CRF, help="H.264 quality, lower is better")
+    parser.add_argument("--quality", type=int, default=WEBP_QUALITY, help="WebP quality 0-100")
+    parser.add_argument("--apply", action="store_true",
+                        help="copy results that are smaller and decode no slower into the page folder")
+    parser.add_argument("--force", action="store_true",
+                        help="with --apply, copy smaller results even if they cost more to decode")
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    args = parser.parse_args()
+
+    files = find_media(args.root, args.files)
+    if not files:
+        print(f"No videos or GIFs found in {args.root}")
+        return 1
+    shipped = set(reachable_assets(args.root))
+
+    if args.command == "profile":
+        entries = [{"file": rel, "ships": rel in shipped, "before": profile(os.path.join(args.root, rel))}
+                   for rel in files]
+        if args.json:
+            print(json.dumps(entries, indent=2))
+        else:
+            print_profile(entries)
+        return 0
+
+    entries = []
+    for rel in files:
+        if not args.json:
+            print(f"Converting {rel}...")
+        entry = transcode(rel, args, args.root)
+        entry["ships"] = rel in shipped
+        entry["saved"] = _savings(entry)
+        if args.apply:
+            entry["applied"] = apply(entry, args, args.root)
+        entries.append(entry)
+
+    os.makedirs(args.out, exist_ok=True)
+    report = os.path.join(args.out, REPORT_FILE)
+    with open(report, "w", encoding="utf-8") as f:
+        json.dump({"created": time.strftime("%Y-%m-%d %H:%M:%S"), "screen": list(args.screen),
+                   "entries": entries}, f, indent=2)
+    if args.json:
+        print(json.dumps(entries, indent=2))
+    else:
+        print_report(entries)
+        print(f"\nReport written to {report}")
+    return 1 if any("error" in e for e in entries) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
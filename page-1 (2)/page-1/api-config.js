@@ -2,9 +2,18 @@
  * Global API Configuration
  * Handles API base URL resolution for file:// protocol vs server usage
  */
-var API_BASE_URL = (window.location.protocol === 'file:')
-    ? 'http://localhost:3000'
-    : ''; // If served via HTTP, use relative paths (empty base)
+var API_BASE_URL = (function () {
+    if (window.location.protocol !== 'file:') return ''; // If served via HTTP, use relative paths (empty base)
+
+    // In the kiosk app, the shell is opened with ?api=<caching proxy> - offers and layout come from memory
+    try {
+        var match = /[?&]api=([^&]+)/.exec(window.top.location.search);
+        if (match) return decodeURIComponent(match[1]);
+    } catch (e) {
+        // Top window not reachable - call the server directly
+    }
+    return 'http://localhost:3000';
+})();
 
 /**
  * Get the full API URL for an endpoint
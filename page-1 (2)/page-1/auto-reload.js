@@ -1,16 +1,30 @@
 /**
  * Auto-reload script for TIZO Kiosk
- * Polls the server every 5 seconds to check if a database sync has occurred.
- * If a sync occurred, reloads the page to show latest data.
+ * Reloads the page when a database sync has occurred, to show latest data.
+ * In the kiosk the app pushes a 'sync-finished' event (see kiosk-events.js); in a
+ * plain browser there is no app, so the server is polled every 5 seconds instead.
  */
 
 (function () {
-    // Poll interval in milliseconds
+    // Poll interval in milliseconds (browser fallback only)
     const POLL_INTERVAL = 5000;
 
     // Store the initial sync time
     let localLastSyncTime = null;
 
+    function reloadForSync() {
+        console.log('🔄 New data detected! Reloading page...');
+        // Update session storage to indicate a deliberate reload
+        sessionStorage.setItem('last_reload_reason', 'db_sync');
+        window.location.reload();
+    }
+
+    if (window.KioskEvents && window.KioskEvents.connected()) {
+        window.KioskEvents.subscribe('sync-finished', reloadForSync);
+        console.log('✅ Auto-reload active (sync events from the kiosk app)');
+        return;
+    }
+
     async function checkSyncStatus() {
         try {
             // Use getApiUrl if available, otherwise fallback based on protocol
@@ -35,10 +49,7 @@
 
                 // Subsequent checks: if server time is newer, reload
                 if (data.lastSyncTime > localLastSyncTime) {
-                    console.log('🔄 New data detected! Reloading page...');
-                    // Update session storage to indicate a deliberate reload
-                    sessionStorage.setItem('last_reload_reason', 'db_sync');
-                    window.location.reload();
+                    reloadForSync();
                 }
             }
         } catch (err) {
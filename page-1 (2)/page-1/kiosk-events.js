@@ -0,0 +1,90 @@
+/**
+ * Kiosk events - push channel from the Python app into the pages
+ *
+ * kiosk_app.py batches its events and calls KioskEvents._dispatch(batch) in the
+ * shell at most once per frame. The shell forwards each batch into the page iframe,
+ * so pages subscribe here instead of polling the server or the printer API:
+ *
+ *   KioskEvents.subscribe('printer-status', function (status) { ... });
+ *
+ * Event types: printer-status, print-job, sync-finished, watchdog, config-changed ('*' gets all).
+ */
+
+(function () {
+    if (window.KioskEvents) return;
+
+    // Latest state, replayed to a page when it subscribes - it may have loaded after the change
+    const STICKY = ['printer-status'];
+    const subscribers = {};
+    const sticky = {};
+    let replayRequested = false;
+
+    function deliver(event) {
+        const handlers = (subscribers[event.type] || []).concat(subscribers['*'] || []);
+        handlers.forEach(function (fn) {
+            try {
+                fn(event.data, event);
+            } catch (err) {
+                console.error('KioskEvents handler failed for ' + event.type + ':', err);
+            }
+        });
+    }
+
+    function frameWindow() {
+        const frame = document.getElementById('page-frame');
+        return frame && frame.contentWindow;
+    }
+
+    function inFrame() {
+        return window.parent && window.parent !== window;
+    }
+
+    window.KioskEvents = {
+        // True when events come from the app - pages can skip their polling fallbacks
+        connected: function () {
+            try {
+                return !!(window.pywebview || (inFrame() && window.parent.KioskEvents));
+            } catch (err) {
+                return false;  // Parent not reachable - not inside the kiosk shell
+            }
+        },
+
+        subscribe: function (type, fn) {
+            (subscribers[type] = subscribers[type] || []).push(fn);
+            if (inFrame() && !replayRequested) {
+                replayRequested = true;
+                window.parent.postMessage({ type: 'kioskEventsReplay' }, '*');
+            }
+            return function unsubscribe() {
+                subscribers[type] = (subscribers[type] || []).filter(function (f) { return f !== fn; });
+            };
+        },
+
+        // Called by kiosk_app.py through evaluate_js with a batch of events
+        _dispatch: function (batch) {
+            batch.forEach(function (event) {
+                if (STICKY.indexOf(event.type) !== -1) {
+                    sticky[event.type + ':' + JSON.stringify(event.data && event.data.printer)] = event;
+                }
+                deliver(event);
+            });
+            const target = frameWindow();
+            if (target) {
+                target.postMessage({ type: 'kioskEvents', events: batch }, '*');
+            }
+        }
+    };
+
+    window.addEventListener('message', function (e) {
+        const msg = e.data;
+        if (!msg || typeof msg !== 'object') return;
+        if (msg.type === 'kioskEvents' && e.source === window.parent && window.parent !== window) {
+            msg.events.forEach(deliver);
+        } else if (msg.type === 'kioskEventsReplay' && e.source === frameWindow()) {
+            const events = Object.keys(sticky).map(function (k) { return sticky[k]; });
+            if (events.length) {
+                e.source.postMessage({ type: 'kioskEvents', events: events }, '*');
+            }
+        }
+    });
+})();
@@ -0,0 +1,109 @@
+/**
+ * Kiosk telemetry - field performance data for kiosk_app.py
+ *
+ * Runs in kiosk-shell.html and collects, for the shell and whatever page is in the iframe:
+ *   transition   navigation start -> first frame after the page loaded (KioskTransitions)
+ *   first-frame  touch on the screensaver -> first frame of the next page
+ *   long-task    main-thread tasks over 50 ms
+ *   resource     assets slower than SLOW_RESOURCE_MS (detail: img, video, script, css, font...)
+ *   paint        first contentful paint of the page
+ *
+ * Entries are queued and sent in batches to window.pywebview.api.report_ui_metrics,
+ * which summarises them per page in the logs folder.
+ */
+
+(function () {
+    if (window.KioskTelemetry) return;
+
+    const FLUSH_MS = 10000;
+    const MAX_QUEUE = 500;        // oldest entries go first if the app isn't taking them
+    const SLOW_RESOURCE_MS = 100;
+    const SHELL_PAGE = 'kiosk-shell.html';
+
+    let queue = [];
+    let wokeAt = null;
+    let pageObserver = null;
+
+    function record(type, page, ms, detail) {
+        if (queue.length >= MAX_QUEUE) queue.shift();
+        const entry = { type: type, page: page, ms: Math.round(ms) };
+        if (detail) entry.detail = detail;
+        queue.push(entry);
+    }
+
+    function flush() {
+        const api = window.pywebview && window.pywebview.api;
+        if (!queue.length || !api || !api.report_ui_metrics) return;
+        const batch = queue;
+        queue = [];
+        api.report_ui_metrics(batch, Date.now());
+    }
+
+    function resourceKind(entry) {
+        const name = entry.name.split('?')[0].toLowerCase();
+        if (/\.(woff2?|otf|ttf)$/.test(name)) return 'font';
+        if (/\.css$/.test(name)) return 'css';
+        if (/\.(mp4|webm)$/.test(name)) return 'video';
+        if (/\.(mp3|wav|ogg)$/.test(name)) return 'audio';
+        if (/\.(png|jpe?g|gif|webp|svg)$/.test(name)) return 'img';
+        if (/\.js$/.test(name)) return 'script';
+        if (entry.initiatorType === 'fetch' || entry.initiatorType === 'xmlhttprequest') return 'api';
+        return entry.initiatorType || 'other';
+    }
+
+    // The observer has to come from the page's own window to see the page's entries
+    function observe(win, page) {
+        try {
+            const observer = new win.PerformanceObserver(function (list) {
+                list.getEntries().forEach(function (entry) {
+                    if (entry.entryType === 'longtask') {
+                        record('long-task', page, entry.duration);
+                    } else if (entry.entryType === 'resource' && entry.duration >= SLOW_RESOURCE_MS) {
+                        record('resource', page, entry.duration, resourceKind(entry));
+                    } else if (entry.entryType === 'paint' && entry.name === 'first-contentful-paint') {
+                        record('paint', page, entry.startTime);
+                    }
+                });
+            });
+            ['longtask', 'resource', 'paint'].forEach(function (type) {
+                try {
+                    observer.observe({ type: type, buffered: true });
+                } catch (e) {
+                    // Entry type not supported by this webview
+                }
+            });
+            return observer;
+        } catch (e) {
+            return null;  // No PerformanceObserver, or the page isn't reachable
+        }
+    }
+
+    window.KioskTelemetry = {
+        record: record,
+        flush: flush,
+
+        // Shell: the screensaver was touched - first-frame ends when the next page shows
+        wake: function () {
+            wokeAt = performance.now();
+        },
+
+        // Shell: a page loaded into the iframe - watch its long tasks, slow assets and paint
+        watch: function (frame, page) {
+            if (pageObserver) pageObserver.disconnect();
+            pageObserver = observe(frame.contentWindow, page);
+        },
+
+        // Shell: the first frame of a page is on screen
+        transition: function (page, ms) {
+            record('transition', page, ms);
+            if (wokeAt !== null && page.indexOf('screensaver') !== 0) {
+                record('first-frame', page, performance.now() - wokeAt);
+                wokeAt = null;
+            }
+        }
+    };
+
+    observe(window, SHELL_PAGE);
+    setInterval(flush, FLUSH_MS);
+    window.addEventListener('pywebviewready', flush);
+})();
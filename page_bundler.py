@@ -0,0 +1,476 @@
+"""
+Page Bundler - ahead-of-time build of the pages the kiosk can reach
+Every touch on the kiosk loads a new page into the shell's iframe, and each page pulls
+style.css and half a dozen shared scripts over file:// before it can paint. This writes
+an optimised copy of the page folder to page-bundle/:
+
+  - style.css is inlined into each page's <head>, cut down to the rules the page (and
+    the scripts it loads) can use - no blocking stylesheet request
+  - shared scripts are minified once and every page loads them by the same URL
+    (currency-formatter.js?v=2 and currency-formatter.js are one script, so WebView2
+    compiles and code-caches it once); a script a page includes twice is included once
+  - each page gets preload hints for its scripts, fonts and first images, and prefetch
+    hints for the pages it links to
+  - inline scripts and styles are minified, HTML comments and indentation stripped
+
+Everything else reachable from kiosk-shell.html (bundle_manifest.py) is linked or copied
+as-is. kiosk_app.py loads page-bundle/ in dev mode while it is newer than the pages,
+and the release build (KioskApp.spec) ships it as page-1.
+
+    python page_bundler.py                 # build page-bundle/
+    python page_bundler.py --check         # exit 1 if the bundle is missing or stale
+    python measure_transitions.py --compare
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import time
+
+from bundle_manifest import PAGE_ROOT, _excluded, reachable_assets
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BUNDLE_DIR = os.path.join(BASE_DIR, 'page-bundle')
+MANIFEST_FILE = 'bundle.json'
+BUNDLER_VERSION = 1
+MAX_IMAGE_PRELOADS = 4      # first images in a page's markup worth fetching during parse
+
+_JS_TYPES = ('', 'text/javascript', 'application/javascript', 'module')
+_KEYWORDS_BEFORE_REGEX = ('return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'new', 'delete', 'void',
+                          'throw', 'yield', 'await', 'instanceof')
+
+
+# --- Minifiers (comment and whitespace removal only - newlines kept, so ASI is untouched) ---
+
+def minify_js(text):
+    """Strip comments, indentation and blank lines; strings, templates and regexes are kept verbatim"""
+    out = []
+    code = []        # current stretch of plain code
+    i, n = 0, len(text)
+
+    def flush():
+        if code:
+            seg = ''.join(code)
+            seg = re.sub(r'[ \t]*\r?\n\s*', '\n', seg)
+            out.append(re.sub(r'[ \t]+', ' ', seg))
+            code.clear()
+
+    def last_significant():
+        for parts in (code, out):
+            for part in reversed(parts):
+                stripped = part.rstrip()
+                if stripped:
+                    return stripped
+        return ''
+
+    while i < n:
+        c = text[i]
+        if c in '"\'`':
+            j = i + 1
+            depth = 0
+            while j < n:
+                if text[j] == '\\':
+                    j += 2
+                    continue
+                if c == '`' and text.startswith('${', j):
+                    depth += 1
+                elif c == '`' and depth and text[j] == '}':
+                    depth -= 1
+                elif text[j] == c and not depth:
+                    break
+                elif text[j] == '\n' and c != '`':
+                    break
+                j += 1
+            flush()
+            out.append(text[i:j + 1])
+            i = j + 1
+        elif text.startswith('//', i):
+            j = text.find('\n', i)
+            i = n if j < 0 else j
+        elif text.startswith('/*', i):
+            j = text.find('*/', i + 2)
+            j = n if j < 0 else j + 2
+            code.append('\n' if '\n' in text[i:j] else ' ')
+            i = j
+        elif c == '/':
+            prev = last_significant()
+            word = re.search(r'[\w$]+$', prev)
+            if not prev or prev[-1] in '(,=:[!&|?{};+-*%<>~^' or (word and word.group() in _KEYWORDS_BEFORE_REGEX):
+                j = i + 1
+                in_class = False
+                while j < n and text[j] != '\n':
+                    if text[j] == '\\':
+                        j += 2
+                        continue
+                    if text[j] == '[':
+                        in_class = True
+                    elif text[j] == ']':
+                        in_class = False
+                    elif text[j] == '/' and not in_class:
+                        break
+                    j += 1
+                j += 1
+                while j < n and (text[j].isalnum()):
+                    j += 1                      # flags
+                flush()
+                out.append(text[i:j])
+                i = j
+            else:
+                code.append(c)
+                i += 1
+        else:
+            code.append(c)
+            i += 1
+    flush()
+    return ''.join(out).strip() + '\n'
+
+
+_CSS_TOKEN = re.compile(r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')|/\*.*?\*/''', re.S)
+
+
+def minify_css(text):
+    """Strip comments and collapse whitespace outside strings"""
+    out = []
+    pos = 0
+    for match in _CSS_TOKEN.finditer(text):
+        out.append(_squeeze_css(text[pos:match.start()]))
+        out.append(match.group(1) or ' ')
+        pos = match.end()
+    out.append(_squeeze_css(text[pos:]))
+    return re.sub(r'\s*([{};,>])\s*', r'\1', ''.join(out)).replace(';}', '}').strip()
+
+
+def _squeeze_css(seg):
+    return re.sub(r'\s+', ' ', seg)
+
+
+# --- Critical CSS ---
+
+def _css_rules(css):
+    """Top-level (prelude, body) pairs of minified CSS - at-rule bodies are left unparsed"""
+    rules = []
+    i, n = 0, len(css)
+    while i < n:
+        brace = css.find('{', i)
+        semi = css.find(';', i)
+        if semi >= 0 and (brace < 0 or semi < brace):    # @import / @charset
+            rules.append((css[i:semi + 1], None))
+            i = semi + 1
+            continue
+        if brace < 0:
+            break
+        depth, j = 0, brace
+        while j < n:
+            if css[j] == '{':
+                depth += 1
+            elif css[j] == '}':
+                depth -= 1
+                if depth == 0:
+                    break
+            elif css[j] in '"\'':
+                j = css.find(css[j], j + 1)
+            j += 1
+        rules.append((css[i:brace].strip(), css[brace + 1:j]))
+        i = j + 1
+    return rules
+
+
+def _selector_used(selector, words, prefixes):
+    selector = re.sub(r':not\([^)]*\)', '', selector)   # :not(.x) matches whether or not .x exists
+    for name in re.findall(r'[.#](-?[A-Za-z_][\w-]*)', selector):
+        if name not in words and not any(name.startswith(p) for p in prefixes):
+            return False
+    return True
+
+
+def critical_css(css, page_text):
+    """The rules of a stylesheet that can match something in the page or its scripts"""
+    words = set(re.findall(r'[\w-]+', page_text))
+    # Class names built at runtime: 'btn-' + color, `lang-${code}`
+    prefixes = {w for w in re.findall(r'\b([\w-]+)(?:["\'`]\s*\+|\$\{)', page_text) if w[-1] in '-_'}
+
+    def keep(rules):
+        kept = []
+        for prelude, body in rules:
+            if body is None or prelude.startswith(('@font-face', '@keyframes', '@-webkit-keyframes')):
+                kept.append((prelude, body))
+            elif prelude.startswith('@media') or prelude.startswith('@supports'):
+                inner = keep(_css_rules(body))
+                if inner:
+                    kept.append((prelude, ''.join(_join(inner))))
+            elif prelude.startswith('@') or any(_selector_used(s, words, prefixes) for s in _split_selectors(prelude)):
+                kept.append((prelude, body))
+        return kept
+
+    kept = keep(_css_rules(css))
+    # Keyframes and font faces only if something kept refers to them
+    used_text = page_text + ''.join(body or '' for prelude, body in kept if not prelude.startswith(('@font-face', '@keyframes')))
+    result = []
+    for prelude, body in kept:
+        if prelude.startswith(('@keyframes', '@-webkit-keyframes')):
+            if prelude.split(None, 1)[-1] not in used_text:
+                continue
+        elif prelude.startswith('@font-face'):
+            family = re.search(r'font-family:\s*["\']?([^;"\']+)', body or '')
+            if family and family.group(1) not in used_text:
+                continue
+        result.append((prelude, body))
+    return ''.join(_join(result))
+
+
+def _split_selectors(prelude):
+    parts, depth, start = [], 0, 0
+    for i, c in enumerate(prelude):
+        if c in '([':
+            depth += 1
+        elif c in ')]':
+            depth -= 1
+        elif c == ',' and depth == 0:
+            parts.append(prelude[start:i])
+            start = i + 1
+    parts.append(prelude[start:])
+    return parts
+
+
+def _join(rules):
+    for prelude, body in rules:
+        yield prelude if body is None else f'{prelude}{{{body}}}'
+
+
+# --- Pages ---
+
+_SCRIPT = re.compile(r'<script\b([^>]*)>(.*?)</script\s*>', re.S | re.I)
+_STYLE = re.compile(r'<style\b([^>]*)>(.*?)</style\s*>', re.S | re.I)
+_STYLESHEET = re.compile(r'<link\b[^>]*\brel=["\']?stylesheet["\']?[^>]*>', re.I)
+_ATTR = r'''\b{}\s*=\s*["']([^"']*)["']'''
+_PRESERVE = re.compile(r'(<(pre|textarea)\b.*?</\2\s*>)', re.S | re.I)
+
+
+def _attr(tag, name):
+    match = re.search(_ATTR.format(name), tag, re.I)
+    return match.group(1) if match else None
+
+
+def _local(ref):
+    return ref and not re.match(r'^(?:[a-z]+:|//|#)', ref, re.I)
+
+
+def _clean_ref(ref):
+    return ref.split('?')[0].split('#')[0]
+
+
+def minify_html(html):
+    """Minify inline scripts and styles, drop comments and indentation elsewhere"""
+    saved = []
+
+    def stash(text):
+        saved.append(text)
+        return f'\x00{len(saved) - 1}\x00'
+
+    def script(match):
+        attrs, body = match.group(1), match.group(2)
+        kind = (_attr(attrs, 'type') or '').lower()
+        if body.strip() and kind in _JS_TYPES:
+            body = '\n' + minify_js(body)
+        return stash(f'<script{attrs}>{body}</script>')
+
+    html = _SCRIPT.sub(script, html)
+    html = _STYLE.sub(lambda m: stash(f'<style{m.group(1)}>{minify_css(m.group(2))}</style>'), html)
+    html = _PRESERVE.sub(lambda m: stash(m.group(1)), html)
+    html = re.sub(r'<!--(?!\[if).*?-->', '', html, flags=re.S)
+    html = re.sub(r'[ \t]*\r?\n\s*', '\n', html)
+    return re.sub('\x00(\\d+)\x00', lambda m: saved[int(m.group(1))], html).strip() + '\n'
+
+
+def _linked_pages(html, pages):
+    """Other pages this one can navigate to - shellNavigate('x.html'), location.href = 'x.html', <a href>"""
+    found = []
+    for ref in re.findall(r'''["'`]([^"'`\s]+\.html)(?:[?#][^"'`]*)?["'`]''', html):
+        ref = _clean_ref(ref)
+        if ref in pages and ref not in found:
+            found.append(ref)
+    return found
+
+
+def bundle_page(rel, html, source, scripts, css_files, pages):
+    """Optimised HTML for one page, and what was done to it"""
+    info = {"bytes_before": len(html.encode('utf-8')), "inlined_css": [], "scripts": [], "duplicates_removed": 0,
+            "preloads": [], "prefetches": []}
+    base = os.path.dirname(rel)
+
+    def resolve(ref):
+        return os.path.normpath(os.path.join(base, _clean_ref(ref))).replace('\\', '/')
+
+    # Scripts: one URL per script, each included once
+    seen = set()
+
+    def script_tag(match):
+        attrs = match.group(1)
+        src = _attr(attrs, 'src')
+        if not _local(src):
+            return match.group(0)
+        path = resolve(src)
+        if path in seen:
+            info["duplicates_removed"] += 1
+            return ''
+        seen.add(path)
+        if path in scripts:
+            info["scripts"].append(path)
+            attrs = re.sub(_ATTR.format('src'), f'src="{os.path.relpath(path, base or ".").replace(os.sep, "/")}"',
+                           attrs, count=1, flags=re.I)
+        return f'<script{attrs}>{match.group(2)}</script>'
+
+    html = _SCRIPT.sub(script_tag, html)
+
+    # Text the page's CSS could be matched against: its markup and every local script it loads
+    page_text = html + ''.join(scripts.get(path, '') for path in info["scripts"])
+
+    # Stylesheets: inline the rules this page can use
+    def stylesheet(match):
+        href = _attr(match.group(0), 'href')
+        path = resolve(href) if _local(href) else None
+        if path not in css_files or os.path.dirname(path) != base:   # url()s stay right only in the same folder
+            return match.group(0)
+        info["inlined_css"].append(path)
+        return f'<style data-inlined="{path}">{critical_css(css_files[path], page_text)}</style>'
+
+    html = _STYLESHEET.sub(stylesheet, html)
+    html = minify_html(html)
+
+    # Hints: scripts (usually at the end of <body>), fonts the inlined CSS needs, first images
+    hints = []
+    for path in info["scripts"]:
+        hints.append(f'<link rel="preload" href="{os.path.relpath(path, base or ".").replace(os.sep, "/")}" as="script">')
+        info["preloads"].append(path)
+    inlined = ''.join(m.group(2) for m in _STYLE.finditer(html))
+    for ref in re.findall(r'''@font-face\{[^}]*?url\(["']?([^"')]+)''', inlined):
+        if _local(ref) and os.path.isfile(os.path.join(source, resolve(ref))):
+            hints.append(f'<link rel="preload" href="{ref}" as="font" crossorigin>')
+            info["preloads"].append(resolve(ref))
+    images = []
+    for ref in re.findall(r'''<img\b[^>]*?\bsrc=["']([^"']+)["']''', html, re.I):
+        if _local(ref) and ref not in images and os.path.isfile(os.path.join(source, resolve(ref))):
+            images.append(ref)
+    for ref in images[:MAX_IMAGE_PRELOADS]:
+        hints.append(f'<link rel="preload" href="{ref}" as="image">')
+        info["preloads"].append(resolve(ref))
+    for page in _linked_pages(html, pages):
+        if page != rel:
+            hints.append(f'<link rel="prefetch" href="{page}">')
+            info["prefetches"].append(page)
+
+    if hints and re.search(r'</head\s*>', html, re.I):
+        html = re.sub(r'</head\s*>', lambda m: '\n'.join(hints) + '\n' + m.group(0), html, count=1, flags=re.I)
+    info["bytes_after"] = len(html.encode('utf-8'))
+    return html, info
+
+
+# --- Build ---
+
+def fingerprint(source=PAGE_ROOT):
+    """Changes whenever a file under the page folder (or the bundler) changes"""
+    digest = hashlib.sha1(f'v{BUNDLER_VERSION}'.encode())
+    for dirpath, dirnames, filenames in os.walk(source):
+        dirnames.sort()
+        for name in sorted(filenames):
+            path = os.path.join(dirpath, name)
+            rel = os.path.relpath(path, source).replace('\\', '/')
+            if _excluded(rel):
+                continue
+            stat = os.stat(path)
+            digest.update(f'{rel}:{stat.st_size}:{stat.st_mtime_ns};'.encode())
+    return digest.hexdigest()
+
+
+def is_fresh(bundle=BUNDLE_DIR, source=PAGE_ROOT):
+    """True when bundle was built from the pages as they are now"""
+    try:
+        with open(os.path.join(bundle, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f).get("source") == fingerprint(source)
+    except (OSError, ValueError):
+        return False
+
+
+def _place(src, dst):
+    """Hard link an untouched asset (60 MB of videos and images), copy if linking isn't possible"""
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8', newline='\n') as f:
+        f.write(text)
+
+
+def _read(path):
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        return f.read()
+
+
+def build(source=PAGE_ROOT, out=BUNDLE_DIR):
+    """Write the bundle - returns its manifest"""
+    if os.path.isdir(out):
+        if os.listdir(out) and not os.path.exists(os.path.join(out, MANIFEST_FILE)):
+            raise Exception(f"{out} exists and is not a page bundle - not overwriting it")
+        shutil.rmtree(out)
+    started = time.time()
+    assets = reachable_assets(source)
+    pages = [rel for rel in assets if rel.lower().endswith(('.html', '.htm'))]
+    scripts, css_files = {}, {}
+    totals = {"bytes_before": 0, "bytes_after": 0}
+
+    for rel in assets:
+        src, dst = os.path.join(source, rel), os.path.join(out, rel)
+        lower = rel.lower()
+        if lower.endswith('.js'):
+            text = _read(src)
+            scripts[rel] = text
+            small = text if lower.endswith('.min.js') else minify_js(text)
+            _write(dst, small)
+            totals["bytes_before"] += os.path.getsize(src)
+            totals["bytes_after"] += len(small.encode('utf-8'))
+        elif lower.endswith('.css'):
+            css_files[rel] = minify_css(_read(src))
+            _write(dst, css_files[rel])   # Still there for anything that links it from another folder
+        elif rel not in pages:
+            _place(src, dst)
+
+    page_info = {}
+    for rel in pages:
+        html, info = bundle_page(rel, _read(os.path.join(source, rel)), source, scripts, css_files, pages)
+        _write(os.path.join(out, rel), html)
+        page_info[rel] = info
+        totals["bytes_before"] += info["bytes_before"]
+        totals["bytes_after"] += info["bytes_after"]
+
+    manifest = {"version": BUNDLER_VERSION, "built_at": time.time(), "source": fingerprint(source),
+                "build_s": round(time.time() - started, 2), "files": len(assets), "text": totals, "pages": page_info}
+    _write(os.path.join(out, MANIFEST_FILE), json.dumps(manifest, indent=2))
+    return manifest
+
+
+def main():
+    if '--check' in sys.argv:
+        fresh = is_fresh()
+        print("page-bundle is up to date" if fresh else "page-bundle is missing or older than the pages")
+        return 0 if fresh else 1
+    manifest = build()
+    for rel, info in sorted(manifest["pages"].items()):
+        print(f"{rel:32s} {info['bytes_before'] / 1024:7.1f} -> {info['bytes_after'] / 1024:6.1f} KB  "
+              f"{len(info['scripts'])} scripts, {len(info['preloads'])} preloads, {len(info['prefetches'])} prefetches"
+              + (f", {len(info['inlined_css'])} css inlined" if info['inlined_css'] else ''))
+    text = manifest["text"]
+    print(f"{manifest['files']} files in {BUNDLE_DIR} ({manifest['build_s']}s) - "
+          f"pages and scripts {text['bytes_before'] / 1024:.0f} KB -> {text['bytes_after'] / 1024:.0f} KB")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""
+Print Coalescer - collapses duplicate print requests into one job
+A double-tap on the touchscreen sends the same print call twice. Calls with the same
+idempotency key (or the same content, when no key is given) that arrive while the job
+is running, or within a short window after it succeeded, get that job's result instead
+of printing again.
+"""
+
+import hashlib
+import json
+import threading
+import time
+
+from kiosk_log import log
+
+DEDUPE_WINDOW = 5.0  # seconds a successful job's result is reused for identical requests
+
+
+def content_key(method_name, *args):
+    """Idempotency key derived from the call itself - same method and arguments, same key"""
+    h = hashlib.blake2b(method_name.encode('utf-8'), digest_size=16)
+    for arg in args:
+        if isinstance(arg, str):
+            h.update(b'\x00s')
+            h.update(arg.encode('utf-8'))
+        else:
+            h.update(b'\x00j')
+            h.update(json.dumps(arg, sort_keys=True, default=str).encode('utf-8'))
+    return h.hexdigest()
+
+
+class _Job:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.finished_at = None
+        self.waiters = 0
+
+
+class PrintCoalescer:
+    """Runs one job per key. Followers wait for the leader and share its result."""
+
+    def __init__(self, window=DEDUPE_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self.stats = {"jobs": 0, "coalesced": 0}
+
+    def run(self, key, func):
+        with self._lock:
+            self._expire()
+            job = self._jobs.get(key)
+            leader = job is None
+            if leader:
+                job = self._jobs[key] = _Job()
+                self.stats["jobs"] += 1
+            else:
+                job.waiters += 1
+                self.stats["coalesced"] += 1
+
+        if not leader:
+            state = "in flight" if not job.done.is_set() else "just printed"
+            log(f"Duplicate print request coalesced ({state}, key {key[:12]})")
+            job.done.wait()
+            result = dict(job.result) if isinstance(job.result, dict) else job.result
+            if isinstance(result, dict):
+                result["duplicate"] = True
+            return result
+
+        try:
+            job.result = func()
+        except Exception as e:
+            job.result = {"success": False, "message": str(e)}
+        finally:
+            with self._lock:
+                job.finished_at = time.time()
+                # Only successes are remembered - a retry after a failure must print again
+                if not (isinstance(job.result, dict) and job.result.get("success")) or self.window <= 0:
+                    if self._jobs.get(key) is job:
+                        del self._jobs[key]
+            job.done.set()
+        return job.result
+
+    def _expire(self):
+        # Caller holds self._lock
+        now = time.time()
+        stale = [k for k, j in self._jobs.items()
+                 if j.finished_at is not None and now - j.finished_at > self.window]
+        for key in stale:
+            del self._jobs[key]
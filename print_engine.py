@@ -0,0 +1,289 @@
+"""
+Print Engine - runs receipt imaging in a separate worker process
+PIL decoding, resizing and ESC/POS encoding no longer share the GIL with the
+pywebview bridge and the keyboard hook, and a crash in imaging code only takes
+down the worker, which is restarted on the next job.
+Very tall receipts are encoded in parallel across a small process pool.
+Each worker renders one job at a time; a second (third...) worker is started when
+jobs for several printers render at once, so one printer's receipt doesn't wait on
+another's.
+"""
+
+import atexit
+import multiprocessing
+import queue
+import threading
+import time
+
+from kiosk_log import log
+
+PARALLEL_ROWS = 3000   # receipts at least this tall (output rows) use the encoding pool
+POOL_SIZE = 2
+WORKERS = 3            # most jobs rendering at once - extra workers start on demand
+MESSAGE_TIMEOUT = 30   # seconds without a message from the worker before it is considered hung
+
+
+# ---------- Worker process side ----------
+
+def _ordered_parallel(pool, func, items, window):
+    """Like pool.imap but never reads more than `window` items ahead - keeps memory bounded"""
+    pending = []
+    for item in items:
+        pending.append(pool.apply_async(func, (item,)))
+        if len(pending) >= window:
+            yield pending.pop(0).get()
+    for result in pending:
+        yield result.get()
+
+
+def _worker_main(conn, pool_size, parallel_rows):
+    """Entry point of the engine process - renders one request at a time"""
+    from receipt_imaging import StripRaster, render_tile, RASTER_HEADER, RASTER_TRAILER
+
+    pool = None
+    try:
+        while True:
+            try:
+                message = conn.recv()
+            except EOFError:
+                return  # Kiosk process went away
+            if message is None:
+                return
+
+            kind, req_id, args = message
+            try:
+                if kind != "raster":
+                    raise Exception(f"Unknown engine request: {kind}")
+                image_data_base64, max_width, band_rows, rows_per_command = args
+                raster = StripRaster(image_data_base64, max_width, band_rows, rows_per_command)
+                del image_data_base64, args, message
+                conn.send(("info", req_id, (raster.width, raster.height, raster.source_size)))
+                conn.send(("chunk", req_id, RASTER_HEADER))
+
+                tiles = raster.tiles()
+                if pool_size > 1 and raster.height >= parallel_rows:
+                    if pool is None:
+                        pool = multiprocessing.Pool(pool_size)
+                    chunks = _ordered_parallel(pool, render_tile, tiles, pool_size * 2)
+                else:
+                    chunks = map(render_tile, tiles)
+                for chunk in chunks:
+                    conn.send(("chunk", req_id, chunk))
+
+                conn.send(("chunk", req_id, RASTER_TRAILER))
+                conn.send(("done", req_id, None))
+            except Exception as e:
+                conn.send(("error", req_id, f"{type(e).__name__}: {e}"))
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+
+# ---------- Kiosk process side ----------
+
+class RemoteRaster:
+    """Handle to a raster being rendered by the engine - iterate it for ESC/POS chunks"""
+
+    def __init__(self, engine, req_id, timeout):
+        self._engine = engine
+        self._req_id = req_id
+        self._timeout = timeout
+        self._queue = queue.Queue(maxsize=16)  # Backpressure - the worker blocks on a full pipe
+        self.failed = None
+        self.closed = False
+        self.width = self.height = self.source_size = None
+
+    def _next(self):
+        deadline = time.time() + self._timeout
+        while True:
+            try:
+                kind, payload = self._queue.get(timeout=0.25)
+                break
+            except queue.Empty:
+                if self.failed:
+                    raise Exception(self.failed)
+                if time.time() >= deadline:
+                    self._engine._worker_hung(self._req_id)
+                    raise Exception(f"Print engine did not respond within {self._timeout}s")
+        if kind == "error":
+            raise Exception(f"Print engine error: {payload}")
+        return kind, payload
+
+    def _wait_info(self):
+        kind, payload = self._next()
+        self.width, self.height, self.source_size = payload
+
+    def __iter__(self):
+        try:
+            while True:
+                kind, payload = self._next()
+                if kind == "done":
+                    return
+                yield payload
+        finally:
+            self.close()
+
+    def close(self):
+        """Stop receiving - the engine drops any chunks still in flight and takes the next job"""
+        if not self.closed:
+            self.closed = True
+            self._engine._finish(self)
+
+
+class _EngineWorker:
+    """One worker process, and the print call waiting on it.
+
+    A worker renders one job at a time (a printer takes them one at a time anyway), so a
+    job's timeout only runs while the worker is actually working on it.
+    """
+
+    def __init__(self, pool_size, parallel_rows, timeout, on_free):
+        self.pool_size = pool_size
+        self.parallel_rows = parallel_rows
+        self.timeout = timeout
+        self._on_free = on_free        # on_free(worker) once the handle from raster() is closed
+        self._lock = threading.Lock()  # guards process start and the active request
+        self._active = None
+        self._next_id = 1
+        self._process = None
+        self._conn = None
+        self._start()
+
+    def _start(self):
+        parent_conn, child_conn = multiprocessing.Pipe()
+        # Not a daemon - daemonic processes can't own the encoding pool
+        self._process = multiprocessing.Process(target=_worker_main, name="PrintEngine",
+                                                args=(child_conn, self.pool_size, self.parallel_rows))
+        self._process.start()
+        child_conn.close()
+        self._conn = parent_conn
+        threading.Thread(target=self._reader, args=(parent_conn,), name="PrintEngineReader", daemon=True).start()
+        log(f"Print engine started (pid {self._process.pid}, pool of {self.pool_size} for >= {self.parallel_rows} rows)")
+
+    def raster(self, image_data_base64, max_width, band_rows, rows_per_command):
+        """Render an image - the caller has this worker to itself until the handle is closed"""
+        try:
+            with self._lock:
+                if self._process is None or not self._process.is_alive():
+                    if self._process is not None:
+                        log(f"[WARNING] Print engine exited (code {self._process.exitcode}) - restarting")
+                    self._start()
+                handle = RemoteRaster(self, self._next_id, self.timeout)
+                self._next_id += 1
+                self._active = handle
+                conn = self._conn
+            conn.send(("raster", handle._req_id, (image_data_base64, max_width, band_rows, rows_per_command)))
+        except Exception:
+            self._active = None
+            self._on_free(self)
+            raise
+        try:
+            handle._wait_info()
+        except Exception:
+            handle.close()
+            raise
+        return handle
+
+    def _finish(self, handle):
+        with self._lock:
+            if self._active is handle:
+                self._active = None
+        # Drain so a reader blocked on a full queue moves on
+        while True:
+            try:
+                handle._queue.get_nowait()
+            except queue.Empty:
+                break
+        self._on_free(self)
+
+    def _reader(self, conn):
+        """Hand worker messages to the active request. Fails it if the worker dies."""
+        while True:
+            try:
+                kind, req_id, payload = conn.recv()
+            except (EOFError, OSError):
+                break
+            handle = self._active
+            if handle is None or handle._req_id != req_id:
+                continue  # Leftovers of a job that was abandoned
+            # Block while the printer catches up, unless the caller gave up on this job
+            while not handle.closed:
+                try:
+                    handle._queue.put((kind, payload), timeout=0.25)
+                    break
+                except queue.Full:
+                    continue
+
+        handle = self._active
+        if handle is not None and self._conn is conn:
+            handle.failed = "Print engine process exited"
+
+    def _worker_hung(self, req_id):
+        """A request timed out - kill the worker so the next job gets a fresh one"""
+        with self._lock:
+            if self._process is not None and self._process.is_alive():
+                log(f"[WARNING] Print engine hung on request {req_id} - terminating pid {self._process.pid}")
+                self._process.terminate()
+
+    def close(self):
+        with self._lock:
+            process, conn = self._process, self._conn
+            self._process = None
+        if process is None:
+            return
+        try:
+            conn.send(None)
+        except Exception:
+            pass
+        process.join(timeout=3)
+        if process.is_alive():
+            process.terminate()
+        log(f"Print engine stopped (pid {process.pid})")
+
+
+class PrintEngine:
+    """Hands each render to an idle worker process - up to `workers` of them render at once"""
+
+    def __init__(self, pool_size=POOL_SIZE, parallel_rows=PARALLEL_ROWS, timeout=MESSAGE_TIMEOUT,
+                 workers=WORKERS):
+        self.pool_size = pool_size
+        self.parallel_rows = parallel_rows
+        self.timeout = timeout
+        self.max_workers = workers
+        self._free = threading.Condition()
+        self._workers = []
+        self._idle = []
+        self._closed = False
+        self._idle.append(self._new_worker())  # One up front - the first receipt shouldn't wait for it
+        # Workers aren't daemons, so make sure they're told to stop before multiprocessing joins them
+        atexit.register(self.close)
+
+    def _new_worker(self):
+        worker = _EngineWorker(self.pool_size, self.parallel_rows, self.timeout, self._release)
+        self._workers.append(worker)
+        return worker
+
+    def _acquire(self):
+        with self._free:
+            while not self._closed and not self._idle and len(self._workers) >= self.max_workers:
+                self._free.wait()
+            if self._closed:
+                raise Exception("Print engine is closed")
+            return self._idle.pop() if self._idle else self._new_worker()
+
+    def _release(self, worker):
+        with self._free:
+            self._idle.append(worker)
+            self._free.notify()
+
+    def raster(self, image_data_base64, max_width=576, band_rows=128, rows_per_command=1):
+        """Render an image in the engine. Returns once the output size is known."""
+        return self._acquire().raster(image_data_base64, max_width, band_rows, rows_per_command)
+
+    def close(self):
+        with self._free:
+            self._closed = True
+            workers = list(self._workers)
+            self._free.notify_all()
+        for worker in workers:
+            worker.close()
@@ -0,0 +1,292 @@
+"""
+Print Journal - crash-safe on-disk record of print jobs
+Every job's ESC/POS payload and state changes are appended to segment files.
+Jobs that were still queued or printing when the kiosk stopped are replayed on the next start.
+"""
+
+import os
+import json
+import struct
+import threading
+import time
+import zlib
+
+from kiosk_log import log
+
+# Record types
+REC_JOB = 1    # New job - body is JSON metadata
+REC_DATA = 2   # Payload chunk - body is job id + bytes
+REC_SEAL = 3   # Payload complete - body is job id
+REC_STATE = 4  # State change - body is job id + state
+
+# Job states
+QUEUED = 1
+PRINTING = 2
+DONE = 3
+FAILED = 4
+STATE_NAMES = {QUEUED: "queued", PRINTING: "printing", DONE: "done", FAILED: "failed"}
+
+_HEADER = struct.Struct('<BII')  # record type, body length, crc32 of body
+_JOB_ID = struct.Struct('<Q')
+_STATE = struct.Struct('<QB')
+
+
+def _segment_name(number):
+    return f"journal-{number:06d}.seg"
+
+
+class PrintJournal:
+    """Append-only journal of print jobs with batched fsync and background compaction.
+
+    Records are flushed to the OS on every append (survives a process crash) and
+    fsync'd by a background thread at most every fsync_interval seconds, so the
+    print path never waits on the disk.
+    """
+
+    def __init__(self, folder, segment_bytes=4 * 1024 * 1024, fsync_interval=0.05, compact_interval=30):
+        self.folder = folder
+        self.segment_bytes = segment_bytes
+        self.fsync_interval = fsync_interval
+        self.compact_interval = compact_interval
+        os.makedirs(folder, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._jobs = {}          # job id -> job dict, only jobs not yet done/failed
+        self._segment_live = {}  # segment number -> set of live job ids with records in it
+        self._next_id = 1
+        self._file = None
+        self._segment = 0
+        self._size = 0
+        self._dirty = False
+        self._stop = threading.Event()
+
+        # Jobs found queued/printing from the previous run - see replay in kiosk_app.py
+        self.pending = self._recover()
+        self._open_segment(max(self._segment_live, default=0) + 1)
+
+        self._worker = threading.Thread(target=self._background_loop, name="PrintJournal", daemon=True)
+        self._worker.start()
+        log(f"Print journal ready: {folder} ({len(self.pending)} job(s) to replay)")
+
+    # ---------- Writing ----------
+
+    def begin(self, printer_name, doc_name, payload=None, **meta):
+        """Start a job. If the full payload is given it is written and sealed immediately."""
+        with self._lock:
+            job_id = self._next_id
+            self._next_id += 1
+            info = {"id": job_id, "printer": printer_name, "doc": doc_name, "created": time.time()}
+            info.update(meta)
+            self._jobs[job_id] = {"id": job_id, "meta": info, "segments": set(), "chunks": [],
+                                  "sealed": False, "state": QUEUED}
+            self._append(job_id, REC_JOB, json.dumps(info).encode('utf-8'))
+            if payload is not None:
+                self._append(job_id, REC_DATA, _JOB_ID.pack(job_id), payload)
+                self._append(job_id, REC_SEAL, _JOB_ID.pack(job_id))
+                self._jobs[job_id]["sealed"] = True
+        return job_id
+
+    def append(self, job_id, chunk):
+        """Add a chunk of payload to a job that is being streamed"""
+        with self._lock:
+            self._append(job_id, REC_DATA, _JOB_ID.pack(job_id), chunk)
+
+    def seal(self, job_id):
+        """Mark a streamed job's payload as complete - only sealed jobs are replayed"""
+        with self._lock:
+            self._append(job_id, REC_SEAL, _JOB_ID.pack(job_id))
+            if job_id in self._jobs:
+                self._jobs[job_id]["sealed"] = True
+
+    def mark(self, job_id, state):
+        """Record a state transition. Done/failed jobs release their segments for compaction."""
+        with self._lock:
+            self._append(job_id, REC_STATE, _STATE.pack(job_id, state))
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job["state"] = state
+            if state in (DONE, FAILED):
+                self._release(job)
+
+    def payload(self, job):
+        """Read a recovered job's payload back from disk"""
+        data = bytearray()
+        for path, offset, length in job["chunks"]:
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                data.extend(f.read(length))
+        return bytes(data)
+
+    def close(self):
+        """Stop the background thread and fsync everything written so far"""
+        self._stop.set()
+        self._worker.join(timeout=2)
+        with self._lock:
+            if self._file:
+                self._sync(self._file)
+                self._file.close()
+                self._file = None
+        log("Print journal closed")
+
+    # ---------- Internals ----------
+
+    def _append(self, job_id, rec_type, body, data=b''):
+        # Caller holds self._lock
+        if self._file is None:
+            raise Exception("Print journal is closed")
+        crc = zlib.crc32(data, zlib.crc32(body))
+        self._file.write(_HEADER.pack(rec_type, len(body) + len(data), crc))
+        self._file.write(body)
+        if data:
+            self._file.write(data)
+        self._file.flush()
+        self._size += _HEADER.size + len(body) + len(data)
+        self._dirty = True
+
+        job = self._jobs.get(job_id)
+        if job is not None:
+            job["segments"].add(self._segment)
+            self._segment_live[self._segment].add(job_id)
+
+        if self._size >= self.segment_bytes:
+            self._open_segment(self._segment + 1)
+
+    def _release(self, job):
+        # Caller holds self._lock
+        self._jobs.pop(job["id"], None)
+        for number in job["segments"]:
+            live = self._segment_live.get(number)
+            if live is not None:
+                live.discard(job["id"])
+
+    def _open_segment(self, number):
+        # Caller holds self._lock (or is __init__)
+        if self._file:
+            self._sync(self._file)
+            self._file.close()
+        self._segment = number
+        self._segment_live.setdefault(number, set())
+        self._file = open(os.path.join(self.folder, _segment_name(number)), 'ab')
+        self._size = self._file.tell()
+
+    def _sync(self, f):
+        try:
+            os.fsync(f.fileno())
+        except (OSError, ValueError):
+            pass  # File was closed by a segment roll - it was synced there
+
+    def _background_loop(self):
+        last_compact = time.time()
+        while not self._stop.wait(self.fsync_interval):
+            if self._dirty:
+                self._dirty = False
+                f = self._file
+                if f:
+                    self._sync(f)
+            if time.time() - last_compact >= self.compact_interval:
+                last_compact = time.time()
+                self.compact()
+
+    def compact(self):
+        """Delete old segments once every job recorded in them is done or failed"""
+        with self._lock:
+            dead = [n for n, live in self._segment_live.items() if not live and n != self._segment]
+            for number in dead:
+                del self._segment_live[number]
+        for number in dead:
+            try:
+                os.remove(os.path.join(self.folder, _segment_name(number)))
+            except OSError as e:
+                log(f"[WARNING] Could not remove journal segment {number}: {e}")
+        if dead:
+            log(f"Print journal compacted: removed {len(dead)} segment(s)")
+
+    def _recover(self):
+        """Scan existing segments and rebuild the set of unfinished jobs"""
+        numbers = []
+        for name in os.listdir(self.folder):
+            if name.startswith("journal-") and name.endswith(".seg"):
+                try:
+                    numbers.append(int(name[8:-4]))
+                except ValueError:
+                    pass
+        numbers.sort()
+
+        for number in numbers:
+            self._segment_live[number] = set()
+            path = os.path.join(self.folder, _segment_name(number))
+            good_end = self._scan_segment(number, path)
+            size = os.path.getsize(path)
+            if good_end < size:
+                # Torn record from a crash mid-write - cut it off
+                log(f"[WARNING] Journal segment {number} has a torn tail at {good_end}/{size} bytes, truncating")
+                with open(path, 'r+b') as f:
+                    f.truncate(good_end)
+
+        pending = []
+        for job in sorted(self._jobs.values(), key=lambda j: j["id"]):
+            job["replay_state"] = job["state"]
+            pending.append(job)
+        return pending
+
+    def _scan_segment(self, number, path):
+        offset = 0
+        with open(path, 'rb') as f:
+            while True:
+                header = f.read(_HEADER.size)
+                if len(header) < _HEADER.size:
+                    return offset
+                rec_type, length, crc = _HEADER.unpack(header)
+                body_offset = offset + _HEADER.size
+                if rec_type == REC_DATA:
+                    # Don't hold payloads in memory - just remember where they are
+                    head = f.read(_JOB_ID.size)
+                    rest_len = length - _JOB_ID.size
+                    check = zlib.crc32(head)
+                    remaining = rest_len
+                    while remaining > 0:
+                        piece = f.read(min(remaining, 1024 * 1024))
+                        if not piece:
+                            break
+                        check = zlib.crc32(piece, check)
+                        remaining -= len(piece)
+                    if len(head) < _JOB_ID.size or remaining or check != crc:
+                        return offset
+                    job = self._jobs.get(_JOB_ID.unpack(head)[0])
+                    if job is not None:
+                        job["chunks"].append((path, body_offset + _JOB_ID.size, rest_len))
+                        self._track(job, number)
+                else:
+                    body = f.read(length)
+                    if len(body) < length or zlib.crc32(body) != crc:
+                        return offset
+                    self._apply(rec_type, body, number)
+                offset = body_offset + length
+
+    def _apply(self, rec_type, body, number):
+        if rec_type == REC_JOB:
+            info = json.loads(body.decode('utf-8'))
+            job_id = info["id"]
+            self._next_id = max(self._next_id, job_id + 1)
+            self._jobs[job_id] = {"id": job_id, "meta": info, "segments": set(), "chunks": [],
+                                  "sealed": False, "state": QUEUED}
+            self._track(self._jobs[job_id], number)
+        elif rec_type == REC_SEAL:
+            job = self._jobs.get(_JOB_ID.unpack(body)[0])
+            if job is not None:
+                job["sealed"] = True
+                self._track(job, number)
+        elif rec_type == REC_STATE:
+            job_id, state = _STATE.unpack(body)
+            self._next_id = max(self._next_id, job_id + 1)
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job["state"] = state
+                self._track(job, number)
+                if state in (DONE, FAILED):
+                    self._release(job)
+
+    def _track(self, job, number):
+        job["segments"].add(number)
+        self._segment_live[number].add(job["id"])
@@ -0,0 +1,244 @@
+"""
+Print Pacing - flow control between the kiosk and the printer
+Payloads are written in chunks instead of one huge WritePrinter call. The pacer
+measures the rate each printer actually accepts data at, adapts chunk size and the
+delay between chunks to it, and checks printer status between chunks where the link
+can report it, so slow USB-serial printers aren't overrun.
+
+Producers hand over chunks that end on an ESC/POS command boundary (a raster job's
+bands, a whole text receipt). Writes are re-sliced freely, but a status query - a DLE
+EOT on two-way links, in the same byte stream - is only sent where a producer chunk
+ends, never inside GS v 0 image data or a command's arguments.
+"""
+
+import threading
+import time
+
+from kiosk_log import log
+
+DEFAULT_CHUNK = 4096
+MIN_CHUNK = 512
+MAX_CHUNK = 64 * 1024
+STALL_SECONDS = 0.5       # a single write blocking this long means the printer buffer is full
+STATUS_EVERY = 0.5        # seconds between status checks during a job
+STATUS_WAIT = 30          # seconds to wait for a printer to come back (paper, cover) mid-job
+
+DLE = b'\x10'
+EOT = b'\x04'
+
+
+def parse_dle_eot(n, value):
+    """Decode a DLE EOT n response byte into a status dict"""
+    status = {"online": True, "paper_out": False, "paper_low": False, "cover_open": False, "error": None}
+    if n == 1:      # printer status
+        status["online"] = not value & 0x08
+    elif n == 2:    # offline cause
+        status["cover_open"] = bool(value & 0x04)
+        status["paper_out"] = bool(value & 0x20)
+        if value & 0x40:
+            status["error"] = "printer error"
+        status["online"] = not (status["cover_open"] or status["paper_out"] or status["error"])
+    elif n == 3:    # error cause
+        if value & 0x08:
+            status["error"] = "auto-cutter error"
+        elif value & 0x20:
+            status["error"] = "unrecoverable error"
+        elif value & 0x40:
+            status["error"] = "head overheated"
+        status["online"] = status["error"] is None
+    elif n == 4:    # paper roll sensor
+        status["paper_low"] = bool(value & 0x0C)
+        status["paper_out"] = bool(value & 0x60)
+        status["online"] = not status["paper_out"]
+    return status
+
+
+def dle_eot_status(write, read, timeout=0.5):
+    """Real-time status over a two-way link (serial, TCP 9100, USB device).
+
+    write(bytes) sends, read(n, timeout) returns up to n bytes. Returns a status dict,
+    or None if the printer didn't answer - some models ignore DLE EOT while busy.
+    """
+    status = None
+    for n in (1, 2, 4):
+        write(DLE + EOT + bytes((n,)))
+        reply = read(1, timeout)
+        if not reply:
+            return status
+        part = parse_dle_eot(n, reply[0])
+        if status is None:
+            status = part
+        else:
+            status["paper_out"] = status["paper_out"] or part["paper_out"]
+            status["paper_low"] = status["paper_low"] or part["paper_low"]
+            status["cover_open"] = status["cover_open"] or part["cover_open"]
+            status["error"] = status["error"] or part["error"]
+            status["online"] = status["online"] and part["online"]
+    return status
+
+
+def spooler_status(flags):
+    """Status dict from a Windows spooler printer Status value - the closest a RAW queue gets to DLE EOT"""
+    status = {"online": True, "paper_out": bool(flags & 0x10), "paper_low": False,
+              "cover_open": bool(flags & 0x400000), "error": None}
+    if flags & 0x08:
+        status["error"] = "paper jam"
+    elif flags & 0x02:
+        status["error"] = "printer error"
+    status["online"] = not (flags & 0x80 or flags & 0x01 or status["paper_out"]
+                            or status["cover_open"] or status["error"])
+    return status
+
+
+def describe_status(status):
+    if status["paper_out"]:
+        return "Printer is OUT OF PAPER"
+    if status["cover_open"]:
+        return "Printer cover is OPEN"
+    if status["error"]:
+        return f"Printer error ({status['error']})"
+    if not status["online"]:
+        return "Printer is OFFLINE"
+    return "Printer is ready"
+
+
+class _LinkState:
+    """What the pacer has learned about one printer"""
+
+    def __init__(self, chunk, max_bps):
+        self.chunk = chunk
+        self.max_bps = max_bps      # from the profile - e.g. a 115200 baud serial link
+        self.rate = None            # learned bytes/second while the printer is the bottleneck
+        self.jobs = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.stalls = 0
+        self.status_checks = 0
+        self.last_bps = None
+        self.last_status = None
+
+
+class PrintPacer:
+    """Chunks, paces and status-checks writes to each printer. Shared by all print paths."""
+
+    def __init__(self, on_status=None):
+        self._lock = threading.Lock()
+        self._links = {}
+        self.on_status = on_status  # on_status(printer_name, status) when a printer's status changes
+
+    def _link(self, printer_name, profile):
+        with self._lock:
+            link = self._links.get(printer_name)
+            if link is None:
+                profile = profile or {}
+                link = self._links[printer_name] = _LinkState(profile.get("chunk_bytes", DEFAULT_CHUNK),
+                                                              profile.get("max_bps"))
+            return link
+
+    def write(self, printer_name, chunks, write, status=None, profile=None):
+        """Send an iterable of byte chunks through write(bytes), paced for this printer.
+
+        Each chunk must end on a command boundary. status() returns a status dict (see
+        spooler_status / dle_eot_status) or None; it is called at most every STATUS_EVERY
+        seconds, after everything up to the end of a chunk has been written.
+        """
+        link = self._link(printer_name, profile)
+        started = time.perf_counter()
+        last_status = started
+        sent = 0
+        buf = bytearray()
+        for chunk in chunks:
+            # Re-slice the producer's chunks to the link's current chunk size
+            buf += chunk
+            while len(buf) >= link.chunk:
+                size = link.chunk
+                sent += self._send(link, write, bytes(buf[:size]))
+                del buf[:size]
+
+            if status is not None and time.perf_counter() - last_status >= STATUS_EVERY:
+                # At a command boundary - flush the rest of the chunk so the query follows whole commands
+                if buf:
+                    sent += self._send(link, write, bytes(buf))
+                    buf.clear()
+                last_status = time.perf_counter()
+                self._check_status(printer_name, link, status)
+        if buf:
+            sent += self._send(link, write, bytes(buf))
+
+        total = time.perf_counter() - started
+        with self._lock:
+            link.jobs += 1
+            link.bytes += sent
+            link.seconds += total
+            link.last_bps = sent / total if total > 0 else None
+        return sent
+
+    def _send(self, link, write, piece):
+        t0 = time.perf_counter()
+        write(piece)
+        elapsed = time.perf_counter() - t0
+        self._adapt(link, len(piece), elapsed)
+
+        # Don't run ahead of what the printer can take
+        limits = [r for r in (link.rate, link.max_bps) if r]
+        if limits:
+            wait = len(piece) / min(limits) - elapsed
+            if wait > 0:
+                time.sleep(wait)
+        return len(piece)
+
+    def _adapt(self, link, size, elapsed):
+        if elapsed >= STALL_SECONDS:
+            # The write blocked - the printer buffer is full. Learn its rate, send smaller chunks.
+            link.stalls += 1
+            measured = size / elapsed
+            link.rate = measured if link.rate is None else 0.7 * link.rate + 0.3 * measured
+            link.chunk = max(MIN_CHUNK, link.chunk // 2)
+        elif elapsed < STALL_SECONDS / 4:
+            # Plenty of headroom - bigger chunks mean fewer round trips
+            link.chunk = min(MAX_CHUNK, link.chunk + link.chunk // 4)
+            if link.rate is not None:
+                link.rate *= 1.05  # Probe upwards so one slow moment doesn't cap us forever
+
+    def _check_status(self, printer_name, link, status):
+        deadline = time.time() + STATUS_WAIT
+        warned = False
+        while True:
+            try:
+                state = status()
+            except Exception as e:
+                log(f"[WARNING] Status query failed for {printer_name}: {e}")
+                return
+            link.status_checks += 1
+            if state is None:
+                return
+            text = describe_status(state)
+            if text != link.last_status and self.on_status:
+                self.on_status(printer_name, state)
+            link.last_status = text
+            if state["online"]:
+                if warned:
+                    log(f"✅ {printer_name} is back - resuming")
+                return
+            if time.time() >= deadline:
+                raise Exception(link.last_status)
+            if not warned:
+                log(f"[WARNING] {link.last_status} - holding the job for up to {STATUS_WAIT}s")
+                warned = True
+            time.sleep(0.5)
+
+    def forget(self, printer_name):
+        """Drop what was learned about a printer - its next job starts from its (new) profile"""
+        with self._lock:
+            self._links.pop(printer_name, None)
+
+    def stats(self):
+        """Per-printer throughput and pacing state"""
+        with self._lock:
+            return {name: {"jobs": s.jobs, "bytes": s.bytes,
+                           "avg_bps": round(s.bytes / s.seconds) if s.seconds else None,
+                           "last_bps": round(s.last_bps) if s.last_bps else None,
+                           "learned_bps": round(s.rate) if s.rate else None,
+                           "max_bps": s.max_bps, "chunk_bytes": s.chunk, "stalls": s.stalls,
+                           "status_checks": s.status_checks, "last_status": s.last_status}
+                    for name, s in self._links.items()}
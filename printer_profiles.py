@@ -0,0 +1,181 @@
+"""
+Printer Profiles - what each receipt printer can do
+Paper width, print head dots, dpi, text columns, raster/compression modes, code pages,
+the tallest raster command the printer accepts and link pacing hints (chunk_bytes, and
+max_bps for links that can't push back, such as serial adapters without flow control). Printers are matched to a
+profile by name or driver, and every renderer takes its layout and encoding from it.
+
+Extra or corrected profiles can be dropped into printer_profiles.json next to the exe
+(a list of profile objects - same keys as below); they are tried before the built-ins.
+"""
+
+import os
+import json
+
+from kiosk_log import EXE_DIR, log
+
+PROFILES_FILE = os.path.join(EXE_DIR, "printer_profiles.json")
+
+# ESC t n code page numbers -> Python codec, the standard Epson table
+CODE_PAGES = {
+    "cp437": 0,
+    "cp850": 2,
+    "cp860": 3,
+    "cp863": 4,
+    "cp865": 5,
+    "cp1252": 16,
+    "cp866": 17,
+    "cp852": 18,
+    "cp858": 19,
+}
+
+# Checked in order - the first profile whose "match" substring appears in the printer
+# or driver name wins. Generic profiles sit last so model-specific ones take precedence.
+BUILTIN_PROFILES = [
+    {
+        "name": "epson-tm-80",
+        "match": ["tm-t20", "tm-t82", "tm-m30"],
+        "paper_mm": 80,
+        "dots": 576,
+        "dpi": 203,
+        "columns": {"A": 48, "B": 64},
+        "raster_modes": ["gs_v0", "esc_star"],
+        "compression": [],
+        "code_pages": ["cp437", "cp850", "cp858", "cp1252"],
+        "code_page": "cp437",
+        "max_band_rows": 128,
+        "chunk_bytes": 16384,
+        "max_bps": None,
+    },
+    {
+        "name": "epson-tm-t88",
+        "match": ["tm-t88"],
+        "paper_mm": 80,
+        "dots": 512,
+        "dpi": 180,
+        "columns": {"A": 42, "B": 56},
+        "raster_modes": ["gs_v0", "esc_star"],
+        "compression": [],
+        "code_pages": ["cp437", "cp850", "cp858", "cp1252"],
+        "code_page": "cp437",
+        "max_band_rows": 128,
+        "chunk_bytes": 16384,
+        "max_bps": None,
+    },
+    {
+        "name": "generic-58",
+        "match": ["58mm", "58 mm", "pos-58", "pos58", "xp-58", "zj-58"],
+        "paper_mm": 58,
+        "dots": 384,
+        "dpi": 203,
+        "columns": {"A": 32, "B": 42},
+        "raster_modes": ["gs_v0"],
+        "compression": [],
+        "code_pages": ["cp437"],
+        "code_page": "cp437",
+        "max_band_rows": 1,
+        "chunk_bytes": 4096,
+        "max_bps": None,
+    },
+    {
+        # The kiosks' "80mm Series Printer" clones. 42 columns leaves a margin on the
+        # 512-dot variants, and one raster row per command is what they were tested with.
+        "name": "generic-80",
+        "match": ["80mm", "80 mm", "pos-80", "pos80", "xp-80", "series", "pos", "thermal"],
+        "paper_mm": 80,
+        "dots": 576,
+        "dpi": 203,
+        "columns": {"A": 42, "B": 56},
+        "raster_modes": ["gs_v0"],
+        "compression": [],
+        "code_pages": ["cp437"],
+        "code_page": "cp437",
+        "max_band_rows": 1,
+        "chunk_bytes": 4096,
+        "max_bps": None,
+    },
+]
+
+DEFAULT_PROFILE = "generic-80"
+
+_REQUIRED_KEYS = ("name", "paper_mm", "dots", "dpi", "columns", "raster_modes", "code_page", "max_band_rows")
+
+_profiles = None
+
+
+def _load_custom():
+    """Profiles from printer_profiles.json, or [] if there is none or it is invalid"""
+    if not os.path.exists(PROFILES_FILE):
+        return []
+    try:
+        with open(PROFILES_FILE, "r", encoding="utf-8") as f:
+            custom = json.load(f)
+        for profile in custom:
+            missing = [k for k in _REQUIRED_KEYS if k not in profile]
+            if missing:
+                raise ValueError(f"profile {profile.get('name', '?')} is missing {', '.join(missing)}")
+            if profile["code_page"] not in CODE_PAGES:
+                raise ValueError(f"profile {profile['name']} uses unknown code page {profile['code_page']}")
+        log(f"Loaded {len(custom)} printer profile(s) from {PROFILES_FILE}")
+        return custom
+    except Exception as e:
+        log(f"[WARNING] Ignoring {PROFILES_FILE}: {e}")
+        return []
+
+
+def all_profiles():
+    """Custom profiles first, then the built-ins"""
+    global _profiles
+    if _profiles is None:
+        _profiles = _load_custom() + BUILTIN_PROFILES
+    return _profiles
+
+
+def reload_profiles():
+    """Re-read printer_profiles.json"""
+    global _profiles
+    _profiles = None
+    return all_profiles()
+
+
+def get_profile(name):
+    for profile in all_profiles():
+        if profile["name"] == name:
+            return profile
+    raise KeyError(f"Unknown printer profile: {name}")
+
+
+def match_profile(printer_name, driver_name=None):
+    """Profile whose match strings appear in the printer or driver name, or None"""
+    haystack = " ".join(n for n in (printer_name, driver_name) if n).lower()
+    if not haystack:
+        return None
+    for profile in all_profiles():
+        if any(m.lower() in haystack for m in profile.get("match", [])):
+            return profile
+    return None
+
+
+def profile_for(printer_name, driver_name=None):
+    """Matched profile, or the default 80mm profile the kiosk has always assumed"""
+    profile = match_profile(printer_name, driver_name)
+    if profile is None:
+        profile = get_profile(DEFAULT_PROFILE)
+        log(f"[WARNING] No printer profile matches '{printer_name}' (driver {driver_name}) - using {DEFAULT_PROFILE}")
+    return profile
+
+
+def select_code_page(profile):
+    """ESC t n for the profile's code page - send it after ESC @, which resets it"""
+    return chr(27) + 't' + chr(CODE_PAGES[profile["code_page"]])
+
+
+def encode_text(profile, text):
+    """Encode receipt text in the printer's code page - unknown characters print as '?'"""
+    return text.encode(profile["code_page"], errors="replace")
+
+
+def public_view(profile):
+    """The parts of a profile the page needs to lay out a receipt"""
+    return {"name": profile["name"], "paper_mm": profile["paper_mm"], "dots": profile["dots"],
+            "dpi": profile["dpi"], "columns": dict(profile["columns"])}
@@ -0,0 +1,211 @@
+"""
+Printer Router - spreads jobs over a group of printers and holds them when none is up
+The group is the printer chosen at startup plus any listed in printer_group.json:
+
+  {"printers": ["EPSON TM-T82 Counter", "EPSON TM-T82 Back"], "strategy": "least-busy"}
+
+"least-busy" sends each job to the healthy printer with the fewest jobs in flight;
+"failover" always uses the first healthy printer in group order. A printer that fails
+a job is backed off (1s, 2s, 4s... up to a minute) and the job moves to the next one.
+When no printer can take a job, it waits in the hold queue and prints by itself as
+soon as one comes back.
+"""
+
+import os
+import json
+import threading
+import time
+from collections import deque
+
+from kiosk_log import EXE_DIR, log
+
+GROUP_FILE = os.path.join(EXE_DIR, "printer_group.json")
+STATUS_MAX_AGE = 5        # seconds a probed status is trusted
+BACKOFF_MAX = 60          # seconds a failing printer is skipped, at most
+HOLD_LIMIT = 200          # held jobs kept in memory - the journal has them too
+HOLD_RETRY = 5            # seconds between hold queue flush attempts while nothing is up
+
+
+def load_printer_group(selected_printer, path=GROUP_FILE):
+    """(printers, strategy) - the selected printer first, then the group file's printers"""
+    printers, strategy = [selected_printer] if selected_printer else [], "failover"
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                config = json.load(f)
+            printers += [p for p in config.get("printers", []) if p not in printers]
+            strategy = config.get("strategy", "least-busy")
+            if strategy not in ("least-busy", "failover"):
+                raise ValueError(f"unknown strategy {strategy}")
+            log(f"Printer group: {', '.join(printers)} ({strategy})")
+        except Exception as e:
+            log(f"[WARNING] Ignoring {path}: {e}")
+    return printers, strategy
+
+
+class _Health:
+    def __init__(self):
+        self.status = None          # last status dict
+        self.checked = 0            # when status was last probed
+        self.in_flight = 0
+        self.failures = 0           # consecutive
+        self.backoff_until = 0
+        self.jobs = 0
+        self.last_error = None
+
+
+class PrinterRouter:
+    """Picks a printer for each job from live status, in-flight counts and recent failures"""
+
+    def __init__(self, printers, probe, strategy="least-busy", on_available=None):
+        self.printers = list(printers)
+        self.strategy = strategy
+        self._probe = probe                 # probe(name) -> status dict (see print_pacing.spooler_status)
+        self.on_available = on_available    # called when a printer becomes usable again
+        self._lock = threading.Lock()
+        self._health = {name: _Health() for name in self.printers}
+
+    def acquire(self, exclude=()):
+        """Name of the printer to use, counted as busy until release(), or None if none is up"""
+        now = time.time()
+        for name in self.printers:
+            health = self._health[name]
+            if name not in exclude and now - health.checked > STATUS_MAX_AGE and now >= health.backoff_until:
+                self._refresh(name)
+        with self._lock:
+            usable = [(i, name) for i, name in enumerate(self.printers)
+                      if name not in exclude and self._usable(self._health[name], now)]
+            if not usable:
+                return None
+            if self.strategy == "least-busy":
+                _, name = min(usable, key=lambda u: (self._health[u[1]].in_flight, u[0]))
+            else:
+                name = usable[0][1]
+            self._health[name].in_flight += 1
+            return name
+
+    def release(self, name, ok, error=None):
+        """Job finished on this printer - ok None means it was never sent (the render failed)"""
+        came_back = False
+        with self._lock:
+            health = self._health.get(name)
+            if health is None:
+                return
+            health.in_flight = max(0, health.in_flight - 1)
+            if ok is None:
+                return
+            if ok:
+                came_back = health.failures > 0
+                health.failures = 0
+                health.backoff_until = 0
+                health.jobs += 1
+            else:
+                health.failures += 1
+                health.last_error = str(error) if error else None
+                delay = min(BACKOFF_MAX, 2 ** (health.failures - 1))
+                health.backoff_until = time.time() + delay
+                log(f"[WARNING] {name} failed a job ({error}) - skipping it for {delay}s")
+        if came_back and self.on_available:
+            self.on_available(name)
+
+    def report_status(self, name, status):
+        """Status seen elsewhere (pacer, self-check) - saves a probe, and wakes the hold queue"""
+        with self._lock:
+            health = self._health.get(name)
+            if health is None:
+                return
+            was_online = health.status is not None and health.status["online"]
+            health.status = status
+            health.checked = time.time()
+            if status["online"] and not was_online:
+                health.backoff_until = 0
+        if status["online"] and not was_online and self.on_available:
+            self.on_available(name)
+
+    def adopt(self, old):
+        """Carry health, backoff and in-flight counts over from the router this one replaces"""
+        with old._lock, self._lock:
+            for name in self.printers:
+                if name in old._health:
+                    self._health[name] = old._health[name]
+
+    def available(self, exclude=()):
+        now = time.time()
+        with self._lock:
+            return any(self._usable(self._health[name], now) for name in self.printers if name not in exclude)
+
+    def status(self):
+        with self._lock:
+            now = time.time()
+            return {name: {"online": h.status["online"] if h.status else None, "in_flight": h.in_flight,
+                           "jobs": h.jobs, "failures": h.failures, "last_error": h.last_error,
+                           "backoff_s": max(0, round(h.backoff_until - now, 1))}
+                    for name, h in self._health.items()}
+
+    def _usable(self, health, now):
+        return now >= health.backoff_until and (health.status is None or health.status["online"])
+
+    def _refresh(self, name):
+        try:
+            status = self._probe(name)
+        except Exception as e:
+            status = {"online": False, "paper_out": False, "paper_low": False, "cover_open": False, "error": str(e)}
+        self.report_status(name, status)
+
+
+class HoldQueue:
+    """Jobs no printer could take. A background thread prints them, oldest first, once one is back."""
+
+    def __init__(self, router, deliver):
+        self.router = router
+        self._deliver = deliver     # deliver(item, printer_name) - raises if the printer failed
+        self._items = deque()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __len__(self):
+        return len(self._items)
+
+    def hold(self, item):
+        """Queue a job - returns False if the queue is full. item["exclude"] names printers it must not go to."""
+        with self._lock:
+            if len(self._items) >= HOLD_LIMIT:
+                return False
+            self._items.append(item)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="HoldQueue", daemon=True)
+                self._thread.start()
+        log(f"[WARNING] No printer available - job held ({len(self._items)} waiting)")
+        return True
+
+    def wake(self, *args):
+        self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self._wake.wait(HOLD_RETRY)
+            self._wake.clear()
+            while self._items and not self._stop.is_set():
+                # Oldest first - but a job laid out for a printer model that is down doesn't block the rest
+                for item in list(self._items):
+                    name = self.router.acquire(exclude=item.get("exclude", ()))
+                    if name is not None:
+                        break
+                else:
+                    break
+                try:
+                    self._deliver(item, name)
+                except Exception as e:
+                    self.router.release(name, False, e)
+                    continue  # Try the next printer, or wait for one
+                self.router.release(name, True)
+                with self._lock:
+                    self._items.remove(item)
+                if not self._items:
+                    log("✅ Hold queue empty - all held jobs printed")
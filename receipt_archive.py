@@ -0,0 +1,277 @@
+"""
+Receipt Archive - compressed store of every ESC/POS payload sent to the printer
+Payloads are zstd (or zlib) compressed into segment files and indexed by order number
+and timestamp, so staff can reprint a lost slip without re-rendering it.
+"""
+
+import os
+import json
+import queue
+import struct
+import threading
+import time
+import zlib
+from bisect import bisect_left, bisect_right
+
+from kiosk_log import log
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None  # Fall back to zlib
+
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+
+# codec, meta length, timestamp, raw length, compressed length, crc32 of compressed bytes
+_RECORD = struct.Struct('<BHdIII')
+
+
+def _segment_name(number):
+    return f"archive-{number:06d}.seg"
+
+
+class ReceiptArchive:
+    """Append-only compressed receipt store with size-based retention.
+
+    Writes happen on a background thread so archiving never delays the print
+    call. The index lives in memory and is rebuilt from segment headers on start.
+    """
+
+    def __init__(self, folder, max_bytes=256 * 1024 * 1024, segment_bytes=16 * 1024 * 1024, level=None):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.segment_bytes = segment_bytes
+        os.makedirs(folder, exist_ok=True)
+
+        if zstandard:
+            self.codec = CODEC_ZSTD
+            self._zstd_level = level or 10
+            self._zstd = zstandard.ZstdCompressor(level=self._zstd_level)  # Background writer thread only
+        else:
+            self.codec = CODEC_ZLIB
+            self._zlib_level = level or 6
+
+        self._lock = threading.Lock()
+        self._entries = []        # index entries sorted by timestamp
+        self._times = []          # timestamps, parallel to _entries (for bisect)
+        self._by_order = {}       # order number -> list of entries, oldest first
+        self._segment_sizes = {}  # segment number -> bytes on disk
+        self._file = None
+        self._segment = 0
+
+        self._load_index()
+        self._open_segment(max(self._segment_sizes, default=0) + 1)
+
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._write_loop, name="ReceiptArchive", daemon=True)
+        self._worker.start()
+        codec_name = "zstd" if self.codec == CODEC_ZSTD else "zlib"
+        log(f"Receipt archive ready: {folder} ({len(self._entries)} receipts, {codec_name})")
+
+    # ---------- Public ----------
+
+    def store(self, payload, order_number=None, doc_name=None, printer_name=None):
+        """Queue a payload for archiving - returns immediately, compression happens in the background"""
+        self._queue.put((time.time(), payload, None, order_number, doc_name, printer_name))
+
+    def stream(self, order_number=None, doc_name=None, printer_name=None):
+        """Writer for a payload that is produced in chunks - compresses as it goes"""
+        return _ArchiveWriter(self, order_number, doc_name, printer_name)
+
+    def flush(self):
+        """Wait until every queued payload is on disk"""
+        self._queue.join()
+
+    def find(self, order_number=None, since=None, until=None):
+        """Index entries matching an order number and/or time range, newest first"""
+        self.flush()
+        with self._lock:
+            if order_number is not None:
+                entries = list(self._by_order.get(str(order_number), []))
+                if since is not None:
+                    entries = [e for e in entries if e["ts"] >= since]
+                if until is not None:
+                    entries = [e for e in entries if e["ts"] <= until]
+            else:
+                lo = bisect_left(self._times, since) if since is not None else 0
+                hi = bisect_right(self._times, until) if until is not None else len(self._times)
+                entries = self._entries[lo:hi]
+        return [dict(e) for e in reversed(entries)]
+
+    def load(self, entry):
+        """Read and decompress the payload for an index entry"""
+        path = os.path.join(self.folder, _segment_name(entry["segment"]))
+        with open(path, 'rb') as f:
+            f.seek(entry["offset"])
+            data = f.read(entry["length"])
+        if len(data) != entry["length"] or zlib.crc32(data) != entry["crc"]:
+            raise Exception(f"Archived receipt is corrupt ({path} @ {entry['offset']})")
+        if entry["codec"] == CODEC_ZSTD:
+            if not zstandard:
+                raise Exception("Receipt was archived with zstd but zstandard is not installed")
+            return zstandard.ZstdDecompressor().decompress(data, max_output_size=entry["raw_length"])
+        return zlib.decompress(data)
+
+    def latest(self, order_number):
+        """(entry, payload) of the most recent receipt for an order number, or (None, None)"""
+        entries = self.find(order_number=order_number)
+        if not entries:
+            return None, None
+        return entries[0], self.load(entries[0])
+
+    def close(self):
+        self._queue.put(None)
+        self._worker.join(timeout=5)
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+    # ---------- Internals ----------
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._write(*item)
+            except Exception as e:
+                log(f"[WARNING] Receipt archive write failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _compress(self, payload):
+        if self.codec == CODEC_ZSTD:
+            return self._zstd.compress(payload)
+        return zlib.compress(payload, self._zlib_level)
+
+    def _compressor(self):
+        # A compressor's streams share its context - each streamed receipt gets its own, prints run concurrently
+        if self.codec == CODEC_ZSTD:
+            return zstandard.ZstdCompressor(level=self._zstd_level).compressobj()
+        return zlib.compressobj(self._zlib_level)
+
+    def _write(self, ts, payload, raw_length, order_number, doc_name, printer_name):
+        # raw_length is None for raw payloads from store(), set for pre-compressed streams
+        if raw_length is None:
+            compressed, raw_length = self._compress(payload), len(payload)
+        else:
+            compressed = payload
+        meta = json.dumps({"order": None if order_number is None else str(order_number),
+                           "doc": doc_name, "printer": printer_name}).encode('utf-8')
+        crc = zlib.crc32(compressed)
+        header = _RECORD.pack(self.codec, len(meta), ts, raw_length, len(compressed), crc)
+
+        with self._lock:
+            if self._file is None:
+                return
+            offset = self._file.tell() + len(header) + len(meta)
+            self._file.write(header + meta)
+            self._file.write(compressed)
+            self._file.flush()
+            self._segment_sizes[self._segment] = self._file.tell()
+            self._add_entry({"ts": ts, "order": None if order_number is None else str(order_number),
+                             "doc": doc_name, "printer": printer_name, "segment": self._segment,
+                             "offset": offset, "length": len(compressed), "raw_length": raw_length,
+                             "codec": self.codec, "crc": crc})
+            if self._segment_sizes[self._segment] >= self.segment_bytes:
+                self._open_segment(self._segment + 1)
+            self._enforce_retention()
+
+    def _add_entry(self, entry):
+        # Caller holds self._lock. Entries arrive in time order except across clock changes.
+        pos = bisect_right(self._times, entry["ts"])
+        self._times.insert(pos, entry["ts"])
+        self._entries.insert(pos, entry)
+        if entry["order"] is not None:
+            self._by_order.setdefault(entry["order"], []).append(entry)
+
+    def _open_segment(self, number):
+        if self._file:
+            self._file.close()
+        self._segment = number
+        self._file = open(os.path.join(self.folder, _segment_name(number)), 'ab')
+        self._segment_sizes[number] = self._file.tell()
+
+    def _enforce_retention(self):
+        # Caller holds self._lock - drop the oldest segments until we're under budget
+        while sum(self._segment_sizes.values()) > self.max_bytes and len(self._segment_sizes) > 1:
+            oldest = min(self._segment_sizes)
+            if oldest == self._segment:
+                break
+            del self._segment_sizes[oldest]
+            try:
+                os.remove(os.path.join(self.folder, _segment_name(oldest)))
+            except OSError as e:
+                log(f"[WARNING] Could not remove archive segment {oldest}: {e}")
+            keep = [e for e in self._entries if e["segment"] != oldest]
+            self._entries = keep
+            self._times = [e["ts"] for e in keep]
+            for order, entries in list(self._by_order.items()):
+                entries = [e for e in entries if e["segment"] != oldest]
+                if entries:
+                    self._by_order[order] = entries
+                else:
+                    del self._by_order[order]
+            log(f"Receipt archive retention: removed segment {oldest}")
+
+    def _load_index(self):
+        """Rebuild the in-memory index by walking record headers (payloads are skipped)"""
+        numbers = []
+        for name in os.listdir(self.folder):
+            if name.startswith("archive-") and name.endswith(".seg"):
+                try:
+                    numbers.append(int(name[8:-4]))
+                except ValueError:
+                    pass
+
+        for number in sorted(numbers):
+            path = os.path.join(self.folder, _segment_name(number))
+            size = os.path.getsize(path)
+            offset = 0
+            with open(path, 'rb') as f:
+                while offset + _RECORD.size <= size:
+                    codec, meta_len, ts, raw_len, comp_len, crc = _RECORD.unpack(f.read(_RECORD.size))
+                    data_offset = offset + _RECORD.size + meta_len
+                    if data_offset + comp_len > size:
+                        break
+                    try:
+                        meta = json.loads(f.read(meta_len).decode('utf-8'))
+                    except ValueError:
+                        break
+                    self._add_entry({"ts": ts, "order": meta.get("order"), "doc": meta.get("doc"),
+                                     "printer": meta.get("printer"), "segment": number,
+                                     "offset": data_offset, "length": comp_len, "raw_length": raw_len,
+                                     "codec": codec, "crc": crc})
+                    offset = data_offset + comp_len
+                    f.seek(offset)
+            if offset == 0:
+                os.remove(path)  # Empty segment from a run that printed nothing
+                continue
+            if offset < size:
+                log(f"[WARNING] Archive segment {number} has a torn tail at {offset}/{size} bytes, truncating")
+                with open(path, 'r+b') as f:
+                    f.truncate(offset)
+            self._segment_sizes[number] = offset
+
+
+class _ArchiveWriter:
+    """Incrementally compressed archive record - nothing is stored unless commit() is called"""
+
+    def __init__(self, archive, order_number, doc_name, printer_name):
+        self._archive = archive
+        self._meta = (order_number, doc_name, printer_name)
+        self._compressor = archive._compressor()
+        self._parts = []
+        self._raw_length = 0
+        self._ts = time.time()
+
+    def write(self, chunk):
+        self._raw_length += len(chunk)
+        self._parts.append(self._compressor.compress(chunk))
+
+    def commit(self):
+        self._parts.append(self._compressor.flush())
+        self._archive._queue.put((self._ts, b''.join(self._parts), self._raw_length) + self._meta)
@@ -0,0 +1,10 @@
+#!/bin/sh
+# Linux kiosk launcher - run it as the session command of a kiosk compositor, e.g.
+#   cage -- /opt/kiosk/run_kiosk.sh --printer TM-T82
+# Printers: a raw CUPS queue (lpadmin -p TM-T82 -v usb://... -m raw -E) or a /dev/usb/lp* device.
+# The kiosk user needs the 'lp' group for /dev/usb/lp* and the 'input' group for the staff hotkeys.
+# kiosk_supervisor.py restarts the kiosk if it crashes or hangs.
+# To EXIT: press the Q key 5 times quickly.
+
+cd "$(dirname "$0")"
+exec python3 kiosk_supervisor.py "$@"
@@ -0,0 +1,320 @@
+"""
+Runtime Config - switch printer, printer profile and tunables while the kiosk runs
+kiosk_config.json next to the exe is watched, along with printer_profiles.json and
+printer_group.json. Staff can also change it from a page through the PIN-protected
+PrinterAPI.set_kiosk_config. Either way only the parts that changed are rebuilt:
+
+  printer / printer_group.json  -> selected printer, its profile, the printer group
+                                   (held jobs and printer health carry over)
+  profile / printer_profiles.json -> profile of the selected printer, its write pacing
+  tunables                      -> set in place
+
+    {"printer": "EPSON TM-T82 Back", "profile": "epson-tm-t82",
+     "tunables": {"max_copies": 3, "status_wait": 60}}
+
+"profile" forces a profile instead of matching one from the printer name; leave it out
+to match. At startup --printer and --select still win over the file.
+
+    python runtime_config.py --show
+    python runtime_config.py --set-pin 4821
+    python runtime_config.py --printer "EPSON TM-T82 Back" --set status_wait=60
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import sys
+import threading
+import time
+
+import print_pacing
+import printer_router
+from idle_scheduler import IDLE_GRACE
+from kiosk_log import EXE_DIR, log
+from print_coalescer import DEDUPE_WINDOW
+from printer_profiles import PROFILES_FILE, all_profiles
+
+CONFIG_FILE = os.path.join(EXE_DIR, "kiosk_config.json")
+WATCH_INTERVAL = 2        # seconds between checks of the watched files
+PIN_ATTEMPTS = 5          # wrong staff PINs before the API locks
+PIN_LOCKOUT = 60          # seconds it stays locked
+
+# name -> (type, lowest, highest, default, module attribute it sets - None when the kiosk applies it)
+TUNABLES = {
+    "max_copies": (int, 1, 20, 5, None),                        # kiosk_app.MAX_COPIES
+    "dedupe_window": (float, 0, 60, DEDUPE_WINDOW, None),       # identical print requests share a result
+    "idle_grace": (float, 0, 600, IDLE_GRACE, None),            # screensaver seconds before maintenance
+    "status_max_age": (float, 0.5, 60, printer_router.STATUS_MAX_AGE, (printer_router, "STATUS_MAX_AGE")),
+    "backoff_max": (float, 1, 600, printer_router.BACKOFF_MAX, (printer_router, "BACKOFF_MAX")),
+    "hold_retry": (float, 1, 120, printer_router.HOLD_RETRY, (printer_router, "HOLD_RETRY")),
+    "status_every": (float, 0.1, 10, print_pacing.STATUS_EVERY, (print_pacing, "STATUS_EVERY")),
+    "stall_seconds": (float, 0.1, 10, print_pacing.STALL_SECONDS, (print_pacing, "STALL_SECONDS")),
+    "status_wait": (float, 1, 300, print_pacing.STATUS_WAIT, (print_pacing, "STATUS_WAIT")),
+}
+
+_WATCHED = {"config": CONFIG_FILE, "profiles": PROFILES_FILE, "group": printer_router.GROUP_FILE}
+
+
+def _hash_pin(pin):
+    return hashlib.sha256(f"kiosk-staff:{pin}".encode("utf-8")).hexdigest()
+
+
+def validate(config, printers=None):
+    """Normalised copy of a config dict - raises ValueError on anything the kiosk can't apply"""
+    if not isinstance(config, dict):
+        raise ValueError("config must be a JSON object")
+    unknown = set(config) - {"printer", "profile", "tunables", "staff_pin_sha256"}
+    if unknown:
+        raise ValueError(f"unknown setting(s): {', '.join(sorted(unknown))}")
+    result = {"printer": config.get("printer") or None, "profile": config.get("profile") or None, "tunables": {}}
+    if config.get("staff_pin_sha256"):
+        result["staff_pin_sha256"] = str(config["staff_pin_sha256"])
+
+    if result["printer"] is not None:
+        result["printer"] = str(result["printer"])
+        installed = None
+        if printers:
+            try:
+                installed = printers()
+            except Exception:
+                installed = None  # Can't list them - trust the name
+        if installed and result["printer"] not in installed:
+            raise ValueError(f"printer '{result['printer']}' is not installed")
+    if result["profile"] is not None and result["profile"] not in [p["name"] for p in all_profiles()]:
+        raise ValueError(f"unknown printer profile '{result['profile']}'")
+
+    for name, value in (config.get("tunables") or {}).items():
+        if name not in TUNABLES:
+            raise ValueError(f"unknown tunable '{name}'")
+        kind, lowest, highest = TUNABLES[name][:3]
+        try:
+            value = kind(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{name} must be a number")
+        if not lowest <= value <= highest:
+            raise ValueError(f"{name} must be between {lowest} and {highest}")
+        result["tunables"][name] = value
+    return result
+
+
+def diff(old, new):
+    """What apply() has to rebuild going from old to new config"""
+    changes = {}
+    if new["printer"] and new["printer"] != old["printer"]:
+        changes["printer"] = new["printer"]
+    if new["profile"] != old["profile"]:
+        changes["profile"] = new["profile"]
+    tunables = {}
+    for name, spec in TUNABLES.items():
+        before, after = old["tunables"].get(name, spec[3]), new["tunables"].get(name, spec[3])
+        if before != after:
+            tunables[name] = after
+    if tunables:
+        changes["tunables"] = tunables
+    return changes
+
+
+class RuntimeConfig:
+    """kiosk_config.json and the files it depends on, watched - changes go to apply(changes)"""
+
+    def __init__(self, apply, path=CONFIG_FILE, printers=None, interval=WATCH_INTERVAL):
+        self.apply = apply            # apply(changes) - keys: printer, profile, tunables, profiles_file, group_file
+        self.path = path
+        self.printers = printers      # printers() -> installed printer names, to check a switch
+        self.interval = interval
+        self.config = {"printer": None, "profile": None, "tunables": {}}
+        self._stamps = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._failed_pins = 0
+        self._locked_until = 0
+
+    # ---------- File ----------
+
+    def _stat_all(self):
+        stamps = {}
+        for key, path in _WATCHED.items():
+            path = self.path if key == "config" else path
+            try:
+                stat = os.stat(path)
+                stamps[key] = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                stamps[key] = None
+        return stamps
+
+    def _read(self):
+        """Validated config from the file, the defaults if there is none, None if it is invalid"""
+        if not os.path.exists(self.path):
+            return validate({})
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return validate(json.load(f), self.printers)
+        except Exception as e:
+            log(f"[WARNING] Ignoring {self.path}: {e}")
+            return None
+
+    def _save(self, config):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({k: v for k, v in config.items() if v not in (None, {})}, f, indent=2)
+        os.replace(tmp, self.path)
+
+    def load(self):
+        """Read the file at startup and set the module tunables in it - returns the config"""
+        self._stamps = self._stat_all()
+        config = self._read()
+        if config is not None:
+            self.config = config
+            self._set_module_tunables(config["tunables"])
+            if os.path.exists(self.path):
+                log(f"Runtime config loaded from {self.path}")
+        return self.config
+
+    # ---------- Watching ----------
+
+    def start(self):
+        threading.Thread(target=self._loop, name="RuntimeConfig", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            stamps = self._stat_all()
+            changed = {key for key in stamps if stamps[key] != self._stamps.get(key)}
+            self._stamps = stamps
+            if changed:
+                try:
+                    self.reload(changed)
+                except Exception as e:
+                    log(f"❌ Could not apply config change: {e}")
+
+    def reload(self, files=("config",)):
+        """Apply whatever changed in the watched files"""
+        config = self._read() if "config" in files else self.config
+        if config is None:
+            return None
+        changes = diff(self.config, config)
+        if "profiles" in files:
+            changes["profiles_file"] = True
+        if "group" in files:
+            changes["group_file"] = True
+        return self._apply(config, changes, "file")
+
+    def _apply(self, config, changes, source):
+        if not changes:
+            return {"changed": [], "seconds": 0}
+        started = time.perf_counter()
+        with self._lock:
+            previous = self.config
+            self.config = config
+            try:
+                self._set_module_tunables(changes.get("tunables", {}))
+                self.apply(changes)
+            except Exception:
+                self.config = previous
+                self._set_module_tunables(diff(config, previous).get("tunables", {}))
+                raise
+        seconds = round(time.perf_counter() - started, 3)
+        log(f"✅ Reconfigured from {source} in {seconds}s: {', '.join(sorted(changes))}")
+        return {"changed": sorted(changes), "seconds": seconds}
+
+    def _set_module_tunables(self, tunables):
+        for name, value in tunables.items():
+            target = TUNABLES[name][4]
+            if target is not None:
+                setattr(target[0], target[1], value)
+
+    # ---------- Staff API ----------
+
+    def check_pin(self, pin):
+        """Raises PermissionError unless pin is the staff PIN - locks for a minute after repeated misses"""
+        if time.time() < self._locked_until:
+            raise PermissionError("Too many wrong PINs - try again in a minute")
+        expected = self.config.get("staff_pin_sha256")
+        if not expected:
+            raise PermissionError("No staff PIN set - run python runtime_config.py --set-pin on the kiosk")
+        if not hmac.compare_digest(_hash_pin(pin), expected):
+            self._failed_pins += 1
+            if self._failed_pins >= PIN_ATTEMPTS:
+                self._failed_pins = 0
+                self._locked_until = time.time() + PIN_LOCKOUT
+                log(f"[WARNING] Staff config API locked for {PIN_LOCKOUT}s after {PIN_ATTEMPTS} wrong PINs")
+            raise PermissionError("Wrong PIN")
+        self._failed_pins = 0
+
+    def update(self, pin, changes):
+        """Staff change - checked, applied live and written to the file"""
+        self.check_pin(pin)
+        if not isinstance(changes, dict):
+            raise ValueError("changes must be an object")
+        merged = dict(self.config, tunables=dict(self.config["tunables"]))
+        for key, value in changes.items():
+            if key == "tunables":
+                merged["tunables"].update(value or {})
+            elif key == "staff_pin_sha256":
+                raise ValueError("the PIN can only be changed on the kiosk itself")
+            else:
+                merged[key] = value
+        config = validate(merged, self.printers)
+        result = self._apply(config, diff(self.config, config), "staff")
+        self._save(config)
+        self._stamps = self._stat_all()  # Our own write - nothing to reload
+        return result
+
+    def describe(self):
+        """Current settings and what they may be set to - no PIN hash"""
+        try:
+            printers = self.printers() if self.printers else []
+        except Exception:
+            printers = []
+        return {"config": {k: v for k, v in self.config.items() if k != "staff_pin_sha256"},
+                "printers": printers,
+                "profiles": [p["name"] for p in all_profiles()],
+                "tunables": {name: {"value": self.config["tunables"].get(name, spec[3]), "min": spec[1], "max": spec[2]}
+                             for name, spec in TUNABLES.items()}}
+
+
+def main():
+    """Edit kiosk_config.json from the command line - a running kiosk picks the change up"""
+    import argparse
+    parser = argparse.ArgumentParser(description="Change the kiosk's runtime config")
+    parser.add_argument("--show", action="store_true", help="print the config")
+    parser.add_argument("--set-pin", help="staff PIN for the config API")
+    parser.add_argument("--printer", help="printer to switch to")
+    parser.add_argument("--profile", help="printer profile to force ('' to match from the printer name)")
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=VALUE", help="tunable to change")
+    args = parser.parse_args()
+
+    runtime = RuntimeConfig(apply=lambda changes: None)
+    if os.path.exists(CONFIG_FILE):
+        with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+    else:
+        raw = {}
+    if args.set_pin:
+        raw["staff_pin_sha256"] = _hash_pin(args.set_pin)
+    if args.printer:
+        raw["printer"] = args.printer
+    if args.profile is not None:
+        raw["profile"] = args.profile or None
+    for item in args.set:
+        name, _, value = item.partition("=")
+        raw.setdefault("tunables", {})[name] = value
+    try:
+        config = validate(raw)
+    except ValueError as e:
+        print(f"Not saved: {e}")
+        return 1
+    if args.set_pin or args.printer or args.profile is not None or args.set:
+        runtime._save(config)
+        print(f"Saved {CONFIG_FILE}")
+    runtime.config = config
+    if args.show or not (args.set_pin or args.printer or args.profile is not None or args.set):
+        print(json.dumps(runtime.describe(), indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,731 @@
+"""
+Soak Test - runs many overlapping kiosk sessions against PrinterAPI, headless
+Each session thread behaves like a customer at the kiosk: it waits, then prints a
+data, text or image receipt (or a reprint), sometimes double-tapping or having the
+page retry the call, just as pywebview would run those calls on separate threads.
+Printing goes to fake printers behind a stand-in win32print, so it runs on Linux
+without a window or hardware.
+
+Every receipt carries a token (SOAK-0000123 in text, a bar stripe on images), so the
+fake printer can tell which receipts it really printed. The report shows call latency
+per method, throughput, lost receipts (reported printed, never seen), duplicates
+(seen more often than asked for) and memory growth of the process.
+
+Usage:
+  python soak_test.py --duration 2h --sessions 16
+  python soak_test.py --printer slow,bps=4800 --duration 30m
+  python soak_test.py --printer paper-out --state-dir ./soak-state
+  python soak_test.py --printer mixed --replay recorded_sessions.jsonl
+
+Printers: healthy, slow, paper-out, disconnect, mixed - any preset can be tuned with
+name=value pairs (bps, paper_out_every, paper_out_seconds, disconnect_rate,
+disconnect_seconds). Subclass FakePrinter for anything else and pass it to run_soak().
+
+A replay file has one call per line:
+  {"session": "a", "t": 12.5, "method": "print_receipt_data", "args": [{...}]}
+t is seconds since the session started; the soak token is added to each call.
+"""
+
+import os
+import re
+import sys
+import io
+import json
+import time
+import types
+import base64
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+import importlib
+from collections import defaultdict
+
+from log_query import percentile
+
+TOKEN_RE = re.compile(rb'SOAK-(\d{7})')
+RASTER_HEADER = b'\x1d\x76\x30'
+STRIPE_BITS = 32          # 4 sync bits, 24 token bits, 4 sync bits
+STRIPE_ROWS = 12
+SCAN_BYTES = 64 * 1024    # only the start of each job is kept - the token is always near the top
+DRAIN_SECONDS = 120       # after the run, how long held jobs get to print
+GROWTH_MIN_SECONDS = 600  # shorter runs don't report memory growth - warm-up dominates the slope
+
+# What a failed call may say when the fake printer is misbehaving - anything else is a kiosk bug
+EXPECTED_ERRORS = re.compile(r"OUT OF PAPER|cover is OPEN|OFFLINE|not connected|disconnected|"
+                             r"hold queue is full|No archived receipt")
+
+PRESETS = {
+    "healthy": {},
+    "slow": {"bps": 9600},                                        # 115200 baud serial, less framing
+    "paper-out": {"paper_out_every": 180, "paper_out_seconds": 20},
+    "disconnect": {"disconnect_rate": 0.01, "disconnect_seconds": 5},
+    "mixed": {"bps": 19200, "paper_out_every": 600, "paper_out_seconds": 15,
+              "disconnect_rate": 0.003, "disconnect_seconds": 5},
+}
+
+
+def parse_duration(text):
+    """'90s', '30m', '4h' or plain seconds"""
+    units = {"s": 1, "m": 60, "h": 3600}
+    text = str(text).strip().lower()
+    if text and text[-1] in units:
+        return float(text[:-1]) * units[text[-1]]
+    return float(text)
+
+
+# ---------- Fake printers ----------
+
+class _SpoolJob:
+    def __init__(self, doc):
+        self.doc = doc
+        self.head = bytearray()
+        self.bytes = 0
+        self.torn = False   # a write failed - the printer got part of the receipt
+
+
+class FakePrinter:
+    """Printer behind the fake spooler. Healthy unless the fault knobs are set.
+
+    bps - link speed; writes block like a full printer buffer would
+    paper_out_every / paper_out_seconds - runs out of paper periodically
+    disconnect_rate / disconnect_seconds - chance per write that the link drops, and for how long
+    """
+
+    driver = "EPSON TM-T88V Receipt"
+
+    def __init__(self, name="Soak Printer", bps=None, paper_out_every=None, paper_out_seconds=20,
+                 disconnect_rate=0.0, disconnect_seconds=5, seed=None):
+        self.name = name
+        self.bps = bps
+        self.paper_out_every = paper_out_every
+        self.paper_out_seconds = paper_out_seconds
+        self.disconnect_rate = disconnect_rate
+        self.disconnect_seconds = disconnect_seconds
+        self._random = random.Random(seed)
+        self._started = time.time()
+        self._offline_until = 0
+        self._lock = threading.Lock()
+        self.printed = defaultdict(int)     # token -> complete receipts printed
+        self.jobs = 0
+        self.torn_jobs = 0
+        self.bytes = 0
+        self.disconnects = 0
+
+    def paper_out(self):
+        if not self.paper_out_every:
+            return False
+        return (time.time() - self._started) % self.paper_out_every >= self.paper_out_every - self.paper_out_seconds
+
+    def online(self):
+        return time.time() >= self._offline_until
+
+    def status(self):
+        """Windows spooler Status flags"""
+        flags = 0
+        if not self.online():
+            flags |= 0x80           # PRINTER_STATUS_OFFLINE
+        if self.paper_out():
+            flags |= 0x10           # PRINTER_STATUS_PAPER_OUT
+        return flags
+
+    def open(self):
+        if not self.online():
+            raise OSError(f"{self.name} is not connected")
+
+    def write(self, job, data):
+        if not self.online():
+            raise OSError(f"{self.name} is not connected")
+        if self.disconnect_rate and self._random.random() < self.disconnect_rate:
+            with self._lock:
+                self.disconnects += 1
+            self._offline_until = time.time() + self.disconnect_seconds
+            raise OSError(f"{self.name} disconnected")
+        if self.bps:
+            time.sleep(len(data) / self.bps)
+        if len(job.head) < SCAN_BYTES:
+            job.head += data[:SCAN_BYTES - len(job.head)]
+        job.bytes += len(data)
+
+    def finish(self, job):
+        tokens = set() if job.torn else set(scan_tokens(bytes(job.head)))
+        with self._lock:
+            self.jobs += 1
+            self.bytes += job.bytes
+            if job.torn:
+                self.torn_jobs += 1
+            for token in tokens:
+                self.printed[token] += 1
+
+
+def make_printer(spec, name="Soak Printer"):
+    """FakePrinter from 'preset' or 'preset,name=value,...'"""
+    parts = spec.split(",")
+    if parts[0] not in PRESETS:
+        raise ValueError(f"Unknown printer preset '{parts[0]}' - choose from {', '.join(PRESETS)}")
+    options = dict(PRESETS[parts[0]])
+    for part in parts[1:]:
+        key, _, value = part.partition("=")
+        options[key.strip()] = float(value)
+    return FakePrinter(name, **options)
+
+
+class FakeSpooler(types.ModuleType):
+    """Just enough of win32print for PrinterAPI to print to FakePrinters"""
+
+    PRINTER_ENUM_LOCAL = 2
+    PRINTER_ENUM_CONNECTIONS = 4
+
+    def __init__(self, printers):
+        super().__init__("win32print")
+        self.printers = {p.name: p for p in printers}
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._next = 1
+
+    def _handle(self, printer):
+        with self._lock:
+            handle = self._next
+            self._next += 1
+            self._jobs[handle] = [printer, None]
+        return handle
+
+    def OpenPrinter(self, name):
+        printer = self.printers.get(name)
+        if printer is None:
+            raise OSError(f"Printer not found: {name}")
+        printer.open()
+        return self._handle(printer)
+
+    def ClosePrinter(self, handle):
+        with self._lock:
+            self._jobs.pop(handle, None)
+
+    def GetPrinter(self, handle, level=2):
+        printer = self._jobs[handle][0]
+        return {"pPrinterName": printer.name, "pDriverName": printer.driver, "Status": printer.status()}
+
+    def StartDocPrinter(self, handle, level, info):
+        self._jobs[handle][1] = _SpoolJob(info[0])
+        return handle
+
+    def StartPagePrinter(self, handle):
+        pass
+
+    def WritePrinter(self, handle, data):
+        printer, job = self._jobs[handle]
+        try:
+            printer.write(job, bytes(data))
+        except Exception:
+            job.torn = True
+            raise
+        return len(data)
+
+    def EndPagePrinter(self, handle):
+        pass
+
+    def EndDocPrinter(self, handle):
+        printer, job = self._jobs[handle]
+        if job is not None:
+            printer.finish(job)
+            self._jobs[handle][1] = None
+
+    def EnumPrinters(self, flags, name=None, level=1):
+        return [(0, f"{p.driver},{p.name}", p.name, "") for p in self.printers.values()]
+
+    def GetDefaultPrinter(self):
+        return next(iter(self.printers))
+
+
+# ---------- Receipt tokens ----------
+
+def stripe_bits(token):
+    return [1, 0, 1, 0] + [(token >> (23 - i)) & 1 for i in range(24)] + [0, 1, 1, 0]
+
+
+def stamp_token(image, token):
+    """Paint the token as a bar stripe across the top of a PIL image"""
+    from PIL import ImageDraw
+    draw = ImageDraw.Draw(image)
+    width = image.width
+    for i, bit in enumerate(stripe_bits(token)):
+        x0, x1 = i * width // STRIPE_BITS, (i + 1) * width // STRIPE_BITS - 1
+        draw.rectangle((x0, 0, x1, STRIPE_ROWS - 1), fill=0 if bit else 255)
+    return image
+
+
+def _raster_token(data, start):
+    width_bytes = data[start + 4] | (data[start + 5] << 8)
+    row_start = start + 8 + 2 * width_bytes     # third row - clear of any resize blur at the edge
+    row = data[row_start:row_start + width_bytes]
+    if len(row) < width_bytes or not width_bytes:
+        return None
+    width = width_bytes * 8
+    bits = []
+    for i in range(STRIPE_BITS):
+        x = (2 * i + 1) * width // (2 * STRIPE_BITS)
+        bits.append((row[x // 8] >> (7 - x % 8)) & 1)
+    if bits[:4] != [1, 0, 1, 0] or bits[-4:] != [0, 1, 1, 0]:
+        return None
+    token = 0
+    for bit in bits[4:28]:
+        token = (token << 1) | bit
+    return token
+
+
+def scan_tokens(data):
+    """Soak tokens in a job: text tokens, or the stripe on a raster image"""
+    tokens = [int(m.group(1)) for m in TOKEN_RE.finditer(data)]
+    start = data.find(RASTER_HEADER)
+    if start != -1 and len(data) > start + 8:
+        token = _raster_token(data, start)
+        if token is not None:
+            tokens.append(token)
+    return tokens
+
+
+# ---------- Sessions ----------
+
+class Ledger:
+    """What the sessions asked for, what PrinterAPI answered and how long it took"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = defaultdict(list)    # method -> ms
+        self.calls = defaultdict(int)
+        self.failures = defaultdict(int)
+        self.expected = defaultdict(int)    # token -> prints the customer should get
+        self.reported = set()               # tokens with at least one successful call
+        self.held = set()                   # tokens the kiosk held for later instead of printing now
+        self.unexpected = defaultdict(int)  # message -> count, for calls that raised or failed oddly
+        self.attempted = set()
+        self.errors = defaultdict(int)      # message -> count
+        self.orders = []                    # archived order numbers, for reprints
+
+    def record(self, method, token, ms, result, counts=True):
+        ok = bool(result and result.get("success"))
+        with self._lock:
+            self.latency[method].append(ms)
+            self.calls[method] += 1
+            if token is not None:
+                self.attempted.add(token)
+            if not ok:
+                message = (result or {}).get("message", "no result")
+                self.failures[method] += 1
+                self.errors[message[:80]] += 1
+                if message.startswith("raised ") or not EXPECTED_ERRORS.search(message):
+                    self.unexpected[message[:80]] += 1
+                return
+            if token is None:
+                return
+            if counts and token not in self.reported:
+                self.expected[token] += 1
+            self.reported.add(token)
+            if result.get("held"):
+                self.held.add(token)
+
+    def reprinted(self, token):
+        with self._lock:
+            self.expected[token] += 1
+
+
+class SessionRunner:
+    """Synthetic customers (or a replay file) calling PrinterAPI from many threads"""
+
+    METHODS = (("print_receipt_data", 0.5), ("print_receipt", 0.15), ("print_receipt_image", 0.25), ("reprint", 0.1))
+
+    def __init__(self, api, ledger, profile, think=3.0, retry_rate=0.05, double_tap_rate=0.05, seed=None):
+        self.api = api
+        self.ledger = ledger
+        self.profile = profile
+        self.think = think
+        self.retry_rate = retry_rate
+        self.double_tap_rate = double_tap_rate
+        self._random = random.Random(seed)
+        self._token = 0
+        self._token_lock = threading.Lock()
+        self._calls = []
+        self._calls_lock = threading.Lock()
+        self._images = None
+
+    def next_token(self):
+        with self._token_lock:
+            self._token += 1
+            return self._token
+
+    # ----- call building -----
+
+    def _image_b64(self, token, source=None):
+        from PIL import Image, ImageDraw
+        if source is not None:
+            image = Image.open(io.BytesIO(base64.b64decode(source.split(",")[-1]))).convert("L")
+        else:
+            if self._images is None:
+                self._images = []
+                for height in (600, 1200, 2400):
+                    img = Image.new("L", (self.profile["dots"], height), 255)
+                    draw = ImageDraw.Draw(img)
+                    for y in range(40, height - 40, 32):
+                        draw.text((20, y), f"SCRATCHCARD PRIZE {y:05d}   Rp {y * 1000:,}", fill=0)
+                    self._images.append(img)
+            image = self._random.choice(self._images).copy()
+        stamp_token(image, token)
+        out = io.BytesIO()
+        image.save(out, "PNG")
+        return "data:image/png;base64," + base64.b64encode(out.getvalue()).decode("ascii")
+
+    def build_call(self, method, token, args=None):
+        """(callable, kwargs-free args) for one logical receipt"""
+        order = f"SOAK-{token:07d}"
+        if method == "print_receipt_data":
+            data = dict(args[0]) if args else {
+                "locationName": "Soak Test", "totalPayment": "150.000", "totalTizo": "300",
+                "items": [{"label": f"Card {i}", "cost": "50.000", "tizo": "100"}
+                          for i in range(self._random.randint(1, 5))]}
+            data["orderNumber"] = order
+            return (data,), {"idempotency_key": None}
+        if method == "print_receipt":
+            text = args[0] if args else "\n".join(f"Line {i}" for i in range(self._random.randint(5, 30)))
+            return (f"{order}\n{text}",), {}
+        if method == "print_receipt_image":
+            return (self._image_b64(token, args[0] if args else None), order), {}
+        if method == "print_receipt_html":
+            html = args[0] if args else "<p>Soak</p>"
+            return (f"<p>{order}</p>{html}",), {}
+        raise ValueError(f"Unsupported method {method}")
+
+    # ----- calls -----
+
+    def _call(self, method, token, args, kwargs, counts=True):
+        started = time.perf_counter()
+        try:
+            result = getattr(self.api, method)(*args, **kwargs)
+        except Exception as e:
+            result = {"success": False, "message": f"raised {type(e).__name__}: {e}"}
+        self.ledger.record(method, token, (time.perf_counter() - started) * 1000, result, counts)
+        return result
+
+    def _spawn(self, target, *args, delay=0.0):
+        def run():
+            if delay:
+                time.sleep(delay)
+            target(*args)
+        thread = threading.Thread(target=run, daemon=True)   # pywebview runs each JS call on a new thread
+        with self._calls_lock:
+            self._calls = [t for t in self._calls if t.is_alive()]
+            self._calls.append(thread)
+        thread.start()
+        return thread
+
+    def receipt(self, method, args=None):
+        token = self.next_token()
+        call_args, kwargs = self.build_call(method, token, args)
+        if "idempotency_key" in kwargs:
+            kwargs["idempotency_key"] = f"soak-{token}"
+        answer = {}
+
+        def first():
+            answer["result"] = self._call(method, token, call_args, kwargs)
+
+        def retry():
+            # The page gave up waiting (or saw an error) and calls again - it wouldn't after a success
+            if not (answer.get("result") or {}).get("success"):
+                self._call(method, token, call_args, kwargs)
+
+        self._spawn(first)
+        if self._random.random() < self.double_tap_rate:
+            # Second tap on the same button - same content, so the same key
+            self._spawn(self._call, method, token, call_args, kwargs, delay=self._random.uniform(0.05, 0.3))
+        if self._random.random() < self.retry_rate:
+            self._spawn(retry, delay=self._random.uniform(0.5, 8))
+        if method in ("print_receipt_data", "print_receipt_image"):
+            with self.ledger._lock:
+                self.ledger.orders.append(token)
+
+    def reprint(self):
+        with self.ledger._lock:
+            candidates = [t for t in self.ledger.orders[-200:] if t in self.ledger.reported]
+        if not candidates:
+            return
+        token = self._random.choice(candidates)
+
+        def run():
+            result = self._call("reprint", token, (f"SOAK-{token:07d}",), {}, counts=False)
+            if result and result.get("success"):
+                self.ledger.reprinted(token)
+        self._spawn(run)
+
+    def session(self, stop):
+        while not stop.is_set():
+            if stop.wait(self._random.expovariate(1 / self.think)):
+                return
+            method = self._random.choices([m for m, _ in self.METHODS], [w for _, w in self.METHODS])[0]
+            if method == "reprint":
+                self.reprint()
+            else:
+                self.receipt(method)
+
+    def replay(self, records, stop, loop=True):
+        """Replay recorded calls with their original spacing, one thread per recorded session"""
+        sessions = defaultdict(list)
+        for rec in records:
+            sessions[rec.get("session", "default")].append(rec)
+
+        def run_session(calls):
+            calls.sort(key=lambda r: r.get("t", 0))
+            while not stop.is_set():
+                started = time.time()
+                for rec in calls:
+                    if stop.wait(max(0, started + rec.get("t", 0) - time.time())):
+                        return
+                    if rec["method"] == "reprint":
+                        self.reprint()
+                    else:
+                        self.receipt(rec["method"], rec.get("args"))
+                if not loop:
+                    return
+        return [threading.Thread(target=run_session, args=(calls,), daemon=True) for calls in sessions.values()]
+
+    def wait_calls(self, timeout):
+        deadline = time.time() + timeout
+        with self._calls_lock:
+            calls = list(self._calls)
+        for thread in calls:
+            thread.join(max(0, deadline - time.time()))
+        return sum(1 for t in calls if t.is_alive())
+
+
+# ---------- Memory ----------
+
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 1024 / 1024
+    except ImportError:
+        return None
+
+
+def growth_mb_per_hour(samples, min_seconds=GROWTH_MIN_SECONDS):
+    """Least-squares slope of (seconds, MB) samples, skipping the first tenth as warm-up.
+
+    None for runs shorter than min_seconds - a few minutes of warm-up would extrapolate to hundreds of MB/h.
+    """
+    if not samples or samples[-1][0] < min_seconds:
+        return None
+    samples = [s for s in samples[len(samples) // 10:] if s[1] is not None]
+    if len(samples) < 3:
+        return None
+    n = len(samples)
+    mean_t = sum(t for t, _ in samples) / n
+    mean_m = sum(m for _, m in samples) / n
+    var = sum((t - mean_t) ** 2 for t, _ in samples)
+    if not var:
+        return None
+    return sum((t - mean_t) * (m - mean_m) for t, m in samples) / var * 3600
+
+
+# ---------- Harness ----------
+
+def load_kiosk_app(spooler):
+    """Import kiosk_app with the fake spooler - only PrinterAPI is driven, so no window or registry is needed"""
+    sys.modules["win32print"] = spooler
+    for name in ("webview", "winreg"):
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            sys.modules[name] = types.ModuleType(name)
+    return importlib.import_module("kiosk_app")
+
+
+def held_tokens(api):
+    """Tokens of the jobs sitting in the kiosk's hold queue right now"""
+    hold = api._hold
+    if hold is None:
+        return set()
+    with hold._lock:
+        items = list(hold._items)
+    return {token for item in items for token in scan_tokens(item["payload"])}
+
+
+def drain_held(api, timeout=DRAIN_SECONDS):
+    """Give held jobs up to timeout to print once the sessions stop - True if the hold queue emptied"""
+    deadline = time.time() + timeout
+    while api._hold is not None and len(api._hold) and time.time() < deadline:
+        api._hold.wake()
+        time.sleep(0.5)
+    return api._hold is None or not len(api._hold)
+
+
+def report(ledger, printer, api, elapsed, memory, out=None):
+    out = out or sys.__stdout__
+    still_held = held_tokens(api)
+    with ledger._lock:
+        expected = dict(ledger.expected)
+        attempted = set(ledger.attempted)
+        reported = set(ledger.reported)
+        held = set(ledger.held)
+        unexpected = dict(ledger.unexpected)
+        latency = {m: sorted(v) for m, v in ledger.latency.items()}
+        calls, failures, errors = dict(ledger.calls), dict(ledger.failures), dict(ledger.errors)
+    with printer._lock:
+        printed = dict(printer.printed)
+
+    # Still held isn't lost - the kiosk prints it when the printer is back. Not printed and not held is.
+    lost = sorted(t for t, n in expected.items() if printed.get(t, 0) < n and t not in still_held)
+    duplicated = sorted(t for t in printed if printed[t] > expected.get(t, 0) and t in reported)
+    unreported = sorted(t for t in printed if t in attempted and t not in reported)
+    rss = [m for _, m in memory if m is not None]
+    growth = growth_mb_per_hour(memory)
+
+    result = {
+        "elapsed_s": round(elapsed, 1),
+        "calls": calls, "failures": failures,
+        "latency_ms": {m: {"count": len(v), "p50": round(percentile(v, 50)), "p95": round(percentile(v, 95)),
+                           "p99": round(percentile(v, 99)), "max": round(v[-1])} for m, v in latency.items() if v},
+        "receipts_per_min": round(sum(printed.values()) / elapsed * 60, 1) if elapsed else None,
+        "printer": {"jobs": printer.jobs, "torn_jobs": printer.torn_jobs, "bytes": printer.bytes,
+                    "bytes_per_s": round(printer.bytes / elapsed) if elapsed else None,
+                    "disconnects": printer.disconnects},
+        "receipts": {"asked": len(attempted), "reported_printed": len(reported),
+                     "printed": sum(printed.values()), "lost": len(lost), "duplicated": len(duplicated),
+                     "printed_but_reported_failed": len(unreported), "held": len(held),
+                     "still_held": len(still_held), "lost_tokens": lost[:20], "duplicated_tokens": duplicated[:20],
+                     "still_held_tokens": sorted(still_held)[:20]},
+        "memory_mb": {"start": round(rss[0], 1) if rss else None, "peak": round(max(rss), 1) if rss else None,
+                      "end": round(rss[-1], 1) if rss else None,
+                      "growth_mb_per_h": round(growth, 2) if growth is not None else None},
+        "threads": threading.active_count(),
+        "coalescer": dict(api._coalescer.stats),
+        "pacer": api._pacer.stats(),
+        "top_errors": sorted(errors.items(), key=lambda e: -e[1])[:5],
+        "unexpected_errors": sum(unexpected.values()),
+        "top_unexpected_errors": sorted(unexpected.items(), key=lambda e: -e[1])[:5],
+    }
+
+    print(f"\n--- soak {result['elapsed_s']:.0f}s ---", file=out)
+    for method, lat in sorted(result["latency_ms"].items()):
+        print(f"{method:<22}{lat['count']:>7} calls  {failures.get(method, 0):>5} failed  "
+              f"p50 {lat['p50']:>6} ms  p95 {lat['p95']:>6} ms  p99 {lat['p99']:>6} ms  max {lat['max']:>6} ms", file=out)
+    r = result["receipts"]
+    print(f"receipts: {r['asked']} asked, {r['reported_printed']} reported printed, {r['printed']} printed "
+          f"({result['receipts_per_min']}/min), {printer.torn_jobs} torn", file=out)
+    print(f"LOST {r['lost']}  DUPLICATED {r['duplicated']}  printed-but-reported-failed "
+          f"{r['printed_but_reported_failed']}  held {r['held']} (still held {r['still_held']})  "
+          f"UNEXPECTED ERRORS {result['unexpected_errors']}", file=out)
+    for message, count in result["top_unexpected_errors"]:
+        print(f"  {count:>5} x {message}", file=out)
+    m = result["memory_mb"]
+    growth = (f"{m['growth_mb_per_h']} MB/h" if m["growth_mb_per_h"] is not None
+              else f"n/a (needs {GROWTH_MIN_SECONDS // 60} min)")
+    print(f"memory: {m['start']} -> {m['end']} MB (peak {m['peak']}), growth {growth}, "
+          f"{result['threads']} threads", file=out)
+    out.flush()
+    return result
+
+
+def run_soak(printer, duration, sessions=8, think=3.0, retry_rate=0.05, double_tap_rate=0.05,
+             replay=None, state_dir=None, report_every=300, json_path=None, seed=None, verbose=False):
+    # The kiosk logs every call - keep the console for the report
+    real_stdout = sys.stdout
+    if not verbose:
+        sys.stdout = open(os.devnull, "w", encoding="utf-8")
+    spooler = FakeSpooler([printer])
+    kiosk_app = load_kiosk_app(spooler)
+    from printer_profiles import profile_for
+    from print_journal import PrintJournal
+    from receipt_archive import ReceiptArchive
+
+    own_state = state_dir is None
+    state_dir = state_dir or tempfile.mkdtemp(prefix="kiosk-soak-")
+    api = kiosk_app.PrinterAPI()
+    api.selected_printer = printer.name
+    api._profile = profile_for(printer.name, printer.driver)
+    api._journal = PrintJournal(os.path.join(state_dir, "journal"))
+    api._archive = ReceiptArchive(os.path.join(state_dir, "receipts"))
+
+    ledger = Ledger()
+    runner = SessionRunner(api, ledger, api._profile, think, retry_rate, double_tap_rate, seed)
+    stop = threading.Event()
+    if replay:
+        threads = runner.replay(replay, stop)
+    else:
+        threads = [threading.Thread(target=runner.session, args=(stop,), daemon=True) for _ in range(sessions)]
+
+    memory = []
+    started = time.time()
+    last_report = started
+    result = None
+    print(f"Soak: {len(threads)} session(s) for {duration:.0f}s against {printer.name} "
+          f"(profile {api._profile['name']}), state in {state_dir}", file=sys.__stdout__)
+    try:
+        for thread in threads:
+            thread.start()
+        while time.time() - started < duration:
+            time.sleep(min(5, max(0.1, duration - (time.time() - started))))
+            memory.append((time.time() - started, rss_mb()))
+            if report_every and time.time() - last_report >= report_every:
+                last_report = time.time()
+                report(ledger, printer, api, time.time() - started, memory)
+    except KeyboardInterrupt:
+        print("Interrupted - finishing up", file=sys.__stdout__)
+    finally:
+        stop.set()
+        stuck = runner.wait_calls(120)
+        if not drain_held(api):
+            print(f"[WARNING] {len(api._hold)} job(s) still held {DRAIN_SECONDS}s after the run ended",
+                  file=sys.__stdout__)
+        memory.append((time.time() - started, rss_mb()))
+        api._journal.close()
+        api._archive.close()
+        if not verbose:
+            sys.stdout.close()
+            sys.stdout = real_stdout
+        if stuck:
+            print(f"[WARNING] {stuck} call(s) still running after the run ended", file=sys.__stdout__)
+        result = report(ledger, printer, api, time.time() - started, memory)
+        result["stuck_calls"] = stuck
+        if own_state:
+            shutil.rmtree(state_dir, ignore_errors=True)
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Soak-test PrinterAPI with concurrent sessions and fake printers")
+    parser.add_argument("--duration", default="10m", help="e.g. 90s, 30m, 4h")
+    parser.add_argument("--sessions", type=int, default=8, help="concurrent synthetic sessions")
+    parser.add_argument("--think", type=float, default=3.0, help="mean seconds between a session's calls")
+    parser.add_argument("--retry-rate", type=float, default=0.05, help="share of calls the page retries")
+    parser.add_argument("--double-tap-rate", type=float, default=0.05, help="share of calls tapped twice")
+    parser.add_argument("--printer", default="healthy", help=f"preset[,name=value...] - {', '.join(PRESETS)}")
+    parser.add_argument("--replay", help="JSON-lines file of recorded calls to replay instead of synthetic sessions")
+    parser.add_argument("--state-dir", help="keep the journal and archive here (default: temporary, deleted)")
+    parser.add_argument("--report-every", default="5m", help="interim report interval, 0 for none")
+    parser.add_argument("--json", help="write the final report to this file")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--verbose", action="store_true", help="show the kiosk's own log output")
+    args = parser.parse_args(argv)
+
+    replay = None
+    if args.replay:
+        with open(args.replay, "r", encoding="utf-8") as f:
+            replay = [json.loads(line) for line in f if line.strip()]
+    result = run_soak(make_printer(args.printer), parse_duration(args.duration), args.sessions, args.think,
+                      args.retry_rate, args.double_tap_rate, replay, args.state_dir,
+                      parse_duration(args.report_every), args.json, args.seed, args.verbose)
+    receipts = result["receipts"]
+    failed = (receipts["lost"] or receipts["duplicated"] or receipts["still_held"]
+              or result["unexpected_errors"] or result["stuck_calls"])
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""PrinterAPI print routing against soak_test's fake spooler - no window, registry or real printer"""
+
+import os
+import time
+
+import pytest
+
+import soak_test
+from print_journal import QUEUED, PrintJournal
+from printer_router import HoldQueue, PrinterRouter
+
+
+class RecordingPrinter(soak_test.FakePrinter):
+    """Keeps the start of every finished job"""
+
+    def __init__(self, name, driver):
+        super().__init__(name)
+        self.driver = driver
+        self.payloads = []
+
+    def finish(self, job):
+        self.payloads.append(bytes(job.head))
+        super().finish(job)
+
+
+FRONT = RecordingPrinter("Front", "EPSON TM-T88V Receipt")     # 80 mm, 42 columns
+BACK = RecordingPrinter("Back", "POS-58 Printer")              # 58 mm, 32 columns
+SPOOLER = soak_test.FakeSpooler([FRONT, BACK])
+kiosk_app = soak_test.load_kiosk_app(SPOOLER)
+
+
+@pytest.fixture
+def api(tmp_path):
+    from printer_profiles import profile_for
+    for printer in SPOOLER.printers.values():
+        printer._offline_until = 0
+        printer.disconnect_rate = 0.0
+    api = kiosk_app.PrinterAPI()
+    api.selected_printer = FRONT.name
+    api._profile = profile_for(FRONT.name, FRONT.driver)
+    api._journal = PrintJournal(str(tmp_path / "journal"))
+    yield api
+    if api._hold is not None:
+        api._hold.stop()
+    api._journal.close()
+
+
+def _group(api, *names):
+    """Route over these printers instead of printer_group.json"""
+    api._router = PrinterRouter(names, api._printer_status, strategy="failover")
+    api._hold = HoldQueue(api._router, api._deliver_held)
+    api._router.on_available = api._hold.wake
+
+
+def _image(api, token):
+    runner = soak_test.SessionRunner(api, soak_test.Ledger(), api._profile, 0, 0, 0, seed=1)
+    return runner._image_b64(token)
+
+
+def test_image_job_is_held_when_every_printer_is_down(api):
+    FRONT._offline_until = time.time() + 3600
+    jobs = FRONT.jobs
+
+    result = api.print_receipt_image(_image(api, 1), order_number="A1")
+
+    assert result["success"], result
+    assert result.get("held")
+    assert len(api._hold) == 1
+    held = api._hold._items[0]
+    assert isinstance(held["payload"], bytes) and soak_test.scan_tokens(held["payload"]) == [1]
+    assert api._journal._jobs[held["job"]]["state"] == QUEUED
+    assert FRONT.jobs == jobs
+
+
+def test_failure_with_no_printer_left_holds_without_backing_off(api):
+    FRONT.disconnect_rate = 1.0     # Drops the link on the first write
+
+    started = time.perf_counter()
+    result = api.print_receipt_image(_image(api, 2), order_number="A2")
+
+    assert result.get("held"), result
+    assert time.perf_counter() - started < 0.5
+
+
+def test_html_receipt_is_laid_out_for_the_printer_that_takes_it(api):
+    _group(api, "Front", "Back")
+    FRONT._offline_until = time.time() + 3600
+    printed = len(BACK.payloads)
+
+    result = api.print_receipt_html("<div>Prize</div><hr><div>Total</div>")
+
+    assert result["success"] and result["printer"] == "Back", result
+    receipt = BACK.payloads[printed]
+    assert b"\n" + b"-" * 32 + b"\n" in receipt
+    assert b"=" * 33 not in receipt
+
+
+def test_payload_laid_out_for_one_model_never_goes_to_another(api):
+    _group(api, "Front", "Back")
+    FRONT._offline_until = time.time() + 3600
+    printed = len(BACK.payloads)
+
+    result = api._print_routed("Kiosk Reprint", lambda _profile: b"\x1b@reprint\n", archive=False,
+                               laid_out_for="Front")
+
+    assert result.get("held"), result
+    assert api._hold._items[0]["exclude"] == ["Back"]
+    time.sleep(0.2)
+    assert len(BACK.payloads) == printed
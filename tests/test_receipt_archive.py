@@ -0,0 +1,40 @@
+"""Receipt archive round trips under concurrent prints"""
+
+import os
+import threading
+
+import pytest
+
+from receipt_archive import CODEC_ZSTD, ReceiptArchive
+
+zstandard = pytest.importorskip("zstandard")
+
+
+def test_concurrent_streamed_receipts_round_trip(tmp_path):
+    archive = ReceiptArchive(str(tmp_path / "receipts"))
+    assert archive.codec == CODEC_ZSTD
+    payloads = {f"T{i}": os.urandom(2048) + bytes(range(256)) * 64 for i in range(16)}
+    start = threading.Barrier(len(payloads) + 1)
+
+    def print_one(order, payload):
+        writer = archive.stream(order, "Kiosk Receipt Image", "Front")
+        start.wait()
+        for i in range(0, len(payload), 997):
+            writer.write(payload[i:i + 997])
+        writer.commit()
+
+    threads = [threading.Thread(target=print_one, args=item) for item in payloads.items()]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    for order, payload in payloads.items():
+        archive.store(payload[::-1], order + "-text")
+    for thread in threads:
+        thread.join()
+
+    try:
+        for order, payload in payloads.items():
+            assert archive.latest(order)[1] == payload
+            assert archive.latest(order + "-text")[1] == payload[::-1]
+    finally:
+        archive.close()
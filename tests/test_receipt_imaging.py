@@ -0,0 +1,105 @@
+"""Receipt imaging keeps peak memory flat - measured as process RSS, which includes Pillow's pixel buffers"""
+
+import base64
+import io
+import os
+import subprocess
+import sys
+
+import pytest
+from PIL import Image, ImageDraw
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCE_WIDTH = 1152     # html2canvas at scale 2 - an 80 mm receipt
+MB = 1024 * 1024
+
+# Runs in a fresh interpreter so the peak RSS belongs to one render. Prints how far the render
+# pushed peak RSS past what loading the data URL already took.
+_CHILD = r"""
+import sys
+sys.path.insert(0, sys.argv[1])
+from PIL import Image
+from receipt_imaging import StripRaster, iter_base64
+
+def peak_rss():
+    if sys.platform == "win32":
+        import psutil
+        return psutil.Process().memory_info().peak_wset
+    if sys.platform == "darwin":
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Not ru_maxrss - Linux carries it over from the parent through fork and exec
+    with open("/proc/self/status") as f:
+        return next(int(line.split()[1]) * 1024 for line in f if line.startswith("VmHWM:"))
+
+with open(sys.argv[3], "r", encoding="ascii") as f:
+    data_url = f.read()
+base = peak_rss()
+if sys.argv[2] == "streamed":
+    sent = sum(len(chunk) for chunk in StripRaster(data_url, 576))
+else:
+    # The whole-image path the streamed one replaced
+    image = Image.open(__import__("io").BytesIO(b"".join(iter_base64(data_url)))).convert("L")
+    image = image.resize((576, image.height * 576 // image.width), Image.LANCZOS)
+    sent = len(image.point(lambda p: 255 if p < 128 else 0).convert("1").tobytes())
+assert sent > 0
+print(peak_rss() - base)
+"""
+
+
+def _receipt(path, height):
+    image = Image.new("RGBA", (SOURCE_WIDTH, height), (255, 255, 255, 255))
+    draw = ImageDraw.Draw(image)
+    for y in range(0, height, 40):
+        draw.text((20 + (y % 200), y), f"ORDER #{y:08d}  PRICE 10.000  TIZO {y % 997}", fill=(0, 0, 0, 255))
+        draw.line((0, y + 30, SOURCE_WIDTH, y + 30), fill=(0, 0, 0, 255))
+    png = io.BytesIO()
+    image.save(png, "PNG")
+    with open(path, "w", encoding="ascii") as f:
+        f.write("data:image/png;base64," + base64.b64encode(png.getvalue()).decode("ascii"))
+    return path
+
+
+def _peak_growth(mode, path):
+    out = subprocess.run([sys.executable, "-c", _CHILD, ROOT, mode, str(path)],
+                         capture_output=True, text=True, check=True).stdout
+    return int(out.strip().splitlines()[-1])
+
+
+@pytest.fixture(scope="module")
+def receipts(tmp_path_factory):
+    folder = tmp_path_factory.mktemp("receipts")
+    return {height: _receipt(folder / f"receipt-{height}.txt", height) for height in (2000, 20000)}
+
+
+def test_streamed_raster_peak_memory_is_flat(receipts):
+    short, tall = _peak_growth("streamed", receipts[2000]), _peak_growth("streamed", receipts[20000])
+    full = _peak_growth("full", receipts[20000])
+
+    # The measurement sees Pillow's buffers: a whole 1152x20000 decode is ~22 MB grey, more as RGBA
+    assert full > 20 * MB, f"full-image render only grew peak RSS by {full / MB:.1f} MB"
+    assert tall < 16 * MB, f"streamed render of a 20000-row receipt grew peak RSS by {tall / MB:.1f} MB"
+    assert tall < short + 4 * MB, f"peak memory grows with receipt height: {short / MB:.1f} -> {tall / MB:.1f} MB"
+
+
+def _dots(data):
+    return sum(bin(byte).count("1") for byte in data)
+
+
+@pytest.mark.parametrize("width, head, path, max_differ", [
+    (864, 576, "lanczos", 0.0),      # 1.5x display - no cheap path, same dots as before
+    (576, 384, "lanczos", 0.0),      # 80 mm page on a 58 mm head
+    (1152, 576, "reduce", 0.04),     # html2canvas at scale 2 - reduce() is worth ~3% of dots
+])
+def test_cheap_resize_paths_stay_close_to_lanczos(width, head, path, max_differ):
+    from receipt_imaging import StripRaster, _synthetic_receipt
+
+    data_url = _synthetic_receipt(width)
+    old = b"".join(StripRaster(data_url, head, resample="lanczos"))
+    raster = StripRaster(data_url, head)
+    new = b"".join(raster)
+
+    assert raster.resample == path
+    assert len(new) == len(old)
+    differ = sum(bin(a ^ b).count("1") for a, b in zip(old, new)) / _dots(old)
+    assert differ <= max_differ, f"{differ:.2%} of dots differ from LANCZOS"
@@ -0,0 +1,157 @@
+"""
+UI Telemetry - field measurements of how fast the kiosk UI is for customers
+kiosk-telemetry.js in the shell batches performance entries and sends them to
+PrinterAPI.report_ui_metrics every few seconds:
+
+  transition    navigation start to the first frame of the next page
+  first-frame   touch on the screensaver to the first frame of the page after it
+  long-task     main-thread task over 50 ms in the shell or the page (scripts)
+  resource      an asset that took long to load (detail: img, video, script, css, font...)
+  paint         first contentful paint of a page
+
+Entries go into a ring buffer. Every SUMMARY_INTERVAL the buffer is reduced to per-page
+percentiles and one compact JSON line is appended to logs/ui_perf_YYYY-MM-DD.jsonl.
+Each summary also carries the host side - how long batches took to cross the pywebview
+bridge and how busy the Python process was - so a slow page can be put down to its
+assets, its scripts or the host.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from kiosk_log import LOGS_FOLDER, log
+
+ENTRY_TYPES = ("transition", "first-frame", "long-task", "resource", "paint")
+RING_SIZE = 5000          # entries kept between summaries - the oldest go first
+SUMMARY_INTERVAL = 300    # seconds between summaries written to the log folder
+MAX_BATCH = 500           # entries taken from one call
+MAX_MS = 120000           # anything longer is a broken clock, not a slow page
+PERCENTILES = (50, 90, 99)
+
+
+def _percentiles(values):
+    values = sorted(values)
+    stats = {"n": len(values)}
+    for p in PERCENTILES:
+        stats[f"p{p}"] = round(values[min(len(values) - 1, max(0, -(-len(values) * p // 100) - 1))], 1)
+    stats["max"] = round(values[-1], 1)
+    return stats
+
+
+class UiTelemetry:
+    """Ring buffer of UI performance entries, summarised per page"""
+
+    def __init__(self, folder=LOGS_FOLDER, interval=SUMMARY_INTERVAL, size=RING_SIZE):
+        self.folder = folder
+        self.interval = interval
+        self._ring = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self._since = time.time()
+        self._cpu_since = time.process_time()
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {"received": 0, "dropped": 0, "overflowed": 0, "summaries": 0}
+
+    def ingest(self, entries, sent_at=None):
+        """Add a batch from the page - returns how many entries were kept"""
+        now = time.time()
+        kept = []
+        for entry in (entries or [])[:MAX_BATCH]:
+            try:
+                kind, ms = entry["type"], float(entry["ms"])
+                if kind not in ENTRY_TYPES or not 0 <= ms <= MAX_MS:
+                    raise ValueError(kind)
+                page = str(entry.get("page") or "").split("?")[0].split("/")[-1][:80]
+                detail = str(entry["detail"])[:40] if entry.get("detail") else None
+            except (KeyError, TypeError, ValueError, AttributeError):
+                self.stats["dropped"] += 1
+                continue
+            kept.append((kind, page, ms, detail))
+        if sent_at:
+            # Time the batch spent getting from the page to Python - the host's share of any lag
+            try:
+                kept.append(("bridge", "", max(0.0, now * 1000 - float(sent_at)), None))
+            except (TypeError, ValueError):
+                pass
+        with self._lock:
+            self.stats["overflowed"] += max(0, len(self._ring) + len(kept) - self._ring.maxlen)
+            self._ring.extend(kept)
+        self.stats["received"] += len(entries or [])
+        return sum(1 for k in kept if k[0] != "bridge")
+
+    def summary(self, reset=False):
+        """Per-page percentiles of everything since the last summary, and the host side"""
+        now = time.time()
+        cpu = time.process_time()
+        with self._lock:
+            entries = list(self._ring)
+            since, cpu_since = self._since, self._cpu_since
+            if reset:
+                self._ring.clear()
+                self._since, self._cpu_since = now, cpu
+
+        grouped = {}
+        bridge = []
+        for kind, page, ms, detail in entries:
+            if kind == "bridge":
+                bridge.append(ms)
+                continue
+            by_type = grouped.setdefault(page, {}).setdefault(kind, {"values": [], "kinds": {}})
+            by_type["values"].append(ms)
+            if detail and kind == "resource":
+                by_type["kinds"][detail] = by_type["kinds"].get(detail, 0) + ms
+
+        pages = {}
+        for page, types in grouped.items():
+            pages[page] = {}
+            for kind, data in types.items():
+                stats = _percentiles(data["values"])
+                if kind in ("long-task", "resource"):
+                    stats["total_ms"] = round(sum(data["values"]))
+                if data["kinds"]:
+                    stats["kinds"] = {k: round(v) for k, v in sorted(data["kinds"].items(), key=lambda kv: -kv[1])}
+                pages[page][kind] = stats
+        wall = max(now - since, 0.001)
+        return {"from": datetime.fromtimestamp(since).isoformat(timespec="seconds"),
+                "to": datetime.fromtimestamp(now).isoformat(timespec="seconds"),
+                "entries": len(entries) - len(bridge), "pages": pages,
+                "host": {"cpu_pct": round((cpu - cpu_since) / wall * 100, 1),
+                         "bridge_ms": _percentiles(bridge) if bridge else None}}
+
+    def flush(self):
+        """Write a summary of the buffer to ui_perf_<day>.jsonl and start a new window"""
+        summary = self.summary(reset=True)
+        if not summary["entries"]:
+            return None
+        path = os.path.join(self.folder, f"ui_perf_{datetime.now().strftime('%Y-%m-%d')}.jsonl")
+        try:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(summary, separators=(",", ":")) + "\n")
+            self.stats["summaries"] += 1
+        except Exception as e:
+            log(f"[WARNING] Could not write UI telemetry summary: {e}")
+        transitions = [s["transition"] for s in summary["pages"].values() if "transition" in s]
+        if transitions:
+            slowest = max(s["p90"] for s in transitions)
+            log(f"UI telemetry: {summary['entries']} entries, slowest page transition p90 {slowest:.0f}ms, "
+                f"host CPU {summary['host']['cpu_pct']}%")
+        return summary
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="UiTelemetry", daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush()
+            except Exception as e:
+                log(f"[WARNING] UI telemetry summary failed: {e}")
+
+    def stop(self):
+        self._stop.set()
+        self.flush()
@@ -0,0 +1,670 @@
+"""
+Virtual Printer - renders the ESC/POS bytes our print paths produce to PNG
+An interpreter for the commands the kiosk sends (text with bold, size, alignment
+and code page, feeds, cuts and GS v 0 raster images), laid out on the printer
+profile's head width. Each cut starts a new receipt image.
+
+It can also stand in for a network printer on TCP 9100, draining data at a set
+link speed through a set buffer size like a real head, and answering DLE EOT status
+queries. Point a Windows "Standard TCP/IP" printer port at it to run the kiosk
+against it without hardware.
+
+Usage:
+  python virtual_printer.py render job.bin -o receipt.png
+  python virtual_printer.py render --archive receipts --order 12345 -o receipt.png
+  python virtual_printer.py render job.bin --golden golden/receipt.png   (exit 1 if it differs)
+  python virtual_printer.py check                 every golden/<name>.bin against golden/<name>.png
+  python virtual_printer.py serve --port 9100 --bps 9600 --buffer 4096 --out printed
+"""
+
+import io
+import os
+import sys
+import time
+import argparse
+import socket
+import socketserver
+import threading
+
+try:
+    from PIL import Image, ImageChops, ImageDraw, ImageFont
+except ImportError:
+    Image = None  # Rendering needs Pillow - the TCP stand-in still paces and counts without it
+
+from kiosk_log import log
+from printer_profiles import CODE_PAGES, all_profiles, get_profile
+
+ESC, GS, DLE, FS = 0x1B, 0x1D, 0x10, 0x1C
+LINE_SPACING = 30         # dots, ESC 2 default
+FONT_B_SCALE = 0.75       # Font B cells are 9x17 against Font A's 12x24
+CODEPAGE_NAMES = {n: name for name, n in CODE_PAGES.items()}
+GOLDEN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden")
+# Monospace fonts close to a printer's built-in font - Pillow's own font is the last resort
+FONT_FILES = ("consola.ttf", "cour.ttf", "DejaVuSansMono.ttf", "LiberationMono-Regular.ttf")
+
+# Commands we don't draw, with their parameter byte counts - skipped cleanly
+_ESC_SKIP = {ord('R'): 1, ord('V'): 1, ord('r'): 1, ord('{'): 1, ord(' '): 1, ord('c'): 2, ord('p'): 3,
+             ord('$'): 2, ord('\\'): 2, ord('D'): None, ord('='): 1, ord('U'): 1, ord('%'): 1}
+_GS_SKIP = {ord('L'): 2, ord('W'): 2, ord('B'): 1, ord('H'): 1, ord('h'): 1, ord('w'): 1, ord('f'): 1,
+            ord('a'): 1, ord('r'): 1, ord('P'): 2, ord('b'): 1, ord('I'): 1, ord('x'): 1}
+
+
+class _Style:
+    def __init__(self):
+        self.align = 0          # 0 left, 1 center, 2 right
+        self.bold = False
+        self.underline = 0
+        self.font_b = False
+        self.width_mul = 1
+        self.height_mul = 1
+        self.code_page = "cp437"
+        self.spacing = LINE_SPACING
+
+
+class EscPosRenderer:
+    """Feed it bytes, get one image per cut receipt"""
+
+    def __init__(self, profile=None, dots=None, on_status=None):
+        if Image is None:
+            raise RuntimeError("Pillow is required to render receipts")
+        self.on_status = on_status  # on_status(n) for each DLE EOT n, as the parser reaches it
+        self._pending = b""         # start of a command the last chunk cut off
+        profile = profile or get_profile("generic-80")
+        self.dots = dots or profile["dots"]
+        self.cell_w = self.dots // profile["columns"]["A"]
+        self.cell_h = self.cell_w * 2
+        self.pages = []
+        self.unknown = 0            # commands we didn't recognise
+        self._fonts = {}
+        self._glyphs = {}
+        self._reset()
+        self._strips = []           # (image, x) for the receipt being printed
+        self._line = []             # glyph images waiting for LF
+        self._line_x = 0
+        self._raster = None         # [width_bytes, rows bytearray, x] - consecutive raster bands merged
+
+    def _font(self, cell_h):
+        font = self._fonts.get(cell_h)
+        if font is None:
+            size = cell_h - cell_h // 6
+            for name in FONT_FILES:
+                try:
+                    font = ImageFont.truetype(name, size)
+                    break
+                except OSError:
+                    continue
+            else:
+                try:
+                    font = ImageFont.load_default(size=size)
+                except TypeError:
+                    font = ImageFont.load_default()  # Old Pillow - small bitmap font
+            self._fonts[cell_h] = font
+        return font
+
+    def _reset(self):
+        self.style = _Style()
+
+    # ---------- Public ----------
+
+    def feed(self, data):
+        """Interpret a chunk of ESC/POS. A command cut off at the end of a chunk waits for the next one,
+        so chunks can be split anywhere - as they come off a socket."""
+        data = self._pending + bytes(data)
+        self._pending = b""
+        i, n = 0, len(data)
+        while i < n:
+            b = data[i]
+            if b == 0x0A:
+                self._print_line(self.style.spacing)
+                i += 1
+            elif b in (ESC, GS, DLE, FS):
+                # Handlers return None (or an end past the chunk) for a command that isn't all here
+                # yet, without acting on it
+                end = None
+                if i + 1 < n:
+                    if b == ESC:
+                        end = self._esc(data, i + 1)
+                    elif b == GS:
+                        end = self._gs(data, i + 1)
+                    elif b == DLE:
+                        end = self._dle(data, i + 1)
+                    else:
+                        end = i + (2 if data[i + 1] in (ord('.'), ord('&')) else 3)
+                if end is None or end > n:
+                    self._pending = data[i:]
+                    break
+                i = end
+            elif b == 0x09:
+                tab = 8 * self._cell()[0]
+                self._line_x = (self._line_x // tab + 1) * tab
+                self._line.append((None, self._line_x))
+                i += 1
+            elif b >= 0x20:
+                start = i
+                while i < n and data[i] >= 0x20:
+                    i += 1
+                self._text(data[start:i])
+            else:
+                i += 1  # CR and other control bytes - no effect on a thermal head
+        return self
+
+    def finish(self):
+        """Flush whatever is left as the last receipt and return all receipt images"""
+        if self._pending:
+            self.unknown += 1  # Job ended inside a command
+            self._pending = b""
+        if self._line:
+            self._print_line(0)
+        self._cut()
+        return self.pages
+
+    def render(self, data):
+        return self.feed(data).finish()
+
+    # ---------- Commands ----------
+
+    def _dle(self, data, i):
+        if data[i] == 0x14:
+            return i + 4                                  # DLE DC4 fn m t
+        if i + 1 >= len(data):
+            return None
+        if data[i] == 0x04 and self.on_status:
+            self.on_status(data[i + 1])                   # DLE EOT n - real-time status request
+        return i + 2                                      # DLE EOT n / DLE ENQ n
+
+    def _esc(self, data, i):
+        cmd = data[i]
+        if i + 1 >= len(data) and cmd not in (ord('@'), ord('i'), ord('m'), ord('2')):
+            return None  # The argument is in the next chunk
+        arg = data[i + 1] if i + 1 < len(data) else 0
+        if arg >= 48 and cmd in (ord('a'), ord('E'), ord('G'), ord('-'), ord('M')):
+            arg -= 48  # '0'/'1'/'2' forms, as kiosk_app sends them
+        if cmd == ord('@'):
+            self._flush_raster()
+            self._reset()
+            return i + 1
+        if cmd in (ord('i'), ord('m')):
+            self._cut()
+            return i + 1
+        if cmd == ord('2'):
+            self.style.spacing = LINE_SPACING
+            return i + 1
+        if cmd == ord('a'):
+            self.style.align = arg if arg in (0, 1, 2) else 0
+        elif cmd in (ord('E'), ord('G')):
+            self.style.bold = bool(arg & 1)
+        elif cmd == ord('-'):
+            self.style.underline = arg & 3
+        elif cmd == ord('M'):
+            self.style.font_b = bool(arg & 1)
+        elif cmd == ord('!'):
+            self.style.font_b = bool(arg & 0x01)
+            self.style.bold = bool(arg & 0x08)
+            self.style.height_mul = 2 if arg & 0x10 else 1
+            self.style.width_mul = 2 if arg & 0x20 else 1
+            self.style.underline = 1 if arg & 0x80 else 0
+        elif cmd == ord('d'):
+            self._print_line(self.style.spacing)
+            self._feed(self.style.spacing * max(0, arg - 1))
+        elif cmd == ord('J'):
+            self._print_line(arg)
+        elif cmd == ord('3'):
+            self.style.spacing = arg
+        elif cmd == ord('t'):
+            self.style.code_page = CODEPAGE_NAMES.get(arg, "cp437")
+        elif cmd == ord('*'):
+            # Old bit-image mode: m nL nH data, 1 or 3 bytes per column
+            m, width = arg, data[i + 2] | (data[i + 3] << 8) if i + 3 < len(data) else 0
+            return i + 4 + width * (3 if m >= 32 else 1)
+        elif cmd in _ESC_SKIP:
+            count = _ESC_SKIP[cmd]
+            if count is None:  # ESC D tab stops, NUL-terminated
+                end = data.find(b'\x00', i + 1)
+                return None if end == -1 else end + 1
+            return i + 1 + count
+        else:
+            self.unknown += 1
+            return i + 1
+        return i + 2
+
+    def _gs(self, data, i):
+        cmd = data[i]
+        if i + 1 >= len(data):
+            return None  # Every GS command we know has an argument
+        if cmd == ord('v') and data[i + 1:i + 2] == b'0':
+            return self._raster_command(data, i + 2)
+        if cmd == ord('!'):
+            arg = data[i + 1] if i + 1 < len(data) else 0
+            self.style.width_mul = ((arg >> 4) & 7) + 1
+            self.style.height_mul = (arg & 7) + 1
+            return i + 2
+        if cmd == ord('V'):
+            end = i + (3 if data[i + 1] in (65, 66, 97, 98, 103, 104) else 2)
+            if end > len(data):
+                return None
+            self._cut()
+            return end
+        if cmd == ord('k'):
+            # Barcode - drawn as a placeholder bar the width of its data
+            m = data[i + 1]
+            if m <= 6:
+                end = data.find(b'\x00', i + 2)
+                if end == -1:
+                    return None
+                self._placeholder(end - i - 2)
+                return end + 1
+            if i + 2 >= len(data) or i + 3 + data[i + 2] > len(data):
+                return None
+            self._placeholder(data[i + 2])
+            return i + 3 + data[i + 2]
+        if cmd == ord('('):
+            # GS ( fn pL pH ... - QR codes and other extended functions
+            length = data[i + 2] | (data[i + 3] << 8) if i + 3 < len(data) else 0
+            return i + 4 + length
+        if cmd in _GS_SKIP:
+            return i + 1 + _GS_SKIP[cmd]
+        self.unknown += 1
+        return i + 1
+
+    def _raster_command(self, data, i):
+        if i + 5 > len(data):
+            return None
+        mode = data[i]
+        width_bytes = data[i + 1] | (data[i + 2] << 8)
+        height = data[i + 3] | (data[i + 4] << 8)
+        if i + 5 + width_bytes * height > len(data):
+            return None  # Image data still on its way
+        body = data[i + 5:i + 5 + width_bytes * height]
+        if self._line:
+            self._print_line(0)
+        x = self._aligned_x(width_bytes * 8 * (2 if mode & 1 else 1))
+        if mode & 3:
+            self._flush_raster()
+            self._paste_raster(width_bytes, body, x, mode)
+        elif self._raster is not None and self._raster[0] == width_bytes and self._raster[2] == x:
+            self._raster[1] += body
+        else:
+            self._flush_raster()
+            self._raster = [width_bytes, bytearray(body), x]
+        return i + 5 + width_bytes * height
+
+    def _flush_raster(self):
+        if self._raster is not None:
+            width_bytes, body, x = self._raster
+            self._raster = None
+            self._paste_raster(width_bytes, bytes(body), x, 0)
+
+    def _paste_raster(self, width_bytes, body, x, mode):
+        height = len(body) // width_bytes if width_bytes else 0
+        if not height:
+            return
+        # ESC/POS sets a bit for a burnt dot - PIL's inverted 1-bit raw mode reads that as black
+        image = Image.frombytes('1', (width_bytes * 8, height), body[:width_bytes * height], 'raw', '1;I').convert('L')
+        if mode & 3:
+            image = image.resize((image.width * (2 if mode & 1 else 1), height * (2 if mode & 2 else 1)))
+        self._strips.append((image, x))
+
+    # ---------- Text ----------
+
+    def _cell(self):
+        scale = FONT_B_SCALE if self.style.font_b else 1
+        return (round(self.cell_w * scale) * self.style.width_mul, round(self.cell_h * scale) * self.style.height_mul)
+
+    def _glyph(self, ch):
+        s = self.style
+        key = (ch, s.font_b, s.bold, s.underline, s.width_mul, s.height_mul)
+        glyph = self._glyphs.get(key)
+        if glyph is None:
+            base_w, base_h = round(self.cell_w * (FONT_B_SCALE if s.font_b else 1)), \
+                round(self.cell_h * (FONT_B_SCALE if s.font_b else 1))
+            glyph = Image.new('L', (base_w, base_h), 255)
+            draw = ImageDraw.Draw(glyph)
+            font = self._font(base_h)
+            left, _, right, _ = draw.textbbox((0, 0), ch, font=font)
+            x = (base_w - (right - left)) // 2 - left
+            try:
+                ascent, descent = font.getmetrics()
+                y = (base_h - ascent - descent) // 2   # Same baseline for every character
+            except AttributeError:
+                y = 0
+            draw.text((x, y), ch, font=font, fill=0)
+            if s.bold:
+                draw.text((x + 1, y), ch, font=font, fill=0)
+            if s.underline:
+                draw.rectangle((0, base_h - s.underline, base_w - 1, base_h - 1), fill=0)
+            if s.width_mul > 1 or s.height_mul > 1:
+                glyph = glyph.resize((base_w * s.width_mul, base_h * s.height_mul), Image.NEAREST)
+            self._glyphs[key] = glyph
+        return glyph
+
+    def _text(self, raw):
+        self._flush_raster()
+        for ch in raw.decode(self.style.code_page, errors="replace"):
+            glyph = self._glyph(ch)
+            if self._line_x + glyph.width > self.dots:
+                self._print_line(self.style.spacing)  # The printer wraps at the end of the head
+            self._line.append((glyph, self._line_x))
+            self._line_x += glyph.width
+
+    def _placeholder(self, chars):
+        width = min(self.dots, max(1, chars) * self.cell_w * 2)
+        bar = Image.new('L', (width, self.cell_h * 3), 255)
+        ImageDraw.Draw(bar).rectangle((0, 0, width - 1, self.cell_h * 3 - 1), outline=0, width=2)
+        self._print_line(0)
+        self._strips.append((bar, self._aligned_x(width)))
+
+    def _aligned_x(self, width):
+        if self.style.align == 1:
+            return max(0, (self.dots - width) // 2)
+        if self.style.align == 2:
+            return max(0, self.dots - width)
+        return 0
+
+    def _print_line(self, spacing):
+        glyphs = [(g, x) for g, x in self._line if g is not None]
+        self._line = []
+        width, self._line_x = self._line_x, 0
+        if not glyphs:
+            self._feed(spacing)
+            return
+        height = max(g.height for g, _ in glyphs)
+        line = Image.new('L', (max(1, width), max(height, spacing)), 255)
+        for glyph, x in glyphs:
+            line.paste(glyph, (x, height - glyph.height))
+        self._strips.append((line, self._aligned_x(width)))
+
+    def _feed(self, dots):
+        self._flush_raster()
+        if dots > 0:
+            self._strips.append((None, dots))
+
+    def _cut(self):
+        self._flush_raster()
+        if self._line:
+            self._print_line(0)
+        strips, self._strips = self._strips, []
+        if not any(image is not None for image, _ in strips):
+            return
+        height = sum(image.height if image is not None else dots for image, dots in strips)
+        page = Image.new('L', (self.dots, height), 255)
+        y = 0
+        for image, x in strips:
+            if image is None:
+                y += x
+                continue
+            page.paste(image.crop((0, 0, min(image.width, self.dots - x), image.height)), (x, y))
+            y += image.height
+        self.pages.append(page)
+
+
+class _CommandScanner(EscPosRenderer):
+    """The renderer's parser with the drawing left out - tracks where each command starts and
+    ends in a job streaming in, so real-time requests are told apart from image data"""
+
+    def __init__(self, on_status=None):
+        self.on_status = on_status
+        self._pending = b""
+        self.unknown = 0
+        self.cell_w = 12
+        self._reset()
+        self._line = []
+        self._line_x = 0
+
+    # Raster bands aren't collected - a job's image data would pile up for nothing
+    @property
+    def _raster(self):
+        return None
+
+    @_raster.setter
+    def _raster(self, value):
+        pass
+
+    def _cell(self):
+        return self.cell_w, self.cell_w * 2
+
+    def _text(self, raw):
+        pass
+
+    def _placeholder(self, chars):
+        pass
+
+    def _print_line(self, spacing):
+        self._line, self._line_x = [], 0
+
+    def _feed(self, dots):
+        pass
+
+    def _cut(self):
+        pass
+
+    def _flush_raster(self):
+        pass
+
+    def _paste_raster(self, width_bytes, body, x, mode):
+        pass
+
+    def _aligned_x(self, width):
+        return 0
+
+
+def render_png(data, profile=None):
+    """PNG bytes of each receipt in an ESC/POS job"""
+    out = []
+    for page in EscPosRenderer(profile).render(data):
+        buf = io.BytesIO()
+        page.convert('1').save(buf, "PNG", optimize=True)
+        out.append(buf.getvalue())
+    return out
+
+
+def compare_golden(image, golden_path, tolerance=0.001):
+    """(ok, message) - ok when at most `tolerance` of the pixels differ from the golden image"""
+    golden = Image.open(golden_path).convert('L')
+    image = image.convert('L')
+    if golden.size != image.size:
+        return False, f"size {image.size} != golden {golden.size}"
+    diff = ImageChops.difference(golden, image).point(lambda v: 255 if v > 127 else 0)
+    changed = sum(diff.histogram()[255:])
+    share = changed / (image.width * image.height)
+    return share <= tolerance, f"{changed} pixels differ ({share:.4%})"
+
+
+# ---------- TCP 9100 stand-in ----------
+
+class _JobHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        server = self.server
+        sock = self.request
+        received = bytearray()
+        scanner = _CommandScanner(on_status=lambda n: self._answer_status(sock, n))
+        level = 0.0             # bytes in the head buffer
+        last = time.perf_counter()
+        started = last
+        while True:
+            now = time.perf_counter()
+            if server.bps:
+                level = max(0.0, level - (now - last) * server.bps)  # The head prints as time passes
+            last = now
+            free = server.buffer_bytes - level if server.bps else server.buffer_bytes
+            if free < 1:
+                # Buffer full - stop reading, TCP backs up and the sender blocks, as on real hardware
+                time.sleep((1 - free) / server.bps)
+                continue
+            try:
+                chunk = sock.recv(int(min(free, 65536)))
+            except OSError:
+                break
+            if not chunk:
+                break
+            scanner.feed(chunk)
+            received += chunk
+            if server.bps:
+                level += len(chunk)
+        if server.bps and level > 0:
+            time.sleep(level / server.bps)  # Finish printing what's buffered
+        server.job_done(bytes(received), time.perf_counter() - started)
+
+    def _answer_status(self, sock, n):
+        # DLE EOT n is real-time: answered on arrival, not when it reaches the head
+        try:
+            sock.sendall(bytes((self.server.status_byte(n),)))
+        except OSError:
+            pass
+
+
+class VirtualPrinterServer(socketserver.ThreadingTCPServer):
+    """Network printer stand-in: one connection is one job, rendered to PNG when it closes"""
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=9100, bps=None, buffer_bytes=4096, out=None, profile=None):
+        self.bps = bps
+        self.buffer_bytes = buffer_bytes
+        super().__init__((host, port), _JobHandler)
+        self.out = out
+        self.profile = profile
+        self.paper_out = False
+        self.jobs = []          # (bytes, seconds, png paths)
+        self._lock = threading.Lock()
+        if out:
+            os.makedirs(out, exist_ok=True)
+
+    def server_bind(self):
+        # Keep the kernel's receive window near the printer's buffer, or it would soak up
+        # hundreds of KB and the sender would never feel the head's speed
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, max(1024, self.buffer_bytes))
+        super().server_bind()
+
+    def status_byte(self, n):
+        value = 0x12  # bits 1 and 4 are always set
+        if self.paper_out and n == 2:
+            value |= 0x20
+        if self.paper_out and n == 4:
+            value |= 0x6C
+        if self.paper_out and n == 1:
+            value |= 0x08
+        return value
+
+    def job_done(self, data, seconds):
+        paths = []
+        if self.out and Image is not None and data:
+            with self._lock:
+                number = len(self.jobs) + 1
+            for page, png in enumerate(render_png(data, self.profile), 1):
+                path = os.path.join(self.out, f"job-{number:05d}-{page}.png")
+                with open(path, "wb") as f:
+                    f.write(png)
+                paths.append(path)
+        with self._lock:
+            self.jobs.append((len(data), seconds, paths))
+        rate = f", {len(data) / seconds:.0f} B/s" if seconds > 0 else ""
+        log(f"Virtual printer: job of {len(data)} bytes in {seconds:.2f}s{rate}" +
+            (f" -> {', '.join(paths)}" if paths else ""))
+
+
+# ---------- CLI ----------
+
+def check_golden(folder=GOLDEN_DIR, profile=None):
+    """Render every <name>.bin in the folder and compare each receipt with <name>.png, <name>-2.png...
+    Returns the names that differ."""
+    failed = []
+    for name in sorted(os.listdir(folder)):
+        if not name.endswith(".bin"):
+            continue
+        base = os.path.join(folder, name[:-4])
+        with open(base + ".bin", "rb") as f:
+            pages = EscPosRenderer(profile).render(f.read())
+        paths = [f"{base}{'' if n == 1 else f'-{n}'}.png" for n in range(1, len(pages) + 1)]
+        if not pages or not os.path.exists(paths[-1]) or os.path.exists(f"{base}-{len(pages) + 1}.png"):
+            ok, message = False, f"{len(pages)} receipt(s) rendered, golden has a different count"
+        else:
+            results = [compare_golden(page, path) for page, path in zip(pages, paths)]
+            ok = all(r[0] for r in results)
+            message = "; ".join(r[1] for r in results)
+        print(f"{'OK' if ok else 'DIFFERS'}  {name}: {message}")
+        if not ok:
+            failed.append(name)
+    return failed
+
+
+def _load_job(args):
+    if args.archive:
+        from receipt_archive import ReceiptArchive
+        archive = ReceiptArchive(args.archive)
+        try:
+            entry, payload = archive.latest(args.order)
+        finally:
+            archive.close()
+        if payload is None:
+            raise SystemExit(f"No archived receipt for order {args.order}")
+        return payload
+    with open(args.job, "rb") as f:
+        return f.read()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render ESC/POS jobs or run a virtual TCP 9100 printer")
+    sub = parser.add_subparsers(dest="command", required=True)
+    render = sub.add_parser("render", help="render a job file (or an archived receipt) to PNG")
+    render.add_argument("job", nargs="?", help="raw ESC/POS file")
+    render.add_argument("--archive", help="receipt archive folder to read --order from")
+    render.add_argument("--order", help="order number in the archive")
+    render.add_argument("-o", "--output", default="receipt.png", help="PNG path - receipts after the first get -2, -3...")
+    render.add_argument("--profile", default="generic-80", help="printer profile name")
+    render.add_argument("--golden", help="compare with this PNG instead of writing one")
+    render.add_argument("--update", action="store_true", help="write the render as the new --golden")
+    check = sub.add_parser("check", help="render the golden jobs and compare them with their PNGs")
+    check.add_argument("folder", nargs="?", default=GOLDEN_DIR)
+    check.add_argument("--profile", default="generic-80")
+    serve = sub.add_parser("serve", help="listen like a network printer")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=9100)
+    serve.add_argument("--bps", type=float, help="link speed in bytes/second (default: unlimited)")
+    serve.add_argument("--buffer", type=int, default=4096, help="printer receive buffer in bytes")
+    serve.add_argument("--out", default="virtual_printer_out", help="folder for rendered jobs")
+    serve.add_argument("--profile", default="generic-80")
+    args = parser.parse_args(argv)
+
+    try:
+        profile = get_profile(args.profile)
+    except KeyError:
+        raise SystemExit(f"Unknown printer profile {args.profile} - choose from "
+                         f"{', '.join(p['name'] for p in all_profiles())}")
+
+    if args.command == "check":
+        sys.exit(1 if check_golden(args.folder, profile) else 0)
+    elif args.command == "render":
+        if not args.job and not (args.archive and args.order):
+            raise SystemExit("Give a job file, or --archive and --order")
+        started = time.perf_counter()
+        renderer = EscPosRenderer(profile)
+        pages = renderer.render(_load_job(args))
+        ms = (time.perf_counter() - started) * 1000
+        print(f"{len(pages)} receipt(s) rendered in {ms:.0f} ms" +
+              (f", {renderer.unknown} unknown command(s) skipped" if renderer.unknown else ""))
+        if not pages:
+            raise SystemExit(1)
+        if args.golden and not args.update:
+            ok, message = compare_golden(pages[0], args.golden)
+            print(("OK: " if ok else "DIFFERS: ") + message)
+            sys.exit(0 if ok else 1)
+        base, ext = os.path.splitext(args.golden or args.output)
+        for number, page in enumerate(pages, 1):
+            path = f"{base}{'' if number == 1 else f'-{number}'}{ext or '.png'}"
+            page.convert('1').save(path, optimize=True)
+            print(f"{path}: {page.width}x{page.height}")
+    else:
+        server = VirtualPrinterServer(args.host, args.port, args.bps, args.buffer, args.out, profile)
+        speed = f"{args.bps:.0f} B/s" if args.bps else "unlimited speed"
+        print(f"Virtual printer on {args.host}:{args.port} ({speed}, {args.buffer} byte buffer) - Ctrl+C to stop")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+
+if __name__ == '__main__':
+    main()
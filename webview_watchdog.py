@@ -0,0 +1,237 @@
+"""
+WebView Watchdog - keeps long-running kiosk windows healthy
+Samples the WebView2 renderer processes' memory and handle counts, pings the page
+through evaluate_js, and reloads the page (or recreates the window) while the kiosk
+is idle on the screensaver. Every sample goes to a trend log, so leaks can be
+compared between releases.
+"""
+
+import os
+import threading
+import time
+from datetime import datetime
+
+from kiosk_log import log, LOGS_FOLDER
+
+try:
+    import psutil
+except ImportError:
+    psutil = None  # Memory sampling disabled - heartbeat still works
+
+TREND_FILE = os.path.join(LOGS_FOLDER, "webview_trend.csv")
+TREND_HEADER = "timestamp,release,uptime_min,renderer_rss_mb,handles,processes,heartbeat_ms,page,action\n"
+
+# Renderer process names per webview backend
+RENDERER_NAMES = ('msedgewebview2', 'webkitwebprocess', 'qtwebengineprocess')
+
+# Reports the time and the page shown in kiosk-shell's iframe
+HEARTBEAT_JS = """
+(function () {
+    var page = '';
+    try {
+        var frame = document.getElementById('page-frame');
+        page = frame ? frame.contentWindow.location.pathname.split('/').pop() : location.pathname.split('/').pop();
+    } catch (e) {}
+    return {t: Date.now(), page: page};
+})()
+"""
+
+
+class WebViewWatchdog:
+    """Background thread that watches the kiosk window and reloads it when needed.
+
+    Memory/handle limits and the max uptime only schedule a reload - it happens the
+    next time the screensaver is showing, so no customer is interrupted. A page that
+    stops answering heartbeats is recovered straight away.
+    """
+
+    def __init__(self, window, start_url, recreate=None, release="dev", on_action=None,
+                 interval=15, sample_every=60, heartbeat_timeout=10, max_missed=3,
+                 rss_limit_mb=1500, handle_limit=20000, max_uptime_hours=24):
+        self.window = window
+        self.start_url = start_url
+        self.recreate = recreate          # callable that rebuilds the window, or None
+        self.release = release
+        self.on_action = on_action        # on_action(action, reason) after each reload/recovery
+        self.interval = interval
+        self.sample_every = sample_every
+        self.heartbeat_timeout = heartbeat_timeout
+        self.max_missed = max_missed
+        self.rss_limit_mb = rss_limit_mb
+        self.handle_limit = handle_limit
+        self.max_uptime_hours = max_uptime_hours
+
+        self.page = None
+        self.last_sample = None
+        self.last_beat = time.time()  # last answered heartbeat - kiosk_supervisor.py reads it
+        self._missed = 0
+        self._pending = None        # reason for a reload waiting on idle
+        self._reason = None         # why the last action was taken
+        self._started = time.time()
+        self._window_started = time.time()
+        self._beat_thread = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if psutil is None:
+            log("[WARNING] psutil not installed - watchdog runs heartbeat only, no memory sampling")
+        self._thread = threading.Thread(target=self._loop, name="WebViewWatchdog", daemon=True)
+        self._thread.start()
+        log(f"WebView watchdog started (heartbeat {self.interval}s, limits {self.rss_limit_mb}MB / "
+            f"{self.handle_limit} handles / {self.max_uptime_hours}h)")
+
+    def stop(self):
+        self._stop.set()
+
+    def is_idle(self):
+        """True while the screensaver is showing"""
+        return bool(self.page) and self.page.startswith('screensaver')
+
+    # ---------- Loop ----------
+
+    def _loop(self):
+        last_sample = 0
+        while not self._stop.wait(self.interval):
+            try:
+                heartbeat_ms = self._heartbeat()
+                if heartbeat_ms is None:
+                    self._missed += 1
+                    log(f"[WARNING] WebView heartbeat missed ({self._missed}/{self.max_missed})")
+                else:
+                    self._missed = 0
+                    self.last_beat = time.time()
+
+                action = ""
+                sampled = False
+                if self._missed >= self.max_missed:
+                    # Hung page - nobody can use the kiosk anyway, recover now
+                    action = self._recover(f"page unresponsive for {self._missed} heartbeats")
+                elif time.time() - last_sample >= self.sample_every:
+                    last_sample = time.time()
+                    sampled = True
+                    self._check_limits()
+                if not action and heartbeat_ms is not None and self._pending and self.is_idle():
+                    action = self._soft_reload(self._pending)
+
+                if sampled or action or heartbeat_ms is None:
+                    self._write_trend(heartbeat_ms, action)
+                if action and self.on_action:
+                    self.on_action(action, self._reason)
+            except Exception as e:
+                log(f"[WARNING] Watchdog error: {e}")
+
+    def _heartbeat(self):
+        """Round-trip time of a tiny evaluate_js call in ms, or None if the page didn't answer"""
+        if self._beat_thread is not None and self._beat_thread.is_alive():
+            return None  # Previous ping is still stuck - don't pile up threads
+
+        result = {}
+        def ping():
+            try:
+                result["value"] = self.window.evaluate_js(HEARTBEAT_JS)
+            except Exception as e:
+                result["error"] = e
+
+        started = time.perf_counter()
+        self._beat_thread = threading.Thread(target=ping, name="WebViewHeartbeat", daemon=True)
+        self._beat_thread.start()
+        self._beat_thread.join(self.heartbeat_timeout)
+        if self._beat_thread.is_alive() or "error" in result:
+            return None
+        value = result.get("value")
+        if isinstance(value, dict):
+            self.page = value.get("page") or self.page
+        return (time.perf_counter() - started) * 1000
+
+    # ---------- Sampling ----------
+
+    def sample(self):
+        """Total RSS (MB), handle count and process count of the renderer processes"""
+        if psutil is None:
+            return None
+        rss = handles = count = 0
+        try:
+            children = psutil.Process(os.getpid()).children(recursive=True)
+        except psutil.Error:
+            return None
+        for proc in children:
+            try:
+                name = proc.name().lower()
+                if not name.startswith(RENDERER_NAMES):
+                    continue
+                rss += proc.memory_info().rss
+                handles += proc.num_handles() if hasattr(proc, "num_handles") else proc.num_fds()
+                count += 1
+            except psutil.Error:
+                continue  # Process exited while we looked at it
+        self.last_sample = (rss / (1024 * 1024), handles, count)
+        return self.last_sample
+
+    def _check_limits(self):
+        sample = self.sample()
+        if sample and not self._pending:
+            rss_mb, handles, _ = sample
+            if rss_mb > self.rss_limit_mb:
+                self._schedule(f"renderer memory {rss_mb:.0f}MB > {self.rss_limit_mb}MB")
+            elif handles > self.handle_limit:
+                self._schedule(f"renderer handles {handles} > {self.handle_limit}")
+        uptime_hours = (time.time() - self._window_started) / 3600
+        if not self._pending and self.max_uptime_hours and uptime_hours > self.max_uptime_hours:
+            self._schedule(f"window up for {uptime_hours:.1f}h")
+
+    def _schedule(self, reason):
+        self._pending = reason
+        log(f"Watchdog: reload scheduled for next idle period ({reason})")
+
+    # ---------- Actions ----------
+
+    def _soft_reload(self, reason):
+        log(f"========== WATCHDOG SOFT RELOAD ({reason}) ==========")
+        self._reason = reason
+        self._pending = None
+        self._window_started = time.time()
+        try:
+            self.window.load_url(self.start_url)
+            return "soft_reload"
+        except Exception as e:
+            log(f"[WARNING] Soft reload failed: {e}")
+            return self._recover(f"soft reload failed: {e}")
+
+    def _recover(self, reason):
+        log(f"========== WATCHDOG RECOVERY ({reason}) ==========")
+        self._reason = reason
+        self._missed = 0
+        self._pending = None
+        self._window_started = time.time()
+        self._beat_thread = None  # Ping stuck in the old page - the new one gets a fresh thread
+        self.page = None
+        if self.recreate:
+            try:
+                self.window = self.recreate()
+                return "recreate_window"
+            except Exception as e:
+                log(f"[WARNING] Window recreation failed: {e}")
+        try:
+            self.window.load_url(self.start_url)
+            return "reload"
+        except Exception as e:
+            log(f"❌ Watchdog could not recover the window: {e}")
+            return "recover_failed"
+
+    # ---------- Trend log ----------
+
+    def _write_trend(self, heartbeat_ms, action):
+        rss_mb, handles, count = self.last_sample or ("", "", "")
+        uptime_min = (time.time() - self._started) / 60
+        row = [datetime.now().strftime("%Y-%m-%d %H:%M:%S"), self.release, f"{uptime_min:.0f}",
+               f"{rss_mb:.1f}" if rss_mb != "" else "", str(handles), str(count),
+               f"{heartbeat_ms:.0f}" if heartbeat_ms is not None else "timeout", self.page or "", action]
+        try:
+            new_file = not os.path.exists(TREND_FILE)
+            with open(TREND_FILE, "a", encoding="utf-8") as f:
+                if new_file:
+                    f.write(TREND_HEADER)
+                f.write(",".join(row) + "\n")
+        except Exception as e:
+            log(f"[WARNING] Could not write watchdog trend: {e}")